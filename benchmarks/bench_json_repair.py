@@ -0,0 +1,135 @@
+"""
+Compares txt_2_json.parse_llm_json with the previous json.loads -> ast.literal_eval -> regex-repair cascade.
+
+Usage:
+    python benchmarks/bench_json_repair.py [DIR ...]
+
+Every .txt file under the given directories (e.g. the per-paper output folders of pdf_extract_text)
+is parsed by both. Without directories, a synthetic corpus of LLM-style outputs with the usual
+defects (code fences, single quotes, Python literals, trailing commas, truncation, malformed objects) is generated.
+Reports throughput and how many files and objects each approach recovers.
+"""
+import argparse
+import ast
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from txt_2_json import parse_llm_json  # noqa: E402
+
+WORDS = ["vanadium", "electrolyte", "membrane", "Nafion 117", "energy efficiency", "80%", "1.26 V",
+         "anthraquinone", "crossover", "capacity fade", "current density", "100 mA cm-2", "is", "has"]
+
+
+def repair_json_string(json_like_string):
+    """The regex repair step of the previous cascade: comments, Python literals and trailing commas."""
+    repaired_string = re.sub(r"//.*", "", json_like_string)
+    repaired_string = re.sub(r"/\*.*?\*/", "", repaired_string, flags=re.DOTALL)
+    repaired_string = re.sub(r"\bTrue\b", "true", repaired_string)
+    repaired_string = re.sub(r"\bFalse\b", "false", repaired_string)
+    repaired_string = re.sub(r"\bNone\b", "null", repaired_string)
+    return re.sub(r",\s*([}\]])", r"\1", repaired_string)
+
+
+def cascade_parse(content):
+    """The parsing steps txt_2_json used before parse_llm_json."""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return json.loads(json.dumps(ast.literal_eval(content), ensure_ascii=False, indent=4))
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        pass
+    try:
+        return json.loads(repair_json_string(content))
+    except json.JSONDecodeError:
+        return None
+
+
+def count_objects(parsed):
+    if isinstance(parsed, list):
+        return sum(isinstance(x, dict) for x in parsed)
+    return 1 if isinstance(parsed, dict) else 0
+
+
+def synthetic_corpus(n_files=2000, seed=7):
+    """(text, number of complete objects) pairs with a realistic mix of defects."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(n_files):
+        triples = [{"start_node": rng.choice(WORDS), "relationship": rng.choice(WORDS),
+                    "end_node": rng.choice(WORDS), "start_node_label": "material",
+                    "end_node_label": "property"} for _ in range(rng.randint(5, 120))]
+        text = json.dumps(triples, ensure_ascii=False)
+        expected = len(triples)
+        defect = rng.random()
+        if defect < 0.15:
+            text = "```json\n" + text + "\n```"
+        elif defect < 0.30:
+            text = repr(triples)  # single quotes
+        elif defect < 0.40:
+            text = text.replace("}", ",}", 3)  # trailing commas
+        elif defect < 0.60:
+            cut = rng.randint(len(text) // 3, len(text) - 2)  # truncated mid-array
+            text = text[:cut]
+            expected = text.count("}")
+        elif defect < 0.70:
+            # one malformed object (missing colon, unclosed list) mid-array
+            broken = dict(triples[len(triples) // 2], end_node=["unclosed"])
+            parts = [json.dumps(t, ensure_ascii=False) for t in triples]
+            parts[len(triples) // 2] = json.dumps(broken, ensure_ascii=False).replace('":', '"', 1).replace("]", "")
+            text = "[" + ", ".join(parts) + "]"
+            expected = len(triples) - 1
+        corpus.append((text, expected))
+    return corpus
+
+
+def load_corpus(directories):
+    corpus = []
+    for directory in directories:
+        for path in Path(directory).rglob("*.txt"):
+            text = path.read_text(encoding="utf-8", errors="replace")
+            if text.strip():
+                corpus.append((text, None))
+    return corpus
+
+
+def run(name, parse, corpus):
+    files_ok = objects = 0
+    start = time.perf_counter()
+    for text, _ in corpus:
+        n = parse(text)
+        objects += n
+        files_ok += n > 0
+    elapsed = time.perf_counter() - start
+    size_mb = sum(len(text) for text, _ in corpus) / 1e6
+    print(f"{name:<16} {elapsed:8.3f}s  {size_mb / elapsed:8.2f} MB/s  {len(corpus) / elapsed:10.0f} files/s  "
+          f"files recovered {files_ok}/{len(corpus)}  objects {objects}")
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("directories", nargs="*",
+                        help="folders with LLM output .txt files; a synthetic corpus is used if none are given")
+    args = parser.parse_args()
+    corpus = load_corpus(args.directories) if args.directories else synthetic_corpus()
+    if not corpus:
+        print("No .txt files found.")
+        return
+    expected = sum(e for _, e in corpus if e is not None)
+    print(f"{len(corpus)} files, {sum(len(t) for t, _ in corpus) / 1e6:.1f} MB")
+    run("cascade", lambda text: count_objects(cascade_parse(text)), corpus)
+    run("parse_llm_json", lambda text: len(parse_llm_json(text)[0]), corpus)
+    if expected:
+        print(f"complete objects in synthetic corpus: {expected}")
+
+
+if __name__ == "__main__":
+    main()
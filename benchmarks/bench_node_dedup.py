@@ -0,0 +1,112 @@
+"""
+Peak memory and runtime of subNeo4j/csv_refine node merging: the previous in-memory version
+(applymap + drop_duplicates), the vectorized in-memory merge_and_deduplicate_nodes, and the
+out-of-core merge_and_deduplicate_nodes_chunked.
+
+Usage:
+    python benchmarks/bench_node_dedup.py [ROWS] [--chunksize N] [--partitions N] [--keep CSV]
+
+Writes a synthetic triple CSV of ROWS rows (default 10M) in the output_csv.csv format of
+json_2_csv.add_unique_id_to_csv, then runs every version in its own process so that each peak
+RSS is measured on its own. A version that runs out of memory is reported as failed.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SUBNEO4J = str(Path(__file__).resolve().parent.parent / "subNeo4j")
+
+VERSIONS = {
+    "applymap": """
+import pandas as pd
+df = pd.read_csv(INPUT)
+start_nodes = df[['start_node', 'start_node_id', 'start_node_label']].set_axis(['name', 'id:ID', 'label'], axis=1)
+end_nodes = df[['end_node', 'end_node_id', 'end_node_label']].set_axis(['name', 'id:ID', 'label'], axis=1)
+doi_nodes = df[['doi', 'end_node_id']].set_axis(['name', 'id:ID'], axis=1)
+doi_nodes['id:ID'] = doi_nodes['id:ID'] + 5000000
+doi_nodes['label'] = 'mention'
+combined_df = pd.concat([start_nodes, end_nodes, doi_nodes], ignore_index=True)
+normalize = getattr(combined_df, 'applymap', None) or combined_df.map  # applymap was removed in pandas 3
+combined_df = normalize(lambda x: x.lower().replace('_', ' ') if isinstance(x, str) else x)
+combined_df.drop_duplicates(subset='name', keep='first').to_csv(OUTPUT, index=False)
+""",
+    "vectorized": """
+import csv_refine
+csv_refine.merge_and_deduplicate_nodes(INPUT).to_csv(OUTPUT, index=False)
+""",
+    "chunked": """
+import csv_refine
+csv_refine.merge_and_deduplicate_nodes_chunked(INPUT, OUTPUT, chunksize=CHUNKSIZE, partitions=PARTITIONS)
+""",
+}
+
+
+def write_synthetic_triples(path, rows, seed=7, block=1_000_000):
+    """Triples over about rows / 5 distinct node names with Zipf-distributed frequencies, written in blocks."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"Node_Name_{i}" for i in range(max(rows // 5, 1))], dtype=object)
+    papers = np.array([f"Paper_{i}" for i in range(max(rows // 50, 1))], dtype=object)
+    for start in range(0, rows, block):
+        n = min(block, rows - start)
+        start_ids = (rng.zipf(1.2, n) - 1) % len(vocabulary)
+        end_ids = (rng.zipf(1.2, n) - 1) % len(vocabulary)
+        pd.DataFrame({"start_node": vocabulary[start_ids], "relationship": "has_property",
+                      "end_node": vocabulary[end_ids], "start_node_label": "Material",
+                      "end_node_label": "Property", "doi": papers[rng.integers(0, len(papers), n)],
+                      "start_node_id": start_ids + 1, "end_node_id": end_ids + 1}
+                     ).to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def run(name, code, input_path, output_path, chunksize, partitions):
+    script = (f"import sys; sys.path.insert(0, {SUBNEO4J!r})\n"
+              f"INPUT, OUTPUT, CHUNKSIZE, PARTITIONS = {str(input_path)!r}, {str(output_path)!r}, {chunksize}, {partitions}\n"
+              + code)
+    start = time.perf_counter()
+    with tempfile.TemporaryFile(mode="w+") as err:
+        process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.DEVNULL, stderr=err)
+        # wait4 reports the peak RSS of this child alone (KiB on Linux).
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+        err.seek(0)
+        error = err.read().strip()
+    if process.returncode != 0:
+        print(f"{name:<12} failed after {elapsed:.1f}s (exit code {process.returncode}): "
+              f"{error.splitlines()[-1] if error else 'killed'}")
+        return None
+    print(f"{name:<12} {elapsed:8.1f}s  peak RSS {usage.ru_maxrss / 1024:8.0f} MiB")
+    return pd.read_csv(output_path).astype(str).sort_values("name").reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("rows", nargs="?", type=int, default=10_000_000)
+    parser.add_argument("--chunksize", type=int, default=1_000_000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--keep", help="write the synthetic input here instead of a temporary file")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = Path(args.keep or os.path.join(tmp, "triples.csv"))
+        start = time.perf_counter()
+        write_synthetic_triples(input_path, args.rows)
+        print(f"{args.rows:,} rows, {input_path.stat().st_size / 1e6:,.0f} MB written in {time.perf_counter() - start:.1f}s")
+        results = {}
+        for name in ("applymap", "vectorized", "chunked"):
+            results[name] = run(name, VERSIONS[name], input_path, Path(tmp) / f"{name}.csv",
+                                args.chunksize, args.partitions)
+        finished = [r for r in results.values() if r is not None]
+        # The previous version has no value/unit/quantity columns; every pair is compared on the columns both have.
+        same = all(a[shared].equals(b[shared]) for i, a in enumerate(finished) for b in finished[i + 1:]
+                   for shared in [[c for c in a.columns if c in b.columns]])
+        print(f"same nodes: {same}")
+
+
+if __name__ == "__main__":
+    main()
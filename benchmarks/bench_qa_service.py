@@ -0,0 +1,107 @@
+"""
+Throughput of qa_service with stub LLM and graph backends: USERS simulated users, each asking
+QUESTIONS questions in its own session, against the service at several concurrency limits.
+
+Usage:
+    python benchmarks/bench_qa_service.py [--users N] [--questions N] [--llm-latency S] [--graph-latency S]
+
+The stub LLM sleeps asynchronously (like a remote API call) and the stub graph query sleeps in
+a worker thread (like a blocking Neo4j call), so the numbers show how well the service overlaps
+waiting, not model or database speed. The Q&A cache and local retrieval are turned off.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ["QA_CACHE_DISABLE"] = "1"
+os.environ["KG_LOCAL_RETRIEVAL"] = "0"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import kg_context  # noqa: E402
+import qa_service  # noqa: E402
+
+
+def stub_backends(llm_latency, graph_latency):
+    async def llm(messages):
+        await asyncio.sleep(llm_latency)
+        if messages[0]["content"].startswith("I am working with a Neo4j database"):
+            return "MATCH (a:Node)-[r]->(b:Node) WHERE a.name = 'x' RETURN a, r, b"
+        return f"answer to: {messages[-1]['content']}"
+
+    def run_query(cypher_query):
+        time.sleep(graph_latency)
+        return kg_context.ContextPacker().extend([{"a": "x", "relationship": "has", "b": "y"}])
+
+    return llm, run_query
+
+
+async def simulate(url, users, questions):
+    latencies, rejected = [], 0
+
+    async def user(session, number):
+        nonlocal rejected
+        session_id = None
+        for question in range(questions):
+            start = time.perf_counter()
+            async with session.post(f"{url}/ask", json={"question": f"user {number} question {question}",
+                                                        "session_id": session_id}) as response:
+                body = await response.json()
+            if response.status == 503:
+                rejected += 1
+                continue
+            session_id = body["session_id"]
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(session, n) for n in range(users)))
+        elapsed = time.perf_counter() - start
+        async with session.get(f"{url}/metrics") as response:
+            metrics = await response.json()
+    return elapsed, latencies, rejected, metrics
+
+
+async def run(concurrency, args):
+    llm, run_query = stub_backends(args.llm_latency, args.graph_latency)
+    service = qa_service.QAService(llm=llm, run_query=run_query, max_concurrency=concurrency,
+                                   max_queue=args.users, graph_workers=min(concurrency, 32))
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        elapsed, latencies, rejected, metrics = await simulate(f"http://127.0.0.1:{port}", args.users, args.questions)
+    finally:
+        await runner.cleanup()
+    latencies.sort()
+    print(f"concurrency {concurrency:>3}: {len(latencies) / elapsed:7.1f} questions/s, "
+          f"p50 {statistics.median(latencies):.2f}s, p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f}s, "
+          f"rejected {rejected}, max queued {metrics['admission']['max_queued']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    print(f"{args.users} users x {args.questions} questions, LLM {args.llm_latency}s per call (2 per question), "
+          f"graph {args.graph_latency}s per query")
+    for concurrency in args.concurrency:
+        asyncio.run(run(concurrency, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import os
+import time
+import asyncio
 import logging
+import threading
 import httpx
+from collections import namedtuple
+import llm_cache
 
 # --- Setup Logging ---
 # Provides visibility into which model is being called and any potential errors.
@@ -16,17 +21,45 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")  # Example for future extension
 
+# Base URLs can be overridden, e.g. to point at a local OpenAI-compatible stub server.
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+
+# --- Dispatcher Settings ---
+# Timeout (seconds) for a single completion request.
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "600"))
+# How many times a provider is retried after a 429 before falling back to the next provider.
+RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "5"))
+
 # --- Client Storage ---
 clients = {}
 
+# --- Response Cache ---
+# Opened on first use so importing this module doesn't create the cache file.
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Returns the process-wide ResponseCache, or None when caching is disabled."""
+    global _response_cache
+    if not llm_cache.CACHE_ENABLED:
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = llm_cache.ResponseCache()
+    return _response_cache
+
 # --- Initialize DeepSeek Client (OpenAI Compatible) ---
 if DEEPSEEK_API_KEY:
     try:
+        import openai  # noqa: F401  (checked here so a missing library skips the provider)
+
         clients['deepseek'] = {
-            "client": httpx.Client(),  # Placeholder, OpenAI client handles this
             "api_client": "openai",
+            "api_key": DEEPSEEK_API_KEY,
             "model": "deepseek-chat",
-            "instance": "https://api.deepseek.com"
+            "instance": DEEPSEEK_BASE_URL
         }
         logging.info("DeepSeek client configured.")
     except ImportError:
@@ -37,10 +70,15 @@ if DEEPSEEK_API_KEY:
 # --- Initialize OpenAI Client ---
 if OPENAI_API_KEY:
     try:
-        from openai import OpenAI
+        import openai  # noqa: F401
 
-        clients['openai'] = OpenAI(api_key=OPENAI_API_KEY)
-        logging.info("OpenAI client initialized.")
+        clients['openai'] = {
+            "api_client": "openai",
+            "api_key": OPENAI_API_KEY,
+            "model": "gpt-4-turbo",
+            "instance": OPENAI_BASE_URL
+        }
+        logging.info("OpenAI client configured.")
     except ImportError:
         logging.warning("OpenAI client could not be initialized. `openai` library is not installed.")
     except Exception as e:
@@ -73,62 +111,471 @@ if ANTHROPIC_API_KEY:
         logging.error(f"Error initializing Anthropic client: {e}")
 
 
-def _call_openai_compatible(client_name, messages, model, temperature):
-    """Handles calls to OpenAI and OpenAI-compatible APIs like DeepSeek."""
-    from openai import OpenAI
+class RateLimiter:
+    """
+    Per-provider concurrency and tokens-per-minute limiter.
+
+    Concurrency is bounded by a semaphore, the token budget by a token bucket that refills
+    continuously. A 429 from the provider pauses *all* requests to it via `cool_down`, so
+    concurrent callers wait together instead of each retrying on its own.
+    """
+
+    def __init__(self, max_concurrency, tokens_per_minute=0):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self._available = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire_tokens(self, tokens):
+        """Wait until `tokens` fit into the per-minute budget (no-op when the budget is 0)."""
+        if not self.tokens_per_minute:
+            return
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                refill = (now - self._updated) * self.tokens_per_minute / 60
+                self._available = min(self.tokens_per_minute, self._available + refill)
+                self._updated = now
+                if self._available >= tokens:
+                    self._available -= tokens
+                    return
+                await asyncio.sleep((tokens - self._available) * 60 / self.tokens_per_minute)
+
+    async def wait_cool_down(self):
+        delay = self._blocked_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self._blocked_until - time.monotonic()
+
+    def cool_down(self, seconds):
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+# Marks the end of a stream pulled across threads (StopAsyncIteration cannot cross a Future).
+_STREAM_END = object()
+
+
+async def _next_piece(stream):
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_END
+
+
+class Dispatcher:
+    """
+    Owns a background asyncio event loop shared by every thread in the process.
+
+    Pooled HTTP clients and rate limiters live on this loop, so connections (and their TLS
+    sessions) are reused across calls and the limits apply process-wide, no matter how many
+    worker threads call `send_message`.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.async_clients = {}
+        self.limiters = {}
+
+    @property
+    def loop(self):
+        with self._start_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="llm-dispatcher", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def submit(self, coro):
+        """Schedules a coroutine on the dispatcher loop and returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Runs a coroutine on the dispatcher loop and blocks the calling thread for its result."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None and running is self._loop:
+            coro.close()
+            raise RuntimeError("Blocking call made from the dispatcher loop; use `await asend_message(...)` instead.")
+        return self.submit(coro).result()
+
+    def iterate(self, stream):
+        """Iterates an async generator on the dispatcher loop from a blocking thread."""
+        try:
+            while True:
+                piece = self.run(_next_piece(stream))
+                if piece is _STREAM_END:
+                    return
+                yield piece
+        finally:
+            self.submit(stream.aclose())
+
+    async def aiterate(self, stream):
+        """Iterates an async generator on the dispatcher loop from any event loop."""
+        if asyncio.get_running_loop() is self._loop:
+            async for piece in stream:
+                yield piece
+            return
+        try:
+            while True:
+                piece = await asyncio.wrap_future(self.submit(_next_piece(stream)))
+                if piece is _STREAM_END:
+                    return
+                yield piece
+        finally:
+            self.submit(stream.aclose())
+
+    def limiter(self, provider):
+        key = provider["client_key"]
+        if key not in self.limiters:
+            self.limiters[key] = RateLimiter(provider.get("max_concurrency", 16),
+                                             provider.get("tokens_per_minute", 0))
+        return self.limiters[key]
+
+    def openai_client(self, client_key, max_connections):
+        """Returns the pooled AsyncOpenAI client for a provider, creating it on first use."""
+        if client_key not in self.async_clients:
+            from openai import AsyncOpenAI
+
+            config = clients[client_key]
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=REQUEST_TIMEOUT,
+            )
+            # Retries are handled by the dispatcher so 429s back off provider-wide.
+            self.async_clients[client_key] = AsyncOpenAI(api_key=config["api_key"], base_url=config.get("instance"),
+                                                         max_retries=0, http_client=http_client)
+        return self.async_clients[client_key]
+
+    def close(self):
+        """Closes pooled connections and stops the loop thread."""
+        if self._loop is None:
+            return
+        for client in self.async_clients.values():
+            self.submit(client.close()).result()
+        self.async_clients.clear()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+dispatcher = Dispatcher()
+
+
+def _load_tokenizer():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except ImportError:
+        logging.info("`tiktoken` is not installed; token counts are estimated from text length.")
+    except Exception as e:
+        logging.warning(f"Tokenizer could not be loaded, estimating token counts instead: {e}")
+    return None
+
+
+# Loaded on first use: tiktoken may need to fetch its encoding file.
+_tokenizer = False
+
+
+def count_tokens(text):
+    """Token count of `text` with tiktoken's cl100k_base when available, else about 4 characters per token."""
+    global _tokenizer
+    if _tokenizer is False:
+        _tokenizer = _load_tokenizer()
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def estimate_tokens(messages):
+    """Rough token estimate (about 4 characters per token) used for the per-minute budget."""
+    return sum(len(str(m.get('content', ''))) for m in messages) // 4 + 1
 
-    config = clients[client_name]
-    api_key = DEEPSEEK_API_KEY if client_name == 'deepseek' else OPENAI_API_KEY
 
-    client = OpenAI(api_key=api_key, base_url=config.get("instance"))
+def _retry_after(error, attempt):
+    """Seconds to back off after a 429: the server's Retry-After header, else exponential."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return min(60.0, 2.0 ** attempt)
+
 
-    completion = client.chat.completions.create(
-        model=config["model"],
+async def _call_openai_compatible(client_name, messages, model, temperature, max_connections=16):
+    """Handles calls to OpenAI and OpenAI-compatible APIs like DeepSeek."""
+    client = dispatcher.openai_client(client_name, max_connections)
+
+    completion = await client.chat.completions.create(
+        model=model,
         messages=messages,
         temperature=temperature
     )
     return completion.choices[0].message.content
 
 
-def _call_google_gemini(client, messages, temperature):
+async def _call_google_gemini(client, messages, temperature):
     """Handles calls to Google's Gemini API."""
     # Gemini uses a slightly different message format and response structure.
-    response = client.generate_content(messages)
+    response = await client.generate_content_async(messages)
     return response.text
 
 
+async def _stream_openai_compatible(client_name, messages, model, temperature, max_connections=16):
+    """Streaming variant of `_call_openai_compatible`: yields the text deltas as they arrive."""
+    client = dispatcher.openai_client(client_name, max_connections)
+
+    stream = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        stream=True
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+async def _stream_google_gemini(client, messages, temperature):
+    """Streaming variant of `_call_google_gemini`."""
+    response = await client.generate_content_async(messages, stream=True)
+    async for chunk in response:
+        if chunk.text:
+            yield chunk.text
+
+
 LLM_PROVIDERS = [
     {
         "name": "DeepSeek-V3",
         "client_key": "deepseek",
         "call_function": _call_openai_compatible,
-        "model": "deepseek-chat"  # As per DeepSeek documentation
+        "stream_function": _stream_openai_compatible,
+        "model": "deepseek-chat",  # As per DeepSeek documentation
+        "max_concurrency": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "32")),
+        "tokens_per_minute": int(os.getenv("DEEPSEEK_TPM", "0")),  # 0 = unlimited
+        "context_window": 64000,
+        "max_output_tokens": 8192
     },
     {
         "name": "OpenAI GPT-4",
         "client_key": "openai",
         "call_function": _call_openai_compatible,
-        "model": "gpt-4-turbo"  # Example model, can be changed
+        "stream_function": _stream_openai_compatible,
+        "model": "gpt-4-turbo",  # Example model, can be changed
+        "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "16")),
+        "tokens_per_minute": int(os.getenv("OPENAI_TPM", "0")),
+        "context_window": 128000,
+        "max_output_tokens": 4096
     },
     {
         "name": "Google Gemini Pro",
         "client_key": "gemini",
         "call_function": _call_google_gemini,
-        "model": "gemini-pro"
+        "stream_function": _stream_google_gemini,
+        "model": "gemini-pro",
+        "max_concurrency": int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+        "tokens_per_minute": int(os.getenv("GEMINI_TPM", "0")),
+        "context_window": 32760,
+        "max_output_tokens": 8192
     }
 ]
 
+# Output tokens expected per input token when extracting triples; sizes chunks so the answer fits.
+EXPECTED_OUTPUT_RATIO = float(os.getenv("LLM_EXPECTED_OUTPUT_RATIO", "0.6"))
+# Headroom for chat formatting tokens and tokenizer differences between providers.
+TOKEN_SAFETY_MARGIN = 256
+
+
+def chunk_token_budget(system_prompt, output_ratio=EXPECTED_OUTPUT_RATIO):
+    """
+    Largest user-message size (in tokens) that every usable provider can take with `system_prompt`.
 
-def send_message(messages, temperature=0.7):
+    Chunks can go to any provider in the fallback chain, so the smallest budget wins. For each
+    provider the input must leave room for the expected output (`output_ratio` per input token)
+    within both the context window and the provider's output limit.
+    """
+    providers = [p for p in LLM_PROVIDERS if p["client_key"] in clients] or LLM_PROVIDERS
+    prompt_tokens = count_tokens(system_prompt)
+    budgets = []
+    for provider in providers:
+        room = provider["context_window"] - prompt_tokens - TOKEN_SAFETY_MARGIN
+        budget = room / (1 + output_ratio)
+        if output_ratio > 0:
+            budget = min(budget, provider["max_output_tokens"] / output_ratio)
+        budgets.append(int(budget))
+    return max(min(budgets), 1)
+
+
+def _is_rate_limit(error):
+    return getattr(error, "status_code", None) == 429
+
+
+async def _call_provider(provider, messages, temperature):
+    """Calls one provider under its rate limiter, backing off provider-wide on 429 responses."""
+    limiter = dispatcher.limiter(provider)
+    client_key = provider["client_key"]
+    attempt = 0
+    while True:
+        await limiter.wait_cool_down()
+        await limiter.acquire_tokens(estimate_tokens(messages))
+        async with limiter.semaphore:
+            limiter.in_flight += 1
+            try:
+                # For OpenAI-compatible clients, we pass the name to handle different configs
+                if provider["call_function"] == _call_openai_compatible:
+                    return await provider["call_function"](client_key, messages, provider["model"], temperature,
+                                                           limiter.max_concurrency)
+                return await provider["call_function"](clients[client_key], messages, temperature)
+            except Exception as e:
+                if not _is_rate_limit(e) or attempt >= RATE_LIMIT_RETRIES:
+                    raise
+                delay = _retry_after(e, attempt)
+                logging.warning(f"{provider['name']} rate limited, pausing provider for {delay:.1f}s.")
+                limiter.cool_down(delay)
+                attempt += 1
+            finally:
+                limiter.in_flight -= 1
+
+
+async def _stream_provider(provider, messages, temperature):
+    """
+    Streaming counterpart of `_call_provider`. The provider's slot is held until the stream ends;
+    429 responses are retried only before the first token, since text already yielded cannot be
+    taken back.
+    """
+    limiter = dispatcher.limiter(provider)
+    client_key = provider["client_key"]
+    attempt = 0
+    while True:
+        await limiter.wait_cool_down()
+        await limiter.acquire_tokens(estimate_tokens(messages))
+        started = False
+        async with limiter.semaphore:
+            limiter.in_flight += 1
+            try:
+                if provider["stream_function"] == _stream_openai_compatible:
+                    stream = provider["stream_function"](client_key, messages, provider["model"], temperature,
+                                                         limiter.max_concurrency)
+                else:
+                    stream = provider["stream_function"](clients[client_key], messages, temperature)
+                async for piece in stream:
+                    started = True
+                    yield piece
+                return
+            except Exception as e:
+                if started or not _is_rate_limit(e) or attempt >= RATE_LIMIT_RETRIES:
+                    raise
+                delay = _retry_after(e, attempt)
+                logging.warning(f"{provider['name']} rate limited, pausing provider for {delay:.1f}s.")
+                limiter.cool_down(delay)
+                attempt += 1
+            finally:
+                limiter.in_flight -= 1
+
+
+# Result of one request: the text plus which provider produced it and how long it took.
+LLMResult = namedtuple("LLMResult", ["content", "provider", "cached", "latency"])
+
+
+def _available_providers():
+    for provider in LLM_PROVIDERS:
+        # Check if the client for this provider was successfully initialized
+        if provider["client_key"] not in clients:
+            logging.warning(f"Skipping {provider['name']} because its client is not available.")
+            continue
+        yield provider
+
+
+def _cached_response(cache, providers, messages, temperature):
+    """One cache lookup per request over the keys of every provider in the chain: (position, response)."""
+    if cache is None or not providers:
+        return None, None
+    keys = [llm_cache.make_key(messages, p["client_key"], p["model"], temperature) for p in providers]
+    position, cached = cache.get_first(keys)
+    if cached is not None:
+        logging.info(f"Cache hit for {providers[position]['name']}.")
+    return position, cached
+
+
+async def _asend_message(messages, temperature, use_cache=True):
+    start = time.monotonic()
+    cache = get_response_cache() if use_cache else None
+    providers = list(_available_providers())
+
+    # A response from any provider in the chain counts, so a paper answered by a fallback
+    # provider last time is not re-sent to the primary one.
+    position, cached = _cached_response(cache, providers, messages, temperature)
+    if cached is not None:
+        return LLMResult(cached, providers[position]["name"], True, time.monotonic() - start)
+
+    for provider in providers:
+        provider_name = provider["name"]
+        try:
+            logging.info(f"Attempting to call {provider_name}...")
+            response = await _call_provider(provider, messages, temperature)
+            logging.info(f"Successfully received response from {provider_name}.")
+            if cache is not None and response:
+                cache.put(llm_cache.make_key(messages, provider["client_key"], provider["model"], temperature),
+                          response)
+            return LLMResult(response, provider_name, False, time.monotonic() - start)
+
+        except Exception as e:
+            logging.error(f"Failed to call {provider_name}. Error: {e}")
+            # The loop will automatically continue to the next provider
+            continue
+
+    # This part is reached only if all providers in the loop have failed
+    raise RuntimeError("All LLM providers failed to generate a response.")
+
+
+async def asend_message(messages, temperature=0.7, use_cache=True):
+    """
+    Async version of `send_message`. Can be awaited from any event loop; the request itself
+    always runs on the dispatcher loop so the shared connection pools and limits apply.
+
+    Args:
+        messages (list): A list of message dictionaries (e.g., [{'role': 'user', 'content': '...'}])
+        temperature (float): The generation temperature.
+        use_cache (bool): Look up and store the response in the on-disk response cache.
+
+    Returns:
+        str: The content of the successful response.
+
+    Raises:
+        RuntimeError: If all configured LLM providers fail to respond.
+    """
+    if asyncio.get_running_loop() is dispatcher.loop:
+        return (await _asend_message(messages, temperature, use_cache)).content
+    return (await asyncio.wrap_future(dispatcher.submit(_asend_message(messages, temperature, use_cache)))).content
+
+
+def send_message(messages, temperature=0.7, use_cache=True):
     """
     Sends a message to a series of LLM providers with a fallback mechanism.
 
     It tries to call the providers in the order defined in LLM_PROVIDERS.
     If a call fails, it logs the error and automatically tries the next provider.
+    Calls from any thread are executed on the shared dispatcher loop, so they reuse
+    pooled connections and respect the per-provider limits. Identical requests
+    (same normalized messages, provider, model and temperature) are answered from the
+    on-disk response cache in `llm_cache`.
 
     Args:
         messages (list): A list of message dictionaries (e.g., [{'role': 'user', 'content': '...'}])
         temperature (float): The generation temperature.
+        use_cache (bool): Look up and store the response in the response cache.
 
     Returns:
         str: The content of the successful response.
@@ -136,56 +583,125 @@ def send_message(messages, temperature=0.7):
     Raises:
         RuntimeError: If all configured LLM providers fail to respond.
     """
-    for provider in LLM_PROVIDERS:
-        provider_name = provider["name"]
-        client_key = provider["client_key"]
+    return dispatcher.run(_asend_message(messages, temperature, use_cache)).content
 
-        # Check if the client for this provider was successfully initialized
-        if client_key not in clients:
-            logging.warning(f"Skipping {provider_name} because its client is not available.")
-            continue
-
-        try:
-            logging.info(f"Attempting to call {provider_name}...")
-            client_instance = clients[client_key]
 
-            # For OpenAI-compatible clients, we pass the name to handle different configs
-            if provider["call_function"] == _call_openai_compatible:
-                response = provider["call_function"](client_key, messages, provider["model"], temperature)
-            else:
-                response = provider["call_function"](client_instance, messages, temperature)
+async def _astream_message(messages, temperature, use_cache=True):
+    cache = get_response_cache() if use_cache else None
+    providers = list(_available_providers())
 
-            logging.info(f"Successfully received response from {provider_name}.")
-            return response
+    _, cached = _cached_response(cache, providers, messages, temperature)
+    if cached is not None:
+        yield cached
+        return
 
+    for provider in providers:
+        provider_name = provider["name"]
+        pieces = []
+        try:
+            logging.info(f"Attempting to stream from {provider_name}...")
+            async for piece in _stream_provider(provider, messages, temperature):
+                pieces.append(piece)
+                yield piece
         except Exception as e:
-            logging.error(f"Failed to call {provider_name}. Error: {e}")
-            # The loop will automatically continue to the next provider
+            if pieces:
+                # Text was already yielded: another provider would repeat it, so the stream fails.
+                logging.error(f"{provider_name} failed after {len(pieces)} chunks. Error: {e}")
+                raise RuntimeError(f"{provider_name} failed while streaming the response.") from e
+            logging.error(f"Failed to stream from {provider_name}. Error: {e}")
             continue
+        logging.info(f"Successfully streamed response from {provider_name}.")
+        if cache is not None and pieces:
+            cache.put(llm_cache.make_key(messages, provider["client_key"], provider["model"], temperature),
+                      "".join(pieces))
+        return
 
-    # This part is reached only if all providers in the loop have failed
     raise RuntimeError("All LLM providers failed to generate a response.")
 
 
+async def astream_message(messages, temperature=0.7, use_cache=True):
+    """
+    Streaming version of `asend_message`: an async iterator over the response text as the
+    provider produces it. Providers are tried in order like in `send_message`; a provider that
+    fails before its first chunk falls back to the next one, a failure after that raises
+    RuntimeError. Cached responses are yielded in one piece.
+
+    Can be iterated from any event loop; the stream itself runs on the dispatcher loop.
+    """
+    async for piece in dispatcher.aiterate(_astream_message(messages, temperature, use_cache)):
+        yield piece
+
+
+def stream_message(messages, temperature=0.7, use_cache=True):
+    """
+    Streaming version of `send_message` for synchronous code: a generator over the response text.
+    Fallback and caching work as in `astream_message`.
+
+    Example:
+        for piece in stream_message(messages):
+            print(piece, end="", flush=True)
+    """
+    return dispatcher.iterate(_astream_message(messages, temperature, use_cache))
+
+
+def submit_message(messages, temperature=0.7, use_cache=True):
+    """
+    Non-blocking `send_message` for worker code that wants to handle results as they complete.
+
+    Returns:
+        concurrent.futures.Future: Resolves to an `LLMResult` (content, provider, cached, latency),
+            or raises RuntimeError if all providers fail.
+    """
+    return dispatcher.submit(_asend_message(messages, temperature, use_cache))
+
+
+def send_batch(message_lists, temperature=0.7, return_exceptions=True, use_cache=True):
+    """
+    Sends many independent conversations concurrently through the dispatcher.
+
+    Args:
+        message_lists (list): A list of `messages` lists, one per request.
+        temperature (float): The generation temperature.
+        return_exceptions (bool): If True, a failed request yields its exception in the result
+            list instead of cancelling the batch.
+        use_cache (bool): Look up and store responses in the response cache.
+
+    Returns:
+        list: Responses (or exceptions) in the same order as `message_lists`.
+    """
+    async def _gather():
+        results = await asyncio.gather(*(_asend_message(m, temperature, use_cache) for m in message_lists),
+                                       return_exceptions=return_exceptions)
+        return [r.content if isinstance(r, LLMResult) else r for r in results]
+
+    return dispatcher.run(_gather())
+
+
 def chat_with_model():
     """A simple multi-turn conversation loop to demonstrate the fallback mechanism."""
-    chat_history = []
+    from chat_history import ChatHistory  # chat_history imports this module
+
+    # History is kept within a token budget; the oldest turns are evicted first, their questions summarized.
+    chat_history = ChatHistory(context_share=0)
     while True:
         user_input = input("You: ")
         if user_input.lower() in ["exit", "quit"]:
             print("Exiting chat.")
             break
 
-        chat_history.append({'role': 'user', 'content': user_input})
-
         try:
             # Call the robust send_message function
-            model_response = send_message(chat_history)
-
-            print(f"Assistant: {model_response}")
+            # Print the reply as it is generated
+            print("Assistant: ", end="", flush=True)
+            pieces = []
+            for piece in stream_message(chat_history.messages(user_input)):
+                print(piece, end="", flush=True)
+                pieces.append(piece)
+            print()
+            model_response = "".join(pieces)
 
             # Add the model's response to the history for context
-            chat_history.append({'role': 'assistant', 'content': model_response})
+            chat_history.add_turn(user_input, model_response)
 
         except RuntimeError as e:
             print(f"Error: {e}")
@@ -200,4 +716,4 @@ if __name__ == "__main__":
     print("Starting chat session with LLM fallback system.")
     print("Set your API keys as environment variables: DEEPSEEK_API_KEY, OPENAI_API_KEY, GOOGLE_API_KEY")
     print("Enter 'exit' or 'quit' to end the session.")
-    chat_with_model()
\ No newline at end of file
+    chat_with_model()
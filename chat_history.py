@@ -0,0 +1,108 @@
+import os
+import logging
+
+import chat_client as cc
+
+# --- History Settings ---
+# Tokens kept free for the model's answer when sizing the prompt.
+ANSWER_TOKENS = int(os.getenv("CHAT_ANSWER_TOKENS", "2048"))
+# Upper bound of the prompt even when every provider could take more: long prompts cost latency.
+MAX_PROMPT_TOKENS = int(os.getenv("CHAT_MAX_PROMPT_TOKENS", "24000"))
+# Share of the prompt reserved for graph context (the system prompt with the query results).
+CONTEXT_SHARE = float(os.getenv("CHAT_CONTEXT_SHARE", "0.5"))
+# Size of the running summary of turns that no longer fit.
+SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+# Characters of an evicted question kept in the summary.
+SUMMARY_QUESTION_CHARS = 200
+
+
+def prompt_token_budget(answer_tokens=ANSWER_TOKENS, max_tokens=MAX_PROMPT_TOKENS):
+    """
+    Prompt size (in tokens) every usable provider can take while leaving `answer_tokens` for the
+    answer. Any provider in the fallback chain may get the request, so the smallest wins.
+    """
+    providers = [p for p in cc.LLM_PROVIDERS if p["client_key"] in cc.clients] or cc.LLM_PROVIDERS
+    budget = min(p["context_window"] - min(answer_tokens, p["max_output_tokens"]) - cc.TOKEN_SAFETY_MARGIN
+                 for p in providers)
+    return max(min(budget, max_tokens), 1)
+
+
+class ChatHistory:
+    """
+    Conversation history that fits a token budget.
+
+    Turns are kept whole (question and answer). When the prompt would exceed the budget, the oldest
+    turns are evicted and their questions go into a short running summary ("Earlier the user
+    asked: ..."), which is itself capped at SUMMARY_TOKENS. A fixed share of the budget
+    (`context_share`) is reserved for graph context, so retrieval results cannot crowd out the
+    conversation and vice versa.
+    """
+
+    def __init__(self, budget=None, context_share=CONTEXT_SHARE, summary_tokens=SUMMARY_TOKENS):
+        self.budget = budget or prompt_token_budget()
+        self.context_share = context_share
+        self.summary_tokens = summary_tokens
+        self.turns = []  # [(user, assistant, tokens)]
+        self.summary = []  # questions of evicted turns, oldest first
+        self.evicted = 0
+
+    @property
+    def context_tokens(self):
+        """Tokens reserved for graph context."""
+        return int(self.budget * self.context_share)
+
+    def fit_context(self, text):
+        """Cuts graph context to the reserved share, at line boundaries."""
+        if cc.count_tokens(text) <= self.context_tokens:
+            return text
+        lines, used = [], 0
+        for line in text.split("\n"):
+            tokens = cc.count_tokens(line) + 1
+            if used + tokens > self.context_tokens:
+                break
+            lines.append(line)
+            used += tokens
+        logging.info(f"Graph context cut to {used} tokens ({len(lines)} lines).")
+        return "\n".join(lines)
+
+    def add_turn(self, user, assistant):
+        self.turns.append((user, assistant, cc.count_tokens(user) + cc.count_tokens(assistant or "")))
+
+    def _summary_message(self):
+        if not self.summary:
+            return None
+        return {'role': 'system', 'content': "Earlier in this conversation the user asked: " + "; ".join(self.summary)}
+
+    def _evict_oldest(self):
+        user, _, _ = self.turns.pop(0)
+        self.evicted += 1
+        self.summary.append(user[:SUMMARY_QUESTION_CHARS])
+        while len(self.summary) > 1 and cc.count_tokens("; ".join(self.summary)) > self.summary_tokens:
+            self.summary.pop(0)
+
+    def messages(self, user, system=None):
+        """
+        Prompt for the next turn: system prompt, summary of evicted turns, the most recent turns
+        that fit, and the new user message. Graph context in `system` should already be cut with
+        fit_context; the conversation gets the rest of the budget.
+        """
+        fixed = cc.count_tokens(user) + (cc.count_tokens(system) if system else 0)
+        history_budget = self.budget - max(fixed, self.context_tokens if system else 0)
+        while self.turns:
+            summary = self._summary_message()
+            used = sum(t[2] for t in self.turns) + (cc.count_tokens(summary['content']) if summary else 0)
+            if used <= history_budget:
+                break
+            self._evict_oldest()
+        messages = [{'role': 'system', 'content': system}] if system else []
+        summary = self._summary_message()
+        if summary:
+            messages.append(summary)
+        for turn_user, turn_assistant, _ in self.turns:
+            messages.append({'role': 'user', 'content': turn_user})
+            messages.append({'role': 'assistant', 'content': turn_assistant})
+        messages.append({'role': 'user', 'content': user})
+        return messages
+
+    def __len__(self):
+        return len(self.turns)
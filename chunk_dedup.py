@@ -0,0 +1,85 @@
+import os
+import re
+import zlib
+import numpy as np
+
+# --- MinHash / LSH Settings ---
+# 16 bands of 8 rows put the LSH candidate threshold near a Jaccard similarity of 0.7;
+# candidates are then confirmed against DUPLICATE_THRESHOLD on the full signature.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+DUPLICATE_THRESHOLD = float(os.getenv("EXTRACT_DEDUP_THRESHOLD", "0.8"))
+DEDUP_ENABLED = os.getenv("EXTRACT_DEDUP", "1").lower() not in ("0", "false", "no")
+
+# Universal hashing (a * x + b) mod p over the Mersenne prime 2**31 - 1: with a, x < 2**31 the
+# product stays below 2**62, so uint64 math can't overflow.
+_PRIME = np.uint64((1 << 31) - 1)
+# Fixed seed: signatures must agree between worker processes and across runs.
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_PERM_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_WORD = re.compile(r"\w+")
+
+
+def minhash(text):
+    """
+    MinHash signature over the word 5-gram shingles of `text`.
+
+    :return: numpy uint64 array of NUM_PERM values, or None if the text is too short to shingle
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return None
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    hashes %= _PRIME
+    return ((np.outer(_PERM_A, hashes) + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    LSH index over MinHash signatures of extraction chunks.
+
+    `query` returns the key of an indexed chunk whose estimated Jaccard similarity is at least
+    `threshold`, without comparing against every chunk seen so far.
+    """
+
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(BANDS)]
+        self.signatures = {}
+
+    def _bands(self, signature):
+        for band in range(BANDS):
+            yield band, signature[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def query(self, signature):
+        """Key of the most similar indexed chunk at or above the threshold, else None."""
+        if signature is None:
+            return None
+        candidates = set()
+        for band, band_key in self._bands(signature):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        best_key, best_score = None, self.threshold
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def add(self, key, signature):
+        if signature is None or key in self.signatures:
+            return
+        self.signatures[key] = signature
+        for band, band_key in self._bands(signature):
+            self.buckets[band].setdefault(band_key, []).append(key)
+
+    def __len__(self):
+        return len(self.signatures)
@@ -0,0 +1,146 @@
+import os
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+import graph_index
+from graph_index import tokenize
+from subNeo4j.entity_canonical import (ABBREVIATION_LABELS, ABBREVIATION_RELATIONSHIPS, CANONICAL_MAP_PATH,
+                                       MIN_TYPO_WORD_LENGTH, looks_like_abbreviation, one_edit_apart)
+
+# --- Entity Linking Settings ---
+# Longest alias (in tokens) looked for in a question.
+MAX_ALIAS_TOKENS = 6
+
+
+def _deletes(token):
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def _singular_forms(token):
+    if token.endswith("ies") and len(token) > 4:
+        yield token[:-3] + "y"
+    if token.endswith("es") and len(token) > 4:
+        yield token[:-2]
+    if token.endswith("s") and len(token) > 3:
+        yield token[:-1]
+
+
+class EntityLinker:
+    """
+    Maps the entity mentions of a question to nodes of a graph_index.GraphIndex, tolerating what
+    exact `a.name = "..."` matching misses:
+
+    - plurals and one-character typos in words of MIN_TYPO_WORD_LENGTH+ letters, corrected against
+      the vocabulary of node-name tokens with a deletion-neighbourhood index (every vocabulary
+      word under each of its one-letter deletions), so a lookup is a few dict probes;
+    - abbreviations and variant spellings: the renames in canonical_map.csv (entity_canonical)
+      and abbreviation edges still in the graph ("rfb" is "redox flow battery").
+    """
+
+    def __init__(self, index, canonical_map=None):
+        """
+        :param index: graph_index.GraphIndex
+        :param canonical_map: DataFrame of name, canonical (entity_canonical.build_canonical_map), optional
+        """
+        self.index = index
+        frequency = np.diff(index.token_indptr)
+        self.vocabulary = {token: frequency[i] for token, i in index.token_ids.items()}
+        self.deletes = {}
+        for token in self.vocabulary:
+            if len(token) >= MIN_TYPO_WORD_LENGTH and token.isalpha():
+                for variant in _deletes(token):
+                    self.deletes.setdefault(variant, []).append(token)
+        self.aliases = self._build_aliases(canonical_map)
+
+    def _build_aliases(self, canonical_map):
+        """alias key (tokens joined by spaces) -> node index."""
+        keys = pd.Series(self.index.names).str.lower().str.findall(graph_index.TOKEN.pattern).str.join(" ")
+        node_of_key = pd.Series(np.arange(len(keys)), index=keys.to_numpy())
+        node_of_key = node_of_key[~node_of_key.index.duplicated()]
+        pairs = []
+        if canonical_map is not None and not canonical_map.empty:
+            pairs.append(canonical_map[["name", "canonical"]].astype(str).to_numpy())
+        # Abbreviation edges still in the graph (when canonicalization is off): "rfb" -is-> "redox flow battery"
+        index = self.index
+        abbreviation_labels = [i for i, label in enumerate(index.label_names) if label.lower() in ABBREVIATION_LABELS]
+        relationship_codes = [i for i, name in enumerate(index.relationship_names)
+                              if name.lower() in ABBREVIATION_RELATIONSHIPS]
+        edges = np.flatnonzero(np.isin(index.relationship, relationship_codes)
+                               & np.isin(index.labels[index.start], abbreviation_labels))
+        pairs.append(np.column_stack([index.names[index.start[edges]], index.names[index.end[edges]]]))
+        aliases = {}
+        for alias, canonical in np.concatenate(pairs):
+            alias_key, canonical_key = " ".join(tokenize(alias)), " ".join(tokenize(canonical))
+            if alias_key and canonical_key in node_of_key.index and alias_key != canonical_key:
+                if len(alias_key.split(" ")) > 1 or looks_like_abbreviation(alias_key, canonical_key) \
+                        or alias_key not in self.vocabulary:
+                    aliases.setdefault(alias_key, int(node_of_key[canonical_key]))
+        return aliases
+
+    def correct(self, token):
+        """The vocabulary token `token` stands for (itself, its singular, or a one-typo neighbour), or None."""
+        if token in self.vocabulary:
+            return token
+        for singular in _singular_forms(token):
+            if singular in self.vocabulary:
+                return singular
+        if len(token) < MIN_TYPO_WORD_LENGTH or not token.isalpha() or token in graph_index.STOPWORDS:
+            return None
+        candidates = set(self.deletes.get(token, ()))  # token is a vocabulary word with one letter missing
+        for variant in _deletes(token):
+            if variant in self.vocabulary:  # token has one extra letter
+                candidates.add(variant)
+            candidates.update(self.deletes.get(variant, ()))  # one letter substituted (or two letters swapped)
+        candidates = [c for c in candidates if one_edit_apart(c, token)]
+        if not candidates:
+            return None
+        # Several candidates: take the most frequent word.
+        return max(candidates, key=lambda c: (self.vocabulary[c], c))
+
+    def link(self, question, max_mentions=graph_index.MAX_MENTIONS):
+        """
+        Node indices of the entities mentioned in `question`: aliases first, then nodes whose name
+        tokens all occur in the corrected question (GraphIndex.resolve).
+
+        :return: int array of node indices
+        """
+        tokens = [self.correct(t) or t for t in tokenize(question)]
+        linked = []
+        for size in range(min(MAX_ALIAS_TOKENS, len(tokens)), 0, -1):
+            for start in range(len(tokens) - size + 1):
+                node = self.aliases.get(" ".join(tokens[start:start + size]))
+                if node is not None and node not in linked:
+                    linked.append(node)
+        for node in self.index.resolve(" ".join(tokens), max_mentions).tolist():
+            if node not in linked:
+                linked.append(node)
+        return np.asarray(linked[:max_mentions], dtype=np.int32)
+
+
+def read_canonical_map(path=CANONICAL_MAP_PATH):
+    """canonical_map.csv written by json_2_csv, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+# --- Process-wide Linker ---
+# Rebuilt whenever graph_index reloads the import files.
+_linker = None
+_linker_lock = threading.Lock()
+
+
+def get_entity_linker():
+    """Returns the EntityLinker of the current graph index, or None if there is no index."""
+    global _linker
+    index = graph_index.get_graph_index()
+    if index is None:
+        return None
+    with _linker_lock:
+        if _linker is None or _linker.index is not index:
+            _linker = EntityLinker(index, read_canonical_map())
+            logging.info(f"Entity linker built: {len(_linker.vocabulary)} words, {len(_linker.aliases)} aliases.")
+    return _linker
@@ -0,0 +1,108 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+# A chunk that has failed this many times is left alone until the manifest is edited or deleted.
+MAX_CHUNK_ATTEMPTS = int(os.getenv("EXTRACT_MAX_CHUNK_ATTEMPTS", "5"))
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+
+def chunk_hash(prompt, chunk_text):
+    """Identifies a chunk by the prompt and text sent for it, so prompt edits re-run the chunk."""
+    digest = hashlib.sha256()
+    digest.update(prompt.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(chunk_text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class DocumentManifest:
+    """
+    Per-document record of extraction progress, stored as `manifest.json` in the document's output directory.
+
+    For every chunk it keeps the chunk hash, its page range, status, number of attempts, the provider
+    that answered, the latency and the last error. The file is rewritten atomically after each chunk,
+    so a killed run resumes from the last finished chunk.
+    """
+
+    FILENAME = "manifest.json"
+
+    def __init__(self, output_dir, source):
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / self.FILENAME
+        self.data = {"source": str(source), "chunks": {}}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                # A corrupt manifest only costs a re-run of this document.
+                pass
+        self.data["source"] = str(source)
+
+    def output_path(self, index):
+        return self.output_dir / f"{index}.txt"
+
+    def entry(self, index):
+        return self.data["chunks"].get(str(index))
+
+    def needs_run(self, index, hash_value):
+        """True if chunk `index` with this hash has no finished output and has attempts left."""
+        entry = self.entry(index)
+        if entry is None or entry.get("hash") != hash_value:
+            return True
+        if entry.get("status") == DONE:
+            return not self.output_path(index).exists()
+        return entry.get("attempts", 0) < MAX_CHUNK_ATTEMPTS
+
+    def register(self, index, hash_value, first_page=None, last_page=None):
+        """Records chunk `index` as currently chunked; an entry whose hash changed restarts from zero attempts."""
+        entry = self.entry(index)
+        if entry is None or entry.get("hash") != hash_value:
+            entry = {"hash": hash_value, "status": PENDING, "attempts": 0}
+            self.data["chunks"][str(index)] = entry
+        if (entry.get("first_page"), entry.get("last_page")) != (first_page, last_page):
+            entry.update(first_page=first_page, last_page=last_page)
+            self.save()
+
+    def truncate(self, chunk_count):
+        """Drops entries (and outputs) for chunks past the end of the current chunking."""
+        stale = [key for key in self.data["chunks"] if int(key) >= chunk_count]
+        for key in stale:
+            del self.data["chunks"][key]
+            self.output_path(key).unlink(missing_ok=True)
+        if stale:
+            self.save()
+
+    def mark_done(self, index, provider, latency, cached=False, duplicate_of=None):
+        """Records a finished chunk; `duplicate_of` names the chunk ("source#index") whose output was reused."""
+        entry = self.data["chunks"][str(index)]
+        entry.update(status=DONE, attempts=entry.get("attempts", 0) + 1, provider=provider,
+                     latency=round(latency, 3), cached=cached, finished=time.time())
+        entry.pop("error", None)
+        entry.pop("duplicate_of", None)
+        if duplicate_of is not None:
+            entry["duplicate_of"] = duplicate_of
+        self.save()
+
+    def mark_failed(self, index, error):
+        entry = self.data["chunks"][str(index)]
+        entry.update(status=FAILED, attempts=entry.get("attempts", 0) + 1, error=str(error), finished=time.time())
+        self.save()
+
+    def counts(self):
+        counts = {PENDING: 0, DONE: 0, FAILED: 0}
+        for entry in self.data["chunks"].values():
+            counts[entry.get("status", PENDING)] += 1
+        return counts
+
+    def save(self):
+        tmp_path = self.path.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,185 @@
+import os
+import re
+import time
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+import graph_update
+
+# --- Local Retrieval Settings ---
+LOCAL_RETRIEVAL_ENABLED = os.getenv("KG_LOCAL_RETRIEVAL", "1").lower() not in ("0", "false", "no")
+# The import files of the current build (same as main.py).
+NODE_FILE = os.getenv("KG_NODE_FILE", "C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/node_new.csv")
+RELATION_FILE = os.getenv("KG_RELATION_FILE", "C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/relation_new.csv")
+# Hops around the mentioned entities. One hop is what the generated Cypher asks for in most questions.
+HOPS = int(os.getenv("KG_LOCAL_HOPS", "1"))
+# Edges collected per hop at most, so a hub node cannot blow up a query.
+MAX_EDGES = int(os.getenv("KG_LOCAL_MAX_EDGES", "20000"))
+# Entities resolved per question at most, longest names first.
+MAX_MENTIONS = 10
+
+# Questions that filter, count or rank need real Cypher; neighborhoods cannot answer them.
+NEEDS_CYPHER = re.compile(r"\b(?:how many|count|number of|most|least|top \d+|average|mean|more than|less than|"
+                          r"greater|higher|lower|between|at least|at most|maximum|minimum)\b|[<>=]", re.IGNORECASE)
+
+TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+STOPWORDS = {"a", "an", "the", "of", "for", "in", "on", "and", "or", "to", "with", "by", "is", "are", "was",
+              "were", "be", "what", "which", "who", "how", "does", "do", "did", "that", "this", "it", "its"}
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+def _gather(indptr, rows):
+    """Positions of all CSR entries of `rows`, without a Python loop."""
+    starts = indptr[rows]
+    counts = indptr[rows + 1] - starts
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+def _csr(keys, size):
+    """CSR over `keys` (row of each entry): entry order sorted by row, and the row pointer array."""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=indptr[1:])
+    return order, indptr
+
+
+class GraphIndex:
+    """
+    In-process read-only copy of the graph for retrieval without Neo4j.
+
+    Nodes are numbered 0..n-1 in id order. Relationships are held twice as CSR adjacency (by start
+    and by end node) over int32 arrays, so k-hop neighborhoods in either direction are a few
+    array gathers. Names are held in an inverted token index (token -> nodes, also CSR), used to
+    find the entities a question mentions.
+    """
+
+    def __init__(self, nodes, relationships):
+        """
+        :param nodes: DataFrame from graph_update.read_nodes
+        :param relationships: DataFrame from graph_update.read_relationships
+        """
+        nodes = nodes.sort_values("id")
+        self.ids = nodes["id"].to_numpy()
+        self.names = nodes["name"].astype(str).to_numpy(dtype=object)
+        label_codes, self.label_names = pd.factorize(nodes["label"].astype(str) if "label" in nodes.columns
+                                                     else pd.Series("", index=nodes.index))
+        self.labels = label_codes.astype(np.int32)
+        size = len(self.ids)
+
+        # Edges: endpoints become node indices; edges with an endpoint missing from the node file are dropped.
+        start = np.searchsorted(self.ids, relationships["start"].to_numpy())
+        end = np.searchsorted(self.ids, relationships["end"].to_numpy())
+        if size:
+            start, end = np.minimum(start, size - 1), np.minimum(end, size - 1)
+            known = ((self.ids[start] == relationships["start"].to_numpy())
+                     & (self.ids[end] == relationships["end"].to_numpy()))
+        else:
+            known = np.zeros(len(relationships), dtype=bool)
+        labels = relationships["relationship"] if "relationship" in relationships.columns else relationships["type"]
+        codes, self.relationship_names = pd.factorize(labels.astype(str)[known])
+        self.start = start[known].astype(np.int32)
+        self.end = end[known].astype(np.int32)
+        self.relationship = codes.astype(np.int32)
+        self.out_edges, self.out_indptr = _csr(self.start, size)
+        self.in_edges, self.in_indptr = _csr(self.end, size)
+
+        # Inverted index: token -> nodes whose name contains it (each token once per node).
+        tokens = pd.Series(self.names).str.lower().str.findall(TOKEN.pattern).explode().dropna()
+        pairs = pd.DataFrame({"node": tokens.index.to_numpy(), "token": tokens.to_numpy()}).drop_duplicates()
+        token_codes, token_values = pd.factorize(pairs["token"])
+        self.token_ids = {token: i for i, token in enumerate(token_values)}
+        order, self.token_indptr = _csr(token_codes, len(token_values))
+        self.token_nodes = pairs["node"].to_numpy()[order].astype(np.int32)
+        self.token_counts = np.bincount(pairs["node"].to_numpy(), minlength=size).astype(np.int32)
+        stop_only = pairs.assign(stop=pairs["token"].isin(STOPWORDS)).groupby("node")["stop"].all()
+        self.stop_only = np.zeros(size, dtype=bool)
+        self.stop_only[stop_only.index[stop_only.to_numpy()]] = True
+
+    @classmethod
+    def from_files(cls, node_file=NODE_FILE, relation_file=RELATION_FILE):
+        return cls(graph_update.read_nodes(node_file), graph_update.read_relationships(relation_file))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def resolve(self, question, max_mentions=MAX_MENTIONS):
+        """
+        Node indices of the entities mentioned in `question`: nodes all of whose name tokens occur
+        in the question. A node whose tokens are a subset of another match is dropped
+        ("flow battery" when "redox flow battery" matched), and so are names of stopwords only.
+
+        :return: int array of node indices, longest names first
+        """
+        token_ids = [self.token_ids[t] for t in set(tokenize(question)) if t in self.token_ids]
+        if not token_ids:
+            return np.empty(0, dtype=np.int32)
+        positions = _gather(self.token_indptr, np.asarray(token_ids))
+        candidates, hits = np.unique(self.token_nodes[positions], return_counts=True)
+        matched = candidates[(hits == self.token_counts[candidates]) & ~self.stop_only[candidates]]
+        matched = matched[np.argsort(-self.token_counts[matched], kind="stable")]
+        kept, kept_tokens = [], []
+        for node in matched:
+            tokens = set(tokenize(self.names[node]))
+            if not any(tokens < other for other in kept_tokens):
+                kept.append(node)
+                kept_tokens.append(tokens)
+            if len(kept) == max_mentions:
+                break
+        return np.asarray(kept, dtype=np.int32)
+
+    def neighborhood(self, seeds, hops=HOPS, max_edges=MAX_EDGES):
+        """
+        Yields the relationships within `hops` of the seed nodes, nearest first, as records
+        {"a": start name, "relationship": ..., "b": end name} for kg_context.ContextPacker.
+        """
+        visited = np.zeros(len(self.ids), dtype=bool)
+        seen_edges = set()
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        visited[frontier] = True
+        for _ in range(hops):
+            if not len(frontier):
+                break
+            out_positions = _gather(self.out_indptr, frontier)
+            in_positions = _gather(self.in_indptr, frontier)
+            edges = np.concatenate([self.out_edges[out_positions], self.in_edges[in_positions]])[:max_edges]
+            for edge in edges.tolist():
+                if edge not in seen_edges:
+                    seen_edges.add(edge)
+                    yield {"a": self.names[self.start[edge]],
+                           "relationship": self.relationship_names[self.relationship[edge]],
+                           "b": self.names[self.end[edge]]}
+            neighbours = np.concatenate([self.start[edges], self.end[edges]])
+            frontier = np.unique(neighbours[~visited[neighbours]])
+            visited[frontier] = True
+
+
+# --- Process-wide Index ---
+# Loaded on first use and reloaded when the import files change.
+_graph_index = None
+_graph_index_files = None
+_graph_index_lock = threading.Lock()
+
+
+def get_graph_index(node_file=NODE_FILE, relation_file=RELATION_FILE):
+    """Returns the GraphIndex of the current import files, or None if disabled or the files are missing."""
+    global _graph_index, _graph_index_files
+    if not LOCAL_RETRIEVAL_ENABLED:
+        return None
+    try:
+        files = (node_file, os.stat(node_file).st_mtime_ns, relation_file, os.stat(relation_file).st_mtime_ns)
+    except OSError:
+        return None
+    with _graph_index_lock:
+        if files != _graph_index_files:
+            start = time.perf_counter()
+            _graph_index = GraphIndex.from_files(node_file, relation_file)
+            _graph_index_files = files
+            logging.info(f"Graph index loaded: {len(_graph_index)} nodes, {len(_graph_index.start)} relationships "
+                         f"in {time.perf_counter() - start:.1f}s.")
+    return _graph_index
@@ -0,0 +1,315 @@
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import neo4j_client
+from neo4j_client import NEO4J_DATABASE
+
+# --- Graph Update Settings ---
+# Connection and pool settings (NEO4J_URI, NEO4J_USER, ...) are read by neo4j_client.
+# Rows per UNWIND transaction. Larger batches mean fewer round trips but bigger transactions.
+BATCH_SIZE = int(os.getenv("GRAPH_BATCH_SIZE", "5000"))
+# Snapshot of the last applied build, used to compute the next delta.
+STATE_DIR = os.getenv("GRAPH_STATE_DIR", ".graph_state")
+
+# Must match the full import in main.py: --nodes=Node=... --relationships=ORDERED=...
+NODE_LABEL = "Node"
+RELATIONSHIP_TYPE = "ORDERED"
+
+# Indexes the Q&A queries rely on. A full import does not create them: run
+# `python graph_update.py --create-indexes` once the database is started.
+INDEX_STATEMENTS = [
+    # Every MERGE/MATCH on id scans all nodes without it.
+    f"CREATE INDEX node_id IF NOT EXISTS FOR (n:{NODE_LABEL}) ON (n.id)",
+    # Exact and prefix name lookups (a.name = "...", STARTS WITH) in generated Cypher.
+    f"CREATE RANGE INDEX node_name IF NOT EXISTS FOR (n:{NODE_LABEL}) ON (n.name)",
+    # Fuzzy and token lookups: CALL db.index.fulltext.queryNodes('node_name_fulltext', 'antraquinone~').
+    f"CREATE FULLTEXT INDEX node_name_fulltext IF NOT EXISTS FOR (n:{NODE_LABEL}) ON EACH [n.name]",
+    # Numeric filters such as quantity = 'voltage' AND value > 1.2 (see subNeo4j/numeric_values.py).
+    f"CREATE RANGE INDEX node_quantity_value IF NOT EXISTS FOR (n:{NODE_LABEL}) ON (n.quantity, n.value)",
+]
+
+# neo4j-admin header types (e.g. value:float) and how they are read back for MERGE.
+_HEADER_TYPES = {"float": "float64", "double": "float64", "int": "Int64", "long": "Int64",
+                 "boolean": "boolean", "string": "string"}
+
+
+def read_nodes(node_file):
+    """
+    Reads a node file in neo4j-admin import format.
+
+    :return: DataFrame with an int64 `id` column, an `extra_label` column (from :LABEL, may be NaN)
+        and the remaining columns as node properties
+    """
+    df = pd.read_csv(node_file)
+    df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
+    df = df.rename(columns={"id:ID": "id", ":LABEL": "extra_label"})
+    df = _apply_header_types(df)
+    if "extra_label" not in df.columns:
+        df["extra_label"] = np.nan
+    df = df.dropna(subset=["id"]).drop_duplicates(subset="id", keep="first")
+    df["id"] = df["id"].astype("int64")
+    return df.reset_index(drop=True)
+
+
+def read_relationships(relation_file):
+    """
+    Reads a relationship file in neo4j-admin import format.
+
+    :return: DataFrame with int64 `start` / `end` columns, a `type` column (from :TYPE, else
+        RELATIONSHIP_TYPE) and the remaining columns as relationship properties
+    """
+    df = pd.read_csv(relation_file)
+    df = df.loc[:, ~df.columns.str.startswith("Unnamed")]
+    df = df.rename(columns={":START_ID": "start", ":END_ID": "end", ":TYPE": "type"})
+    if "type" not in df.columns:
+        df["type"] = RELATIONSHIP_TYPE
+    df = df.dropna(subset=["start", "end"]).drop_duplicates()
+    df[["start", "end"]] = df[["start", "end"]].astype("int64")
+    # MERGE can't match on null properties; an empty string keeps such rows mergeable.
+    properties = [c for c in df.columns if c not in ("start", "end", "type")]
+    df[properties] = df[properties].fillna("")
+    return df.reset_index(drop=True)
+
+
+def _apply_header_types(df):
+    """Strips neo4j-admin type suffixes from property columns ("value:float" -> "value") and casts the values."""
+    renames = {}
+    for column in df.columns:
+        name, _, header_type = column.rpartition(":")
+        if name and header_type in _HEADER_TYPES:
+            df[column] = df[column].astype(_HEADER_TYPES[header_type])
+            renames[column] = name
+    return df.rename(columns=renames)
+
+
+def _row_hashes(df):
+    return pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+
+
+class BuildSnapshot:
+    """
+    Row hashes of the last build applied to the graph: one hash per node id over its properties
+    and labels, and one hash per relationship (endpoints, type and properties).
+
+    Stored as two .npy-based files in `state_dir`; written only after a delta was applied in full,
+    so a failed update is recomputed and re-applied (MERGE makes that idempotent).
+    """
+
+    def __init__(self, state_dir=STATE_DIR):
+        self.state_dir = Path(state_dir)
+        self.node_path = self.state_dir / "nodes.npz"
+        self.relationship_path = self.state_dir / "relationships.npy"
+
+    def exists(self):
+        return self.node_path.exists() and self.relationship_path.exists()
+
+    def load(self):
+        """(node ids, node hashes, sorted relationship hashes); empty arrays before the first build."""
+        if not self.exists():
+            empty = np.array([], dtype=np.uint64)
+            return np.array([], dtype=np.int64), empty, empty
+        with np.load(self.node_path) as data:
+            ids, hashes = data["ids"], data["hashes"]
+        return ids, hashes, np.load(self.relationship_path)
+
+    def save(self, nodes, relationships):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        np.savez(self.node_path, ids=nodes["id"].to_numpy(), hashes=_row_hashes(nodes))
+        np.save(self.relationship_path, np.sort(_row_hashes(relationships)))
+
+
+def compute_delta(nodes, relationships, snapshot):
+    """
+    Nodes and relationships that are new or changed since the snapshot.
+
+    :return: (node delta, relationship delta, number of nodes and relationships gone from the build);
+        removed entries are only counted, an update never deletes from the graph
+    """
+    old_ids, old_hashes, old_relationships = snapshot.load()
+    previous = pd.Series(old_hashes, index=old_ids)
+    node_hashes = _row_hashes(nodes)
+    known = previous.reindex(nodes["id"].to_numpy()).to_numpy()
+    node_delta = nodes[pd.isna(known) | (known != node_hashes)]
+
+    relationship_hashes = _row_hashes(relationships)
+    relationship_delta = relationships[~np.isin(relationship_hashes, old_relationships)]
+
+    removed = (int((~np.isin(old_ids, nodes["id"].to_numpy())).sum()),
+               int((~np.isin(old_relationships, relationship_hashes)).sum()))
+    return node_delta, relationship_delta, removed
+
+
+def _quote(name):
+    """Backtick-quotes a label, type or property name for use in Cypher."""
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+def _records(df, columns):
+    """Rows as dicts for UNWIND, with NaN as null and numpy scalars as Python values."""
+    return df[columns].astype(object).where(df[columns].notna(), None).to_dict("records")
+
+
+class Neo4jBackend:
+    """
+    Applies deltas to a Neo4j database with batched UNWIND ... MERGE write transactions, on the
+    shared driver of neo4j_client. Batches are MERGEs, so a retried transaction is harmless.
+    """
+
+    def __init__(self, database=NEO4J_DATABASE):
+        self.database = database
+
+    def _write(self, query, rows):
+        neo4j_client.write_query(query, {"rows": rows}, database=self.database)
+
+    def prepare(self):
+        for statement in INDEX_STATEMENTS:
+            neo4j_client.write_query(statement, database=self.database)
+
+    def merge_nodes(self, extra_label, properties, rows):
+        set_labels = f" SET n:{_quote(extra_label)}" if extra_label else ""
+        query = (f"UNWIND $rows AS row MERGE (n:{_quote(NODE_LABEL)} {{id: row.id}}) "
+                 f"SET n += row.properties{set_labels}")
+        self._write(query, [{"id": row.pop("id"), "properties": row} for row in rows])
+
+    def merge_relationships(self, rel_type, properties, rows):
+        # Relationships are identified by endpoints, type and properties, like rows of the import file.
+        key = ", ".join(f"{_quote(p)}: row.{_quote(p)}" for p in properties)
+        query = (f"UNWIND $rows AS row "
+                 f"MATCH (a:{_quote(NODE_LABEL)} {{id: row.start}}) MATCH (b:{_quote(NODE_LABEL)} {{id: row.end}}) "
+                 f"MERGE (a)-[r:{_quote(rel_type)}{' {' + key + '}' if key else ''}]->(b)")
+        self._write(query, rows)
+
+    def close(self):
+        # The shared driver stays open for other callers in the process; neo4j_client closes it at exit.
+        pass
+
+
+class MemoryBackend:
+    """
+    In-process stand-in for Neo4jBackend with the same merge semantics, for trying out an
+    update or checking a delta without a running database.
+    """
+
+    def __init__(self):
+        self.nodes = {}  # id -> {"labels": set, "properties": dict}
+        self.relationships = set()  # (start, type, end, sorted property items)
+        self.transactions = 0
+
+    def prepare(self):
+        pass
+
+    def merge_nodes(self, extra_label, properties, rows):
+        self.transactions += 1
+        for row in rows:
+            node = self.nodes.setdefault(row.pop("id"), {"labels": {NODE_LABEL}, "properties": {}})
+            node["properties"].update(row)
+            if extra_label:
+                node["labels"].add(extra_label)
+
+    def merge_relationships(self, rel_type, properties, rows):
+        self.transactions += 1
+        for row in rows:
+            if row["start"] in self.nodes and row["end"] in self.nodes:
+                self.relationships.add((row["start"], rel_type, row["end"],
+                                        tuple(sorted((p, row[p]) for p in properties))))
+
+    def close(self):
+        pass
+
+
+def apply_delta(backend, node_delta, relationship_delta, batch_size=BATCH_SIZE):
+    """
+    Writes a delta in transactions of at most `batch_size` rows: all nodes first (grouped by extra
+    label), then relationships (grouped by type), so every relationship finds its endpoints.
+    """
+    backend.prepare()
+    node_properties = [c for c in node_delta.columns if c not in ("id", "extra_label")]
+    for extra_label, group in node_delta.groupby(node_delta["extra_label"].fillna(""), sort=False):
+        for start in range(0, len(group), batch_size):
+            rows = _records(group.iloc[start:start + batch_size], ["id"] + node_properties)
+            backend.merge_nodes(extra_label or None, node_properties, rows)
+    relationship_properties = [c for c in relationship_delta.columns if c not in ("start", "end", "type")]
+    for rel_type, group in relationship_delta.groupby("type", sort=False):
+        for start in range(0, len(group), batch_size):
+            rows = _records(group.iloc[start:start + batch_size], ["start", "end"] + relationship_properties)
+            backend.merge_relationships(rel_type, relationship_properties, rows)
+
+
+def update_graph(node_file, relation_file, backend=None, state_dir=STATE_DIR, batch_size=BATCH_SIZE):
+    """
+    Incrementally updates the graph to the build in `node_file` / `relation_file` (neo4j-admin import
+    format, e.g. node_new.csv / relation_new.csv) instead of re-importing it with --overwrite-destination.
+
+    The first update after a full import has no snapshot and would MERGE everything; run
+    `record_full_import` right after a full import instead.
+
+    :param backend: Neo4jBackend (default, built from NEO4J_* settings) or MemoryBackend
+    :return: dict with the number of nodes and relationships applied and removed from the build
+    """
+    nodes, relationships = read_nodes(node_file), read_relationships(relation_file)
+    snapshot = BuildSnapshot(state_dir)
+    node_delta, relationship_delta, (removed_nodes, removed_relationships) = compute_delta(nodes, relationships, snapshot)
+    logging.info(f"Graph delta: {len(node_delta)} nodes, {len(relationship_delta)} relationships "
+                 f"({removed_nodes} nodes and {removed_relationships} relationships no longer in the build, not deleted)")
+    own_backend = backend is None
+    backend = backend or Neo4jBackend()
+    try:
+        apply_delta(backend, node_delta, relationship_delta, batch_size)
+    finally:
+        if own_backend:
+            backend.close()
+    snapshot.save(nodes, relationships)
+    return {"nodes": len(node_delta), "relationships": len(relationship_delta),
+            "removed_nodes": removed_nodes, "removed_relationships": removed_relationships}
+
+
+def write_schema(path):
+    """Writes INDEX_STATEMENTS as a cypher-shell script (`cypher-shell -f PATH`) to run after a full import."""
+    Path(path).write_text("".join(f"{statement};\n" for statement in INDEX_STATEMENTS), encoding="utf-8")
+
+
+def record_full_import(node_file, relation_file, state_dir=STATE_DIR):
+    """Records the files of a full neo4j-admin import as the snapshot later updates are computed against."""
+    BuildSnapshot(state_dir).save(read_nodes(node_file), read_relationships(relation_file))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incrementally update the graph to a new node/relationship build.")
+    parser.add_argument("node_file", nargs="?")
+    parser.add_argument("relation_file", nargs="?")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--state-dir", default=STATE_DIR)
+    parser.add_argument("--record-full-import", action="store_true",
+                        help="only record these files as the current build (run after a full import)")
+    parser.add_argument("--create-indexes", action="store_true",
+                        help="only create the indexes in INDEX_STATEMENTS (run after a full import)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="apply the delta to an in-memory MemoryBackend and leave the snapshot unchanged")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.create_indexes:
+        backend = Neo4jBackend()
+        try:
+            backend.prepare()
+        finally:
+            backend.close()
+    elif not (args.node_file and args.relation_file):
+        parser.error("node_file and relation_file are required")
+    elif args.record_full_import:
+        record_full_import(args.node_file, args.relation_file, args.state_dir)
+    elif args.dry_run:
+        snapshot = BuildSnapshot(args.state_dir)
+        node_delta, relationship_delta, removed = compute_delta(read_nodes(args.node_file),
+                                                                read_relationships(args.relation_file), snapshot)
+        backend = MemoryBackend()
+        apply_delta(backend, node_delta, relationship_delta, args.batch_size)
+        print(f"{len(node_delta)} nodes and {len(relationship_delta)} relationships in {backend.transactions} "
+              f"transactions; {removed[0]} nodes and {removed[1]} relationships no longer in the build")
+    else:
+        print(update_graph(args.node_file, args.relation_file, state_dir=args.state_dir, batch_size=args.batch_size))
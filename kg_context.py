@@ -0,0 +1,204 @@
+import os
+import re
+
+# --- Retrieval Settings ---
+# Rows a generated query may return: a LIMIT is added, or lowered to this.
+QUERY_ROW_LIMIT = int(os.getenv("KG_QUERY_ROW_LIMIT", "1000"))
+# Characters of graph context given to the answer model. Records stop streaming once it is full.
+CONTEXT_CHARS = int(os.getenv("KG_CONTEXT_CHARS", "20000"))
+
+# Clauses that end the item list of a RETURN.
+_RETURN_END = re.compile(r"\b(?:ORDER\s+BY|SKIP|LIMIT)\b", re.IGNORECASE)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+)\s*$", re.IGNORECASE)
+_FENCE = re.compile(r"^\s*```(?:cypher)?\s*|\s*```\s*$", re.IGNORECASE)
+
+
+# --- Cypher Rewriting ---
+
+def _blank(match):
+    text = match.group(0)
+    if text.startswith("//"):
+        return " " * len(text)
+    return text[0] + " " * (len(text) - 2) + text[-1]
+
+
+def _mask_literals(cypher):
+    """Copy of `cypher` with string literals, quoted names and comments blanked out (same length)."""
+    return re.sub(r"'(?:\\.|[^'\\])*'|\"(?:\\.|[^\"\\])*\"|`[^`]*`|//[^\n]*", _blank, cypher)
+
+
+def _last_return(masked):
+    """Start and end of the item list of the final RETURN clause in a masked query, or None."""
+    returns = list(re.finditer(r"\bRETURN\b(\s+DISTINCT\b)?", masked, re.IGNORECASE))
+    if not returns:
+        return None
+    start = returns[-1].end()
+    end = _RETURN_END.search(masked, start)
+    return start, end.start() if end else len(masked)
+
+
+def _split_items(items):
+    """Splits a RETURN item list on top-level commas, keeping each item's text as written."""
+    parts, depth, begin = [], 0, 0
+    for i, char in enumerate(_mask_literals(items)):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(items[begin:i])
+            begin = i + 1
+    parts.append(items[begin:])
+    return parts
+
+
+def _aliased_returns(masked):
+    """
+    True if every RETURN item of every UNION branch is `*`, a plain variable or has an AS alias,
+    as Neo4j requires of the columns a CALL { ... } subquery returns.
+    """
+    for branch in re.split(r"\bUNION(?:\s+ALL)?\b", masked, flags=re.IGNORECASE):
+        bounds = _last_return(branch)
+        if bounds is None:
+            return False
+        for item in _split_items(branch[bounds[0]:bounds[1]]):
+            item = item.strip()
+            if not re.fullmatch(r"\*|\w+|.+\s+AS\s+(?:\w+|`[^`]*`)", item, re.IGNORECASE | re.DOTALL):
+                return False
+    return True
+
+
+def clean_query(cypher):
+    """Strips markdown fences and trailing semicolons the model sometimes adds despite the prompt."""
+    return _FENCE.sub("", cypher).strip().rstrip(";").strip()
+
+
+def limit_query(cypher, limit=QUERY_ROW_LIMIT):
+    """
+    Caps the rows a read query returns at `limit`: appends LIMIT, or lowers a larger literal LIMIT.
+    A UNION is wrapped in CALL { ... } so the limit covers all branches, provided every returned
+    column is named (`a` or `a.name AS name`); otherwise it would not parse and is left unlimited.
+    Queries whose last clause is not a RETURN, or that already limit by a parameter, are returned
+    unchanged.
+    """
+    masked = _mask_literals(cypher)
+    bounds = _last_return(masked)
+    if bounds is None:
+        return cypher
+    if re.search(r"\bUNION\b", masked, re.IGNORECASE):
+        if not _aliased_returns(masked):
+            return cypher
+        return f"CALL {{\n{cypher}\n}}\nRETURN *\nLIMIT {limit}"
+    existing = _TRAILING_LIMIT.search(masked)
+    if existing:
+        if int(existing.group(1)) <= limit:
+            return cypher
+        return cypher[:existing.start(1)] + str(limit) + cypher[existing.end(1):]
+    if re.search(r"\bLIMIT\b", masked[bounds[1]:], re.IGNORECASE):
+        return cypher
+    return f"{cypher}\nLIMIT {limit}"
+
+
+def project_query(cypher):
+    """
+    Returns names instead of whole graph elements: a bare node variable in the final RETURN
+    becomes `a.name AS a`, a bare relationship variable `r.relationship AS r`. Only the property
+    the answer uses is transferred, instead of every property of every node.
+
+    Left unchanged when the RETURN is followed by ORDER BY, which may still refer to the
+    element (`ORDER BY a.value`), or when a variable's kind cannot be told from the patterns.
+    """
+    masked = _mask_literals(cypher)
+    bounds = _last_return(masked)
+    if bounds is None or re.match(r"\s*ORDER\s+BY\b", masked[bounds[1]:], re.IGNORECASE):
+        return cypher
+    nodes = set(re.findall(r"(?<![\w.])\(\s*(\w+)\s*[:){]", masked))
+    relationships = set(re.findall(r"\[\s*(\w+)\s*[:\]{*]", masked))
+    items = []
+    for item in _split_items(cypher[bounds[0]:bounds[1]]):
+        name = item.strip()
+        if name in nodes and name not in relationships:
+            item = item.replace(name, f"{name}.name AS {name}", 1)
+        elif name in relationships and name not in nodes:
+            item = item.replace(name, f"{name}.relationship AS {name}", 1)
+        items.append(item)
+    return cypher[:bounds[0]] + ",".join(items) + cypher[bounds[1]:]
+
+
+def prepare_query(cypher, limit=QUERY_ROW_LIMIT):
+    """clean_query, project_query and limit_query in one step, for LLM-generated Cypher."""
+    return limit_query(project_query(clean_query(cypher)), limit)
+
+
+# --- Context Packing ---
+
+def compact_value(value):
+    """Short text of a record value: nodes by name, relationships by their relationship property."""
+    if value is None:
+        return ""
+    if hasattr(value, "nodes") and hasattr(value, "relationships"):  # neo4j.graph.Path
+        return "; ".join(f"{compact_value(r.start_node)} -[{compact_value(r)}]-> {compact_value(r.end_node)}"
+                         for r in value.relationships)
+    if hasattr(value, "start_node") and hasattr(value, "type"):  # neo4j.graph.Relationship
+        return str(value.get("relationship") or value.type)
+    if hasattr(value, "labels") and hasattr(value, "element_id"):  # neo4j.graph.Node
+        return str(value.get("name") or value.element_id)
+    if isinstance(value, float):
+        return f"{value:g}"
+    if isinstance(value, (list, tuple)):
+        return ", ".join(filter(None, map(compact_value, value)))
+    if isinstance(value, dict):
+        return ", ".join(f"{k}: {compact_value(v)}" for k, v in value.items() if v is not None)
+    return str(value)
+
+
+class ContextPacker:
+    """
+    Packs query records into compact, deduplicated lines ("vrfb | has | 1.26 v") until a
+    character budget is full. Replaces str() of a list of record dicts, which spent most of the
+    budget on keys, quotes and repeated rows.
+    """
+
+    def __init__(self, budget=CONTEXT_CHARS):
+        self.budget = budget
+        self.lines = []
+        self.size = 0
+        self.records = 0
+        self.duplicates = 0
+        self.full = False
+        self._seen = set()
+        self._header = None
+
+    def add(self, record):
+        """
+        Adds one record (a neo4j Record or a dict); returns False once the budget is full.
+
+        :return: True while more records fit
+        """
+        if self.full:
+            return False
+        self.records += 1
+        if self._header is None:
+            self._header = " | ".join(record.keys())
+            self.size += len(self._header) + 1
+        line = " | ".join(compact_value(v) for v in record.values())
+        if line in self._seen:
+            self.duplicates += 1
+            return True
+        if self.size + len(line) + 1 > self.budget:
+            self.full = True
+            return False
+        self._seen.add(line)
+        self.lines.append(line)
+        self.size += len(line) + 1
+        return True
+
+    def extend(self, records):
+        """Adds records until the budget is full; stops iterating `records` at that point."""
+        for record in records:
+            if not self.add(record):
+                break
+        return self
+
+    def text(self):
+        return "\n".join([self._header] + self.lines) if self.lines else ""
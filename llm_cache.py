@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+# --- Cache Settings ---
+# The cache lives next to the working directory so re-runs of the extraction reuse it.
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite")
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(1024 ** 3)))  # 1 GB of stored responses
+CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "0"))  # seconds, 0 = entries never expire
+CACHE_ENABLED = os.getenv("LLM_CACHE_DISABLE", "").lower() not in ("1", "true", "yes")
+
+
+def normalize_messages(messages):
+    """Keeps only role and content, with surrounding whitespace stripped, so formatting noise doesn't miss the cache."""
+    return [{'role': m.get('role'), 'content': str(m.get('content', '')).strip()} for m in messages]
+
+
+def make_key(messages, provider_key, model, temperature):
+    """Content address of a request: SHA-256 over the normalized messages plus provider, model and temperature."""
+    payload = json.dumps({
+        "provider": provider_key,
+        "model": model,
+        "temperature": round(float(temperature), 4),
+        "messages": normalize_messages(messages),
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk LLM response cache backed by SQLite.
+
+    Entries are evicted least-recently-used first once the stored responses exceed `max_bytes`,
+    and entries older than `ttl` seconds are treated as misses and dropped.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                  key TEXT PRIMARY KEY,
+                                  value TEXT NOT NULL,
+                                  size INTEGER NOT NULL,
+                                  created REAL NOT NULL,
+                                  last_access REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl and now - row[2] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= row[1]
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def get_first(self, keys):
+        """
+        Looks up several keys (e.g. the same request for each provider of a fallback chain) as one
+        lookup: returns (position in `keys`, response) of the first cached key, or (None, None).
+        Counts a single hit or miss, so the hit rate is per request, not per key tried.
+        """
+        now = time.time()
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            rows = self._conn.execute(f"SELECT key, value, size, created FROM responses WHERE key IN ({placeholders})",
+                                      list(keys)).fetchall() if keys else []
+            found = {}
+            for key, value, size, created in rows:
+                if self.ttl and now - created > self.ttl:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._total_bytes -= size
+                    self.evictions += 1
+                else:
+                    found[key] = value
+            for position, key in enumerate(keys):
+                if key in found:
+                    self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self.hits += 1
+                    return position, found[key]
+            self.misses += 1
+            return None, None
+
+    def put(self, key, value):
+        """Stores a response and evicts least-recently-used entries if the size bound is exceeded."""
+        if value is None:
+            return
+        size = len(value.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, value, size, created, last_access) "
+                               "VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now))
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Trim to 90% of the bound so a full cache doesn't evict on every insert.
+        target = int(self.max_bytes * 0.9)
+        if self.ttl:
+            expired = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created < ?",
+                                         (time.time() - self.ttl,)).fetchone()
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            self.evictions += expired[0]
+            self._total_bytes -= expired[1]
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evictions += len(doomed)
+        logging.info(f"LLM cache evicted {len(doomed)} entries, {self._total_bytes} bytes remain.")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size of the store."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._total_bytes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,6 +1,12 @@
-from neo4j import GraphDatabase
+import asyncio
 import logging
 import chat_client as cc
+import chat_history
+import entity_linker
+import graph_index
+import kg_context
+import neo4j_client
+import qa_cache
 
 query_prompt = """I am working with a Neo4j database and would like you to help me construct a Cypher query based on the information I provide. Please generate a syntactically correct Cypher query statement that can be executed directly in the Neo4j environment. Ensure that the query is precise and optimized for performance. I will describe the information I need to retrieve; please make sure the generated Cypher query accurately reflects my requirements.
 Now I'm going to tell you a little bit about this knowledge graph.
@@ -30,61 +36,259 @@ kg_prompt = """The following information is obtained through a knowledge graph.
          Known relevant information:"""
 
 
-def get_query(question):
+class Conversation:
+    """
+    State of one user's conversation: the message history of the answer model, bounded by a token
+    budget (chat_history.ChatHistory). The Cypher model gets a fresh prompt for every question and
+    keeps no history.
+    """
+
+    def __init__(self, history=None):
+        self.history = history if history is not None else chat_history.ChatHistory()
+
+    @property
+    def first_turn(self):
+        return not self.history.turns and not self.history.summary
+
+
+def cypher_messages(question, entities=None):
+    """
+    Prompt of the Cypher model for one question.
+
+    :param entities: [(name, id)] of the graph nodes the question mentions (see link_entities); given to
+        the model so it matches exact node names instead of the user's spelling
+    """
+    content = question
+    if entities:
+        content += ("\nNodes in the graph for the entities in this question (match these exact names): "
+                    + "; ".join(f'"{name}" (id {node_id})' for name, node_id in entities))
+    return [{'role': 'system', 'content': query_prompt},
+            {'role': 'user', 'content': content},
+            {'role': 'assistant', 'content': cypher_example}]
+
+
+async def aget_query(question, entities=None, llm=None):
+    """
+    Generates the Cypher query for a question (served from the Q&A cache when possible). The
+    response cache of chat_client is bypassed, so a query that fails to run is generated afresh.
+    """
     logging.info(question)
-    cypher_messages.clear()
-    cypher_messages.append({'role': 'system', 'content': query_prompt})
-    cypher_messages.append({'role': 'user', 'content': question})
-    cypher_messages.append({'role': 'assistant', 'content': cypher_example})
-    return cc.send_message(cypher_messages)
+    cache = qa_cache.get_qa_cache()
+    cached = cache.get_cypher(question) if cache else None
+    if cached:
+        logging.info("get_query: cached Cypher")
+        return cached
+    messages = cypher_messages(question, entities)
+    if llm is None:
+        # 不走响应缓存：Cypher 只在执行成功后才进入 Q&A 缓存（见 aretrieve），失败的查询不能被重放
+        return await cc.asend_message(messages, use_cache=False)
+    return await llm(messages)
+
 
+def get_query(question, entities=None):
+    return cc.dispatcher.run(aget_query(question, entities))
 
-def run_cypher_query(cypher_query, uri="bolt://localhost:7687", user="neo4j", password="bjutB406"):
+
+def run_cypher_query(cypher_query, parameters=None, budget=kg_context.CONTEXT_CHARS):
     """
-    Executes a Cypher query against a Neo4j database and returns the result.
+    Executes a generated Cypher query against a Neo4j database and packs the result into context.
+
+    The query gets a LIMIT and returns names instead of whole nodes (kg_context.prepare_query);
+    if the server rejects the rewritten query, the query is run again as generated.
+    Records are streamed from the pooled driver of neo4j_client and packed into deduplicated lines;
+    once `budget` characters are filled, the rest of the result is discarded on the server.
 
     :param cypher_query: A string containing the Cypher query to execute.
-    :param uri: The URI of the Neo4j instance.
-    :param user: Username for authentication.
-    :param password: Password for authentication.
-    :return: Query result as a list of dictionaries.
+    :param parameters: Query parameters.
+    :param budget: Characters of context to collect.
+    :return: kg_context.ContextPacker with the packed records.
     """
+    from neo4j.exceptions import ClientError
+    prepared = kg_context.prepare_query(cypher_query)
+    try:
+        return _run_packed(prepared, parameters, budget)
+    except ClientError as exc:
+        original = kg_context.clean_query(cypher_query)
+        if prepared == original:
+            raise
+        # 改写后的查询被服务器拒绝时，按模型生成的原样再执行一次
+        logging.warning(f"run_cypher_query: rewritten query failed ({exc}), running it as generated")
+        return _run_packed(original, parameters, budget)
+
+
+def _run_packed(cypher_query, parameters, budget):
     logging.info(cypher_query)
-    # Initialize the driver
-    driver = GraphDatabase.driver(uri, auth=(user, password))
+    cache = qa_cache.get_qa_cache() if parameters is None else None
+    packer = cache.get_result(f"{budget}\n{cypher_query}") if cache else None
+    if packer is not None:
+        logging.info("run_cypher_query: cached result")
+        return packer
+    packer = neo4j_client.read_stream(cypher_query, lambda records: kg_context.ContextPacker(budget).extend(records),
+                                      parameters)
+    if cache:
+        cache.put_result(f"{budget}\n{cypher_query}", packer)
+    logging.info(f"run_cypher_query: {len(packer.lines)} lines from {packer.records} records "
+                 f"({packer.duplicates} duplicates, budget {'full' if packer.full else 'not full'})")
+    return packer
 
-    try:
-        with driver.session() as session:
-            # Execute the Cypher query
-            result = session.run(cypher_query)
-            # Extract records into a list of dictionaries
-            records = [record.data() for record in result]
-            # print(records)
-            return records
-    finally:
-        # Ensure the driver is closed after executing the query
-        driver.close()
-
-
-def answer_question(kg_records, question):
+
+def answer_messages(kg_records, question, conversation):
+    """Prompt of the answer model: graph context, the conversation so far and the question."""
+    kg_records = kg_records.text() if isinstance(kg_records, kg_context.ContextPacker) else str(kg_records)
+    history = conversation.history
+    # 图谱上下文只占预算中固定的份额，其余留给对话历史
+    kg_records = history.fit_context(kg_records)
     logging.info(f"run_cypher_query records:\n{kg_records}")
-    kg_records = str(kg_records)[:20000]
     prompt = f"""{kg_prompt}\n {kg_records}"""
-    # 遍历列表并替换
-    for i, message in enumerate(question_messages):
-        if message.get("role") == "system":
-            del question_messages[i]  # 替换为新的字典项
-            break  # 找到后退出循环
-    question_messages.append({'role': 'system', 'content': prompt})
-    question_messages.append({'role': 'user', 'content': question})
-    response = cc.send_message(question_messages)
-    question_messages.append({'role': 'assistant', 'content': response})
+    # 每轮只发送当前的图谱上下文，旧的系统提示不进入历史
+    return history.messages(question, system=prompt)
+
+
+async def aanswer_question(kg_records, question, conversation, llm=None):
+    """Answers a question from the graph context and records the turn in `conversation`."""
+    response = await (llm or cc.asend_message)(answer_messages(kg_records, question, conversation))
+    conversation.history.add_turn(question, response)
     return response
 
 
+async def astream_answer_question(kg_records, question, conversation, llm_stream=None):
+    """
+    Streaming aanswer_question: yields the answer text as it is generated. The turn is recorded in
+    `conversation` once the answer is complete.
+
+    :param llm_stream: callable(messages) -> async iterator of str, defaults to chat_client.astream_message
+    """
+    pieces = []
+    async for piece in (llm_stream or cc.astream_message)(answer_messages(kg_records, question, conversation)):
+        pieces.append(piece)
+        yield piece
+    conversation.history.add_turn(question, "".join(pieces))
+
+
+def answer_question(kg_records, question, conversation):
+    return cc.dispatcher.run(aanswer_question(kg_records, question, conversation))
+
+
+def link_entities(question):
+    """
+    Graph nodes mentioned in the question, found by the entity linker (typos, plurals and
+    abbreviations tolerated) over the in-process graph_index.
+
+    :return: node indices into the graph index (empty without an index), and [(name, id)]
+    """
+    linker = entity_linker.get_entity_linker()
+    if linker is None:
+        return [], []
+    seeds = linker.link(question)
+    return seeds, list(zip(linker.index.names[seeds], linker.index.ids[seeds].tolist()))
+
+
+def retrieve_local(question, seeds, budget=kg_context.CONTEXT_CHARS):
+    """
+    Fast path: answers the graph lookup from the in-process graph_index instead of LLM-generated
+    Cypher, when the question mentions known entities (`seeds`) and does not count, rank or filter.
+
+    :return: kg_context.ContextPacker, or None when the question needs generated Cypher
+    """
+    if not len(seeds) or graph_index.NEEDS_CYPHER.search(question):
+        return None
+    index = graph_index.get_graph_index()
+    packer = kg_context.ContextPacker(budget).extend(index.neighborhood(seeds))
+    logging.info(f"retrieve_local: {', '.join(index.names[seeds])} -> {len(packer.lines)} lines")
+    return packer if packer.lines else None
+
+
+async def aretrieve(question, llm=None, run_query=None, executor=None):
+    """
+    Graph context of a question: from the local graph index when the question mentions known
+    entities (retrieve_local), else from LLM-generated Cypher run against Neo4j. Blocking graph
+    work runs in `executor` (default: the event loop's default executor).
+
+    :return: kg_context.ContextPacker
+    """
+    loop = asyncio.get_running_loop()
+    seeds, entities = await loop.run_in_executor(executor, link_entities, question)
+    records = await loop.run_in_executor(executor, retrieve_local, question, seeds)
+    if records is None:
+        query = await aget_query(question, entities, llm)  # cyphter编辑器模型
+        records = await loop.run_in_executor(executor, run_query or run_cypher_query, query)
+        cache = qa_cache.get_qa_cache()
+        if cache:
+            # 查询执行成功后才缓存 Cypher，避免缓存语法错误的查询
+            cache.put_cypher(question, query)
+    return records
+
+
+async def aask(question, conversation, llm=None, run_query=None, executor=None):
+    """
+    Answers one question: Cypher generation, graph query, answer generation, each level served
+    from the Q&A cache (qa_cache) when possible. Questions about known entities skip Cypher
+    generation and are answered from the local graph index (retrieve_local).
+
+    Blocking graph work (entity linking, local retrieval, Neo4j queries) runs in `executor`, so
+    many questions can be in flight on one loop.
+
+    :param conversation: Conversation of the asking user; the turn is appended to it
+    :param llm: async callable(messages) -> str, defaults to chat_client.asend_message
+    :param run_query: callable(cypher_query) -> ContextPacker, defaults to run_cypher_query
+    :param executor: concurrent.futures.Executor for the graph work, defaults to the loop's default executor
+    """
+    cache = qa_cache.get_qa_cache()
+    # 只缓存对话第一轮的回答：后续问题依赖上下文
+    first_turn = conversation.first_turn
+    answer = cache.get_answer(question) if cache and first_turn else None
+    if answer:
+        logging.info("ask: cached answer")
+        conversation.history.add_turn(question, answer)
+        return answer
+
+    records = await aretrieve(question, llm, run_query, executor)
+    answer = await aanswer_question(records, question, conversation, llm)  # kg辅助模型
+    if cache and first_turn:
+        cache.put_answer(question, answer)
+    return answer
+
+
+async def astream_ask(question, conversation, llm=None, run_query=None, llm_stream=None, executor=None):
+    """
+    Streaming aask: yields the answer text as the answer model generates it, so the first words
+    appear as soon as retrieval is done instead of after the whole completion. Cypher generation
+    is not streamed (the query is needed whole). A cached answer is yielded in one piece.
+
+    :param llm: async callable(messages) -> str for Cypher generation, defaults to chat_client.asend_message
+    :param run_query: callable(cypher_query) -> ContextPacker, defaults to run_cypher_query
+    :param llm_stream: callable(messages) -> async iterator of str, defaults to chat_client.astream_message
+    :param executor: concurrent.futures.Executor for the graph work, defaults to the loop's default executor
+    """
+    cache = qa_cache.get_qa_cache()
+    first_turn = conversation.first_turn
+    answer = cache.get_answer(question) if cache and first_turn else None
+    if answer:
+        logging.info("ask: cached answer")
+        conversation.history.add_turn(question, answer)
+        yield answer
+        return
+
+    records = await aretrieve(question, llm, run_query, executor)
+    pieces = []
+    async for piece in astream_answer_question(records, question, conversation, llm_stream):
+        pieces.append(piece)
+        yield piece
+    if cache and first_turn:
+        cache.put_answer(question, "".join(pieces))
+
+
+def ask(question, conversation):
+    return cc.dispatcher.run(aask(question, conversation))
+
+
+def stream_ask(question, conversation):
+    """Streaming ask for synchronous code: a generator over the answer text."""
+    return cc.dispatcher.iterate(astream_ask(question, conversation))
+
+
 def main():
-    cypher_messages = []
-    question_messages = []
+    conversation = Conversation()
     # 清空日志文件
     filename = '.\\1.log'
     with open(filename, 'w'):
@@ -102,10 +306,17 @@ def main():
             print("对话已结束。")
             break
 
-        query = get_query(question)  # cyphter编辑器模型
-        records = run_cypher_query(cypher_query=query)
-        answer = answer_question(kg_records=records, question=question)  # kg辅助模型
+        # 边生成边输出，不必等整段回答
+        pieces = []
+        for piece in stream_ask(question, conversation):
+            print(piece, end="", flush=True)
+            pieces.append(piece)
+        print()
+        answer = "".join(pieces)
         logging.info(f"answer:\n\t{answer}")
+        cache = qa_cache.get_qa_cache()
+        if cache:
+            logging.info(f"Q&A cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,20 @@
 import pdf_extract_text
 import chat_client as cc
-import csv_refine
-import txt2json
 import llm_with_neo4j
 import subprocess
 import txt_2_json
+import graph_update
+from pathlib import Path
 
-command = """neo4j-admin database import full `
-       --nodes=Node=C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/node_new.csv `
-       --relationships=ORDERED=C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/relation_new.csv `
+node_file = "C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/node_new.csv"
+relation_file = "C:/Soft/Neo4j/neo4j-community-5.25.1/import/import/relation_new.csv"
+
+# --id-type=INTEGER stores `id` as a number, as graph_update matches it in incremental updates; with the
+# default string ids those updates would match no imported node. Databases imported without it need a full re-import.
+command = f"""neo4j-admin database import full `
+       --id-type=INTEGER `
+       --nodes=Node={node_file} `
+       --relationships=ORDERED={relation_file} `
        --trim-strings=true neo4j `
        --multiline-fields=true `
        --overwrite-destination `
@@ -27,7 +33,7 @@ def run_powershell_command(command):
         capture_output=True,  # Capture output
         text=True             # Decode the output as a string.
     )
-    return result.stdout, result.stderr
+    return result.stdout, result.stderr, result.returncode
 
 if __name__ == "__main__":
     for i, task in enumerate(tasks):
@@ -67,11 +73,33 @@ if __name__ == "__main__":
                     continue
 
             elif task_num == 3:
-                stdout, stderr = run_powershell_command(command)
+                # Incremental updates MERGE only what changed since the last build, with the database online.
+                # A full import rebuilds the database from scratch (cold builds, or after deleting nodes).
+                mode = input("Full import or incremental update? (full/incremental): ").strip().lower()
+                if mode == 'incremental':
+                    counts = graph_update.update_graph(node_file, relation_file)
+                    print(f"Applied {counts['nodes']} nodes and {counts['relationships']} relationships; "
+                          f"{counts['removed_nodes']} nodes and {counts['removed_relationships']} relationships "
+                          f"no longer in the build were left in place.")
+                    continue
+                if mode != 'full':
+                    print("The operation has been canceled.")
+                    continue
+                stdout, stderr, returncode = run_powershell_command(command)
                 if stdout:
                     print(f"Standard output：{stdout}")
                 if stderr:
                     print(f"Error output：{stderr}")
+                # neo4j-admin also writes warnings to stderr; only the exit code tells whether the import succeeded
+                if returncode != 0:
+                    print(f"The import failed (exit code {returncode}).")
+                else:
+                    graph_update.record_full_import(node_file, relation_file)
+                    # neo4j-admin does not create indexes; they can only be added once the database is running
+                    schema_file = Path(node_file).with_name("schema.cypher")
+                    graph_update.write_schema(schema_file)
+                    print(f"Start the database, then create the indexes with `cypher-shell -f {schema_file}` "
+                          f"or `python graph_update.py --create-indexes`.")
             elif task_num == 4:
                 llm_with_neo4j.main()
         except ValueError:
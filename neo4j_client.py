@@ -0,0 +1,115 @@
+import os
+import atexit
+import logging
+import threading
+
+# --- Connection Settings ---
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "bjutB406")
+NEO4J_DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+# --- Pool Settings ---
+# Connections kept open per server. Each concurrent question holds one while its query runs.
+MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+# Seconds to wait for a free pooled connection before failing the query.
+ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "30"))
+# Seconds to establish a new connection.
+CONNECTION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_TIMEOUT", "15"))
+# Transaction functions are retried on transient errors (leader changes, deadlocks, dropped
+# connections) for up to this many seconds. Query errors such as bad Cypher are not retried.
+MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
+# Server-side timeout (seconds) for read queries, so a runaway generated query cannot hold a
+# connection indefinitely. 0 disables it.
+QUERY_TIMEOUT = float(os.getenv("NEO4J_QUERY_TIMEOUT", "30"))
+# Records pulled from the server per round trip while streaming. Smaller batches waste less when
+# a consumer stops early; larger ones need fewer round trips.
+FETCH_SIZE = int(os.getenv("NEO4J_FETCH_SIZE", "200"))
+
+# --- Shared Driver ---
+# Created on first use and closed at exit. The driver is thread-safe; sessions are not, so
+# every call below opens its own short-lived session on the shared pool.
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """Returns the process-wide Neo4j driver, creating it (and its connection pool) on first use."""
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            from neo4j import GraphDatabase
+
+            _driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                           max_connection_pool_size=MAX_POOL_SIZE,
+                                           connection_acquisition_timeout=ACQUISITION_TIMEOUT,
+                                           connection_timeout=CONNECTION_TIMEOUT,
+                                           max_transaction_retry_time=MAX_RETRY_TIME)
+            logging.info(f"Neo4j driver created for {NEO4J_URI} (pool size {MAX_POOL_SIZE}).")
+    return _driver
+
+
+def close_driver():
+    """Closes the shared driver and its pooled connections. The next call creates a new one."""
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+atexit.register(close_driver)
+
+
+def _unit_of_work(work, timeout):
+    from neo4j import unit_of_work
+
+    return unit_of_work(timeout=timeout)(work) if timeout else work
+
+
+def read_query(cypher_query, parameters=None, timeout=QUERY_TIMEOUT, database=NEO4J_DATABASE):
+    """
+    Runs a query in a read transaction on the shared driver, retrying transient failures.
+
+    Read transactions are routed to readers in a cluster and reject writes, which is what
+    the Q&A loop wants for LLM-generated Cypher.
+
+    :param cypher_query: A string containing the Cypher query to execute.
+    :param parameters: Query parameters.
+    :param timeout: Server-side transaction timeout in seconds; None or 0 for no timeout.
+    :param database: Database name.
+    :return: Query result as a list of dictionaries.
+    """
+    return read_stream(cypher_query, lambda records: [record.data() for record in records],
+                       parameters, timeout, database)
+
+
+def read_stream(cypher_query, consume, parameters=None, timeout=QUERY_TIMEOUT, database=NEO4J_DATABASE,
+                fetch_size=FETCH_SIZE):
+    """
+    Like read_query, but hands the records to `consume(records)` as they arrive and returns what it
+    returns. Records are fetched `fetch_size` at a time; if `consume` stops iterating early, the
+    rest of the result is discarded on the server instead of being transferred.
+
+    `consume` is called again from the start if the transaction is retried, so it must not keep
+    state between calls.
+    """
+    def work(tx):
+        return consume(tx.run(cypher_query, parameters))
+
+    with get_driver().session(database=database, fetch_size=fetch_size) as session:
+        return session.execute_read(_unit_of_work(work, timeout))
+
+
+def write_query(cypher_query, parameters=None, timeout=None, database=NEO4J_DATABASE):
+    """
+    Runs a query in a write transaction on the shared driver, retrying transient failures.
+    The whole transaction is re-run on retry, so the query should be idempotent (e.g. MERGE).
+
+    :return: the ResultSummary of the query
+    """
+    def work(tx):
+        return tx.run(cypher_query, parameters).consume()
+
+    with get_driver().session(database=database) as session:
+        return session.execute_write(_unit_of_work(work, timeout))
@@ -2,81 +2,514 @@ from pathlib import Path
 import requests
 import json
 import os
+import re
+import time
+import queue
 import logging
+import multiprocessing
 import concurrent.futures
-from threading import Lock
-from langchain_text_splitters import CharacterTextSplitter
+from collections import namedtuple
 from tqdm import tqdm
 from langchain_community.document_loaders import PyPDFLoader
 import chat_client as cc
+from extract_manifest import DocumentManifest, chunk_hash, DONE
+from text_cache import TextCache, TEXT_CACHE_ENABLED
+from chunk_dedup import NearDuplicateIndex, minhash, DEDUP_ENABLED
+from triple_store import TripleStoreWriter, stored_chunks
+
+
+# A chunk of document text plus the (1-based) page range it came from; pages are None for .txt input.
+Chunk = namedtuple("Chunk", ["text", "first_page", "last_page"])
 
 
 def load_PDF(pdf_path):
+    """
+    Yields (page_number, text) one page at a time, so the whole document is never held in memory.
+    Line breaks are kept (with whitespace inside lines collapsed) so the chunker can see headings
+    and paragraph ends.
+    """
     loader = PyPDFLoader(pdf_path,
                          extract_images=False,
                          )
-    # docs = loader.load()
-    # print(docs[0].metadata)
-    pages = []
-    for doc in loader.lazy_load():
-        doc = doc.page_content.replace('\n', ' ')
-        pages.append(doc)
-    return pages
-
-
-def text_splitter(art_text):
-    text = [art_text]
-    # Create a TextSplitter instance
-    text_splitter = CharacterTextSplitter(
-        separator=" ",
-        chunk_size=20000,
-        chunk_overlap=500,
-        length_function=len,
-        is_separator_regex=False,
-    )
-
-    #Create document
-    texts = text_splitter.create_documents(text)
-    print(f"art_text{len(art_text)} text_splitter len is :{len(texts)}")
-    return texts
-
-
-def process_pdf(txt_file, lock, prompt):
+    for i, doc in enumerate(loader.lazy_load()):
+        page_number = doc.metadata.get('page', i) + 1
+        lines = (' '.join(line.split()) for line in doc.page_content.splitlines())
+        yield page_number, '\n'.join(lines) + '\n'
+
+
+def load_txt(txt_path, block_size=1 << 16):
+    """Yields (None, text) in blocks of whole lines of about `block_size` characters."""
+    with open(txt_path, 'r', encoding="utf-8") as f:
+        block = []
+        size = 0
+        for line in f:
+            block.append(line)
+            size += len(line)
+            if size >= block_size:
+                yield None, ''.join(block)
+                block, size = [], 0
+        if block:
+            yield None, ''.join(block)
+
+
+# Headings that start a new section, either well-known names (any case) alone on their line, optionally
+# numbered and followed by ':' (so "Results show that ..." is body text), or short numbered titles
+# ("2.1 Cell assembly", "3 XRD analysis"). The numbered form is case-sensitive and needs a capitalized
+# word of 2+ letters, so body lines such as "2 m h2so4 was used" or "2 M H2SO4 ..." are not headings.
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:(?:\d+(?:\.\d+)*\.?|[IVX]+\.)[ \t]+)?(?i:abstract|introduction|background|experimental(?: section)?"
+    r"|materials? and methods|methods?|results(?: and discussion)?|discussion|conclusions?|summary|outlook"
+    r"|acknowledge?ments?|references|appendix)[ \t]*:?[ \t]*$"
+    r"|^[ \t]*\d+(?:\.\d+)*\.?[ \t]+[A-Z][A-Za-z-]+\b[^\n]{0,80}$",
+    re.MULTILINE)
+REFERENCES_HEADING = re.compile(r"^\s*(?:\d+\.?\s*)?(?:references(?: and notes)?|bibliography|literature cited)\s*:?\s*$",
+                                re.IGNORECASE)
+# Sections that can follow the reference list and are worth extracting again.
+AFTER_REFERENCES_HEADING = re.compile(r"^\s*(?:appendix|supplementary|supporting information)\b", re.IGNORECASE)
+PARAGRAPH_END = re.compile(r"\n[ \t]*\n|[.!?:][\"')\]]?[ \t]*\n")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]?\s")
+
+
+def drop_references(pages):
     """
-    :param txt_file:  Enter the text content of txt
-    :param lock:
-    :param prompt: Prompt words
-    :return:
+    Filters the reference list out of a (page_number, text) stream; the extraction prompt tells
+    the model to skip references, so there is no point paying to send them.
     """
-    print(f"Processing {txt_file}")
+    in_references = False
+    for page_number, text in pages:
+        kept = []
+        for line in text.splitlines(keepends=True):
+            if in_references:
+                if AFTER_REFERENCES_HEADING.match(line):
+                    in_references = False
+                    kept.append(line)
+            elif REFERENCES_HEADING.match(line):
+                in_references = True
+            else:
+                kept.append(line)
+        if kept:
+            yield page_number, ''.join(kept)
 
-    current_dir = Path.cwd()
-    output_file = current_dir / txt_file.stem
-    output_file.mkdir(parents=True, exist_ok=True)
-    article_text =""
-    if txt_file.suffix == '.pdf':
-        article_text = load_PDF(txt_file)
-    elif txt_file.suffix == '.txt':
-        with open(txt_file, 'r', encoding="utf-8") as f:
-            article_text = f.read()
-    texts = text_splitter(article_text)
 
+def _best_cut(buffer, limit, min_cut, separator):
+    """
+    Where to end a chunk of at most `limit` characters: at a section heading if one is near the end,
+    else a paragraph end, a sentence end, the separator, or a hard cut, in that order.
+    Only the last quarter of the chunk is searched, so a nicer boundary never costs more than that.
+
+    :return: (cut position, True if the cut is at a section heading)
+    """
+    window_start = max(min_cut, limit * 3 // 4)
+    if window_start >= limit:
+        return limit, False
+    headings = [m.start() for m in SECTION_HEADING.finditer(buffer, window_start, limit) if m.start() > window_start]
+    if headings:
+        return headings[-1], True
+    for pattern in (PARAGRAPH_END, SENTENCE_END):
+        ends = [m.end() for m in pattern.finditer(buffer, window_start, limit)]
+        if ends:
+            return ends[-1], False
+    cut = buffer.rfind(separator, window_start + 1, limit)
+    return (cut if cut != -1 else limit), False
+
+
+def _token_limit(buffer, token_budget, count_tokens):
+    """Largest prefix length of `buffer` (in characters) that fits in `token_budget` tokens."""
+    low, high = 0, len(buffer)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(buffer[:mid]) <= token_budget:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def text_splitter(pages, chunk_size=20000, chunk_overlap=500, separator=" ", token_budget=None, count_tokens=None):
+    """
+    Rolling chunker over a stream of (page_number, text) pieces.
+
+    Emits a Chunk as soon as it is full, so memory stays O(chunk size) no matter how long the document is.
+    A chunk is full at `chunk_size` characters, or at `token_budget` tokens (measured with `count_tokens`)
+    when a budget is given. Chunks end at section headings, paragraph or sentence ends where possible
+    (see `_best_cut`). About `chunk_overlap` characters are carried into the next chunk, except after a
+    section heading cut.
+    """
+    if token_budget is not None and count_tokens is None:
+        count_tokens = cc.count_tokens
+    buffer = ""
+    buffer_tokens = 0  # sum of the pieces' token counts; close to, not exactly, the buffer's count
+    # (offset in buffer, page number) for every page that starts in, or spans into, the buffer
+    page_starts = []
+    already_emitted = 0  # length of the buffer prefix that was part of the previous chunk
+
+    def page_range(end):
+        in_chunk = [page for offset, page in page_starts if offset < end]
+        return in_chunk[0], in_chunk[-1]
+
+    def emit(cut, at_section):
+        nonlocal buffer, page_starts, already_emitted, buffer_tokens
+        first_page, last_page = page_range(cut)
+        chunk = Chunk(buffer[:cut].strip(), first_page, last_page)
+        # Start the overlap on a separator boundary so no word is split.
+        overlap_start = buffer.find(separator, max(cut - chunk_overlap, 0), cut)
+        if overlap_start == -1 or chunk_overlap <= 0 or at_section:
+            overlap_start = cut
+        else:
+            overlap_start += len(separator)
+        buffer = buffer[overlap_start:]
+        kept = [(offset - overlap_start, page) for offset, page in page_starts if offset >= overlap_start]
+        carried = [page for offset, page in page_starts if offset < overlap_start]
+        if carried and (not kept or kept[0][0] > 0):
+            kept.insert(0, (0, carried[-1]))
+        page_starts = kept
+        already_emitted = cut - overlap_start
+        if token_budget is not None:
+            buffer_tokens = count_tokens(buffer)
+        return chunk
+
+    def full_limit():
+        """Character limit of the next chunk if the buffer is full, else None."""
+        if token_budget is None:
+            return chunk_size if len(buffer) >= chunk_size else None
+        if buffer_tokens <= token_budget:
+            return None
+        limit = _token_limit(buffer, token_budget, count_tokens)
+        return limit if limit < len(buffer) else None
+
+    for page_number, text in pages:
+        if not text:
+            continue
+        if not page_starts or page_starts[-1][1] != page_number:
+            page_starts.append((len(buffer), page_number))
+        buffer += text
+        if token_budget is not None:
+            buffer_tokens += count_tokens(text)
+        limit = full_limit()
+        while limit is not None:
+            cut, at_section = _best_cut(buffer, limit, min(chunk_overlap + 1, limit - 1), separator)
+            yield emit(cut, at_section)
+            limit = full_limit()
+
+    if len(buffer) > already_emitted and buffer.strip():
+        yield emit(len(buffer), False)
+
+
+def record_result(manifest, index, future):
+    """Writes a finished chunk request to `{index}.txt` and updates the manifest."""
     try:
-        for i, text in enumerate(texts):
-            article_text_str = str(text)
-            print(len(article_text_str))
-            message = []
-            message.append({'role': 'system', 'content': prompt})
-            message.append({'role': 'user', 'content': article_text_str})
-            response_data = cc.send_message(messages=message)
-            if response_data:
-                print("AI:", response_data)
-            output_txt_path = output_file / f"{i}.txt"
-            # with Lock:
-            with open(output_txt_path, "w", encoding="utf-8") as w:
-                w.write(response_data)
+        result = future.result()
+        output_txt_path = manifest.output_path(index)
+        with open(output_txt_path, "w", encoding="utf-8") as w:
+            w.write(result.content)
+        manifest.mark_done(index, result.provider, result.latency, result.cached)
+        return True
     except Exception as e:
-        print(e)
+        source = manifest.data["source"]
+        print(f"{Path(source).name} chunk {index} failed: {e}")
+        logging.error(f"{source} chunk {index}: {e}")
+        manifest.mark_failed(index, e)
+        return False
+
+
+def record_duplicate(manifest, index, source_manifest, source_index):
+    """Reuses the output of a near-duplicate chunk instead of sending this one to the LLM; returns that output."""
+    with open(source_manifest.output_path(source_index), 'r', encoding="utf-8") as f:
+        content = f.read()
+    with open(manifest.output_path(index), "w", encoding="utf-8") as w:
+        w.write(content)
+    manifest.mark_done(index, None, 0.0, duplicate_of=f"{source_manifest.data['source']}#{source_index}")
+    return content
+
+
+def load_document(doc_path):
+    """
+    Page stream for a .pdf or .txt document. Parsed PDF text is cached by file content in a
+    `.textcache` directory next to the document, so unchanged PDFs are parsed only once.
+
+    :return: (text_cache_hit, generator of (page_number, text))
+    """
+    doc_path = Path(doc_path)
+    if doc_path.suffix == '.pdf':
+        if TEXT_CACHE_ENABLED:
+            return TextCache(doc_path.parent).open_pages(doc_path, load_PDF)
+        return False, load_PDF(doc_path)
+    if doc_path.suffix == '.txt':
+        return False, load_txt(doc_path)
+    raise ValueError(f"Unsupported document type: {doc_path.suffix}")
+
+
+# --- Two-stage pipeline ---
+# Stage 1 parses and chunks documents in a process pool (CPU-bound, outside the GIL of this
+# process); stage 2 in this process drains the bounded chunk queue into the LLM dispatcher.
+PARSE_WORKERS = int(os.getenv("EXTRACT_PARSE_WORKERS", str(os.cpu_count() or 1)))
+MAX_IN_FLIGHT = int(os.getenv("EXTRACT_MAX_IN_FLIGHT", "64"))
+CHUNK_QUEUE_SIZE = int(os.getenv("EXTRACT_CHUNK_QUEUE_SIZE", "32"))
+REPORT_INTERVAL = float(os.getenv("EXTRACT_REPORT_INTERVAL", "10"))
+
+_chunk_queue = None
+
+
+def _init_parse_worker(chunk_queue):
+    global _chunk_queue
+    _chunk_queue = chunk_queue
+
+
+def parse_document(doc_path, token_budget=None):
+    """
+    Process-pool task: streams the chunks of one document into the shared chunk queue.
+
+    The queue is bounded, so `put` blocks while the LLM stage is saturated; that is the
+    pipeline's backpressure. The reference list is dropped and chunks are sized to `token_budget`
+    tokens (character-sized if None). Each chunk is sent with its MinHash signature so the
+    main process can spot near-duplicates without hashing text itself.
+
+    :return: (chunk_count, page_count, text_cache_hit, error message or None)
+    """
+    page_numbers = set()
+    chunk_count = 0
+    cache_hit = False
+
+    def pages(page_stream):
+        for page_number, text in page_stream:
+            page_numbers.add(page_number)
+            yield page_number, text
+
+    try:
+        cache_hit, page_stream = load_document(doc_path)
+        for i, chunk in enumerate(text_splitter(drop_references(pages(page_stream)), token_budget=token_budget)):
+            signature = minhash(chunk.text) if DEDUP_ENABLED else None
+            _chunk_queue.put((doc_path, i, chunk, len(page_numbers - {None}), signature))
+            chunk_count += 1
+    except Exception as e:
+        return chunk_count, len(page_numbers - {None}), cache_hit, str(e)
+    return chunk_count, len(page_numbers - {None}), cache_hit, None
+
+
+class PipelineStats:
+    """Throughput counters for the extraction pipeline."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.pages = 0
+        self.chunks = 0
+        self.skipped = 0
+        self.requests_done = 0
+        self.requests_failed = 0
+        self.in_flight = 0
+        self.text_cache_hits = 0
+        self.duplicates = 0
+        self.duplicate_tokens = 0
+        self.triples = 0
+
+    def rates(self):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        return {
+            "pages/s": round(self.pages / elapsed, 2),
+            "chunks/s": round(self.chunks / elapsed, 2),
+            "in_flight": self.in_flight,
+        }
+
+    def report(self):
+        elapsed = time.monotonic() - self.start
+        return (f"{elapsed:.0f}s: {self.pages} pages ({self.text_cache_hits} documents from text cache), "
+                f"{self.chunks} chunks ({self.skipped} already done), "
+                f"{self.duplicates} near-duplicates reused (~{self.duplicate_tokens} tokens saved), "
+                f"{self.requests_done} requests ok, {self.requests_failed} failed, {self.in_flight} in flight, "
+                f"{self.triples} triples stored, "
+                f"{self.rates()['pages/s']} pages/s, {self.rates()['chunks/s']} chunks/s")
+
+
+class _DocState:
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.received = 0
+        self.pages = 0
+        self.expected = None  # chunk count, known once the parse task has finished
+        self.complete = True
+        self.duplicates = 0
+
+
+def run_pipeline(doc_paths, prompt, parse_workers=PARSE_WORKERS, max_in_flight=MAX_IN_FLIGHT,
+                 queue_size=CHUNK_QUEUE_SIZE, store_dir=None):
+    """
+    Extracts triples from many documents with parsing and LLM calls in separate stages.
+
+    :param doc_paths: .pdf/.txt files to process
+    :param prompt: Prompt words
+    :param parse_workers: processes parsing and chunking documents
+    :param max_in_flight: LLM requests allowed in flight before the chunk queue stops being drained
+    :param queue_size: chunks buffered between the two stages
+    :param store_dir: if given, triples parsed from each new output are appended to this triple store
+        (see triple_store), so the graph build does not need the .json/.csv intermediates; outputs
+        finished by earlier runs that are missing from the store are added too
+    :return: (chunk status counts over all documents, PipelineStats)
+
+    Chunks that are near-duplicates (MinHash/LSH, see chunk_dedup) of a chunk seen earlier in the
+    corpus are not sent; they reuse that chunk's output once it is available.
+    """
+    current_dir = Path.cwd()
+    docs = {}
+    for doc_path in doc_paths:
+        output_file = current_dir / Path(doc_path).stem
+        output_file.mkdir(parents=True, exist_ok=True)
+        docs[str(doc_path)] = _DocState(DocumentManifest(output_file, doc_path))
+
+    token_budget = cc.chunk_token_budget(prompt)
+    logging.info(f"Chunk budget: {token_budget} tokens per request.")
+    stats = PipelineStats()
+    events = queue.Queue()  # parse and LLM completions, delivered from their callback threads
+    open_docs = set(docs)
+    ctx = multiprocessing.get_context()
+    chunk_queue = ctx.Queue(maxsize=queue_size)
+    dedup_index = NearDuplicateIndex()
+    finished = set()  # (doc_path, index) of indexed chunks whose output exists
+    requested = set()  # (doc_path, index) of chunks with a request in flight
+    waiting = {}  # (doc_path, index) of an in-flight chunk -> near-duplicates waiting for its output
+    writer = TripleStoreWriter(store_dir) if store_dir else None
+    # Chunks already in the store; finished chunks from runs that did not write to it are added when skipped.
+    in_store = stored_chunks(store_dir) if writer is not None else set()
+
+    def store(doc_path, index, content):
+        if writer is not None:
+            stats.triples += writer.append_output(content, Path(doc_path).stem.title(), doc_path, index)
+
+    def close_if_finished(doc_path):
+        doc = docs[doc_path]
+        if doc_path in open_docs and doc.expected is not None and doc.received >= doc.expected:
+            if doc.complete:
+                doc.manifest.truncate(doc.expected)
+                if writer is not None:
+                    # Chunks past the end of the document keep no triples in the store either.
+                    for source, index in [key for key in in_store if key[0] == doc_path and key[1] >= doc.expected]:
+                        writer.retire(source, index)
+                        in_store.discard((source, index))
+            open_docs.discard(doc_path)
+            progress.update(1)
+
+    def handle_event(event):
+        kind, doc_path, payload = event[0], event[1], event[2]
+        doc = docs[doc_path]
+        if kind == "parsed":
+            try:
+                chunk_count, page_count, cache_hit, error = payload.result()
+            except Exception as e:  # the worker process died
+                chunk_count, page_count, cache_hit, error = doc.received, doc.pages, False, str(e)
+            stats.text_cache_hits += cache_hit
+            if error:
+                print(f"{Path(doc_path).name} could not be read: {error}")
+                logging.error(f"{doc_path}: {error}")
+                doc.complete = False
+            if page_count > doc.pages:
+                stats.pages += page_count - doc.pages
+                doc.pages = page_count
+            doc.expected = chunk_count
+        else:
+            stats.in_flight -= 1
+            key = (doc_path, payload)
+            requested.discard(key)
+            if record_result(doc.manifest, payload, event[3]):
+                stats.requests_done += 1
+                finished.add(key)
+                store(doc_path, payload, event[3].result().content)
+                for dup_path, dup_index, _ in waiting.pop(key, ()):
+                    store(dup_path, dup_index,
+                          record_duplicate(docs[dup_path].manifest, dup_index, doc.manifest, payload))
+                    close_if_finished(dup_path)
+            else:
+                stats.requests_failed += 1
+                # The duplicates have nothing to reuse; send them on their own.
+                for dup_path, dup_index, message in waiting.pop(key, ()):
+                    submit(dup_path, dup_index, message)
+        close_if_finished(doc_path)
+
+    def submit(doc_path, i, message):
+        future = cc.submit_message(message)
+        stats.in_flight += 1
+        requested.add((doc_path, i))
+        future.add_done_callback(lambda f, d=doc_path, n=i: events.put(("answered", d, n, f)))
+
+    def handle_chunk(doc_path, i, chunk, pages_so_far, signature):
+        doc = docs[doc_path]
+        doc.received += 1
+        stats.chunks += 1
+        if pages_so_far > doc.pages:
+            stats.pages += pages_so_far - doc.pages
+            doc.pages = pages_so_far
+        hash_value = chunk_hash(prompt, chunk.text)
+        doc.manifest.register(i, hash_value, chunk.first_page, chunk.last_page)
+        key = (doc_path, i)
+        if not doc.manifest.needs_run(i, hash_value):
+            stats.skipped += 1
+            if doc.manifest.entry(i).get("status") == DONE:
+                # Finished in an earlier run: later chunks may still reuse its output.
+                dedup_index.add(key, signature)
+                finished.add(key)
+                if writer is not None and (doc_path, i) not in in_store:
+                    with open(doc.manifest.output_path(i), 'r', encoding="utf-8") as f:
+                        store(doc_path, i, f.read())
+            close_if_finished(doc_path)
+            return
+
+        message = [{'role': 'system', 'content': prompt},
+                   {'role': 'user', 'content': chunk.text}]
+        original = dedup_index.query(signature)
+        if original in finished or original in requested:
+            stats.duplicates += 1
+            stats.duplicate_tokens += len(chunk.text) // 4
+            doc.duplicates += 1
+            if original in finished:
+                store(doc_path, i, record_duplicate(doc.manifest, i, docs[original[0]].manifest, original[1]))
+            else:
+                waiting.setdefault(original, []).append((doc_path, i, message))
+        else:
+            # New content, or a near-duplicate of a chunk that failed: send it.
+            dedup_index.add(key, signature)
+            submit(doc_path, i, message)
+        close_if_finished(doc_path)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers, mp_context=ctx,
+                                                initializer=_init_parse_worker,
+                                                initargs=(chunk_queue,)) as pool, \
+            tqdm(total=len(docs), desc="Processing documents") as progress:
+        for doc_path in docs:
+            pool.submit(parse_document, doc_path, token_budget).add_done_callback(
+                lambda f, d=doc_path: events.put(("parsed", d, f)))
+
+        last_report = time.monotonic()
+        while open_docs or stats.in_flight:
+            while True:
+                try:
+                    handle_event(events.get_nowait())
+                except queue.Empty:
+                    break
+            if stats.in_flight < max_in_flight and open_docs:
+                try:
+                    handle_chunk(*chunk_queue.get(timeout=0.05))
+                except queue.Empty:
+                    pass
+            else:
+                # Saturated: leave the chunk queue alone (parsers block on it) until a request finishes.
+                try:
+                    handle_event(events.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+            if time.monotonic() - last_report >= REPORT_INTERVAL:
+                last_report = time.monotonic()
+                progress.set_postfix(stats.rates())
+                logging.info(stats.report())
+
+    if writer is not None:
+        writer.close()
+    totals = {}
+    for doc_path, doc in docs.items():
+        for status, n in doc.manifest.counts().items():
+            totals[status] = totals.get(status, 0) + n
+        if doc.received and doc.duplicates / doc.received >= 0.8:
+            print(f"{Path(doc_path).name}: {doc.duplicates}/{doc.received} chunks are near-duplicates "
+                  f"of other documents (likely another version of the same paper)")
+    return totals, stats
+
 
 def main():
     # Define a system message as part of the context.
@@ -106,23 +539,19 @@ def main():
     target_dir_name = "pdfoutputreview"
     txt_dir = current_dir / target_dir_name
     txt_dir.mkdir(parents=True, exist_ok=True)
-    txt_paths = list(txt_dir.glob("*.txt"))
     # for file in tqdm(txt_paths):
     #     file = str(file)
         # txt_path = os.path.join(txt_dir, file)
 
 
-    # Initialize locks and thread pools
-    lock = Lock()
-    max_workers = 80
+    doc_paths = sorted(list(txt_dir.glob("*.pdf")) + list(txt_dir.glob("*.txt")))
+    totals, stats = run_pipeline(doc_paths, prompt, store_dir=os.getenv("TRIPLE_STORE_DIR", "triple_store"))
+    print(stats.report())
+    print(f"Chunks by status: {totals}. Re-run to retry failed chunks; finished chunks are skipped.")
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Use TQDM to track progress and submit tasks.
-        list(tqdm(
-            executor.map(lambda file: process_pdf(file, lock, prompt), txt_paths),
-            total=len(txt_paths),
-            desc="Processing jsons"
-        ))
+    cache = cc.get_response_cache()
+    if cache is not None:
+        print(f"LLM response cache: {cache.stats()}")
 
 
 if __name__ == "__main__":
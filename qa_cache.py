@@ -0,0 +1,285 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from subNeo4j.entity_canonical import chemically_distinct, one_edit_apart
+
+# --- Q&A Cache Settings ---
+QA_CACHE_ENABLED = os.getenv("QA_CACHE_DISABLE", "").lower() not in ("1", "true", "yes")
+# Entries per level. Traffic is mostly repeated questions about a few hundred materials.
+ANSWER_ENTRIES = int(os.getenv("QA_CACHE_ANSWERS", "1000"))
+CYPHER_ENTRIES = int(os.getenv("QA_CACHE_CYPHER", "5000"))
+RESULT_ENTRIES = int(os.getenv("QA_CACHE_RESULTS", "2000"))
+# Seconds before answers and query results expire even if the graph was not rebuilt, 0 = never.
+# Generated Cypher does not depend on the data and only leaves the cache by LRU eviction.
+ANSWER_TTL = float(os.getenv("QA_CACHE_TTL", "3600"))
+# Cosine similarity of question embeddings above which a cached question is considered a candidate.
+# Candidates are only reused if they differ by typos (see same_question).
+SIMILARITY_THRESHOLD = float(os.getenv("QA_CACHE_SIMILARITY", "0.8"))
+# Shorter words are only matched exactly: "zinc" vs "zn" or "pe" vs "pp" are different things.
+MIN_TYPO_WORD_LENGTH = 5
+EMBEDDING_DIMS = 1024
+
+_STOPWORDS = {"a", "an", "the", "please", "tell", "me", "can", "you", "could", "would", "of", "for", "in",
+              "on", "about", "is", "are", "was", "were", "do", "does", "did", "what", "which", "that"}
+
+
+def normalize_question(question):
+    """
+    Matching form of a question: lowercase, punctuation and filler words dropped, simple plurals
+    reduced. "What are the references about VRFBs?" -> "reference vrfb".
+    """
+    words = re.findall(r"[a-z0-9][a-z0-9.+\-]*", str(question).lower())
+    words = [re.sub(r"(\w{2,})ies$", r"\1y", w) for w in words if w not in _STOPWORDS]
+    return " ".join(re.sub(r"(\w{3,}[^su])s$", r"\1", w) for w in words)
+
+
+def same_question(normalized, other):
+    """
+    True if two normalized questions have the same words up to one-character typos in words of
+    at least MIN_TYPO_WORD_LENGTH letters ("refernce" / "reference"). Entity names, numbers and
+    word order must match, so "zinc flow battery" never stands in for "redox flow battery", and an
+    edit in a chemical suffix names another compound, so "zinc bromine" never stands in for "zinc bromide".
+    """
+    words, other_words = normalized.split(" "), other.split(" ")
+    if len(words) != len(other_words):
+        return False
+    return all(w == o or (min(len(w), len(o)) >= MIN_TYPO_WORD_LENGTH and w.isalpha() and o.isalpha()
+                          and one_edit_apart(w, o) and not chemically_distinct(w, o))
+               for w, o in zip(words, other_words))
+
+
+def embed_question(normalized):
+    """
+    Local question embedding: hashed character trigrams, L2-normalized. Cheap enough to compute
+    per question and tolerant of typos and inflection ("antraquinone" ~ "anthraquinone").
+    """
+    vector = np.zeros(EMBEDDING_DIMS, dtype=np.float32)
+    padded = f"  {normalized} "
+    for i in range(len(padded) - 2):
+        vector[zlib.crc32(padded[i:i + 3].encode("utf-8")) % EMBEDDING_DIMS] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def digest(text):
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """
+    Bounded in-memory cache: least-recently-used entries are evicted beyond `max_entries`, and
+    entries older than `ttl` seconds (0 = no expiry) count as misses. Thread-safe.
+    """
+
+    def __init__(self, max_entries, ttl=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, created)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.time() - entry[1] > self.ttl:
+                self._remove(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if value is None:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            self._added(key, value)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _added(self, key, value):
+        pass
+
+    def _remove(self, key):
+        del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current number of entries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+class SimilarityCache(LRUCache):
+    """
+    LRUCache keyed by normalized question that also answers near-duplicates. On an exact miss,
+    cached questions whose embedding reaches cosine similarity `threshold` are candidates, most
+    similar first, and the first one that is the same question up to typos (same_question) is used.
+    The embedding only narrows the search; it never decides a match on its own.
+    """
+
+    def __init__(self, max_entries, threshold=SIMILARITY_THRESHOLD, embed=embed_question):
+        super().__init__(max_entries)
+        self.threshold = threshold
+        self.embed = embed
+        self.similar_hits = 0
+        self._vectors = {}
+        self._matrix = None  # (keys, stacked vectors), rebuilt after changes
+
+    def _added(self, key, value):
+        self._vectors[key] = self.embed(key)
+        self._matrix = None
+
+    def _remove(self, key):
+        super()._remove(key)
+        self._vectors.pop(key, None)
+        self._matrix = None
+
+    def get(self, key):
+        value = super().get(key)
+        if value is not None or not self._vectors:
+            return value
+        with self._lock:
+            if self._matrix is None:
+                keys = list(self._vectors)
+                self._matrix = (keys, np.stack([self._vectors[k] for k in keys]))
+            keys, matrix = self._matrix
+            scores = matrix @ self.embed(key)
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self.threshold:
+                    return None
+                if same_question(key, keys[index]):
+                    # The exact lookup above already counted a miss; count this as a similar hit.
+                    self.misses -= 1
+                    self.hits += 1
+                    self.similar_hits += 1
+                    self._entries.move_to_end(keys[index])
+                    return self._entries[keys[index]][0]
+        return None
+
+    def stats(self):
+        return {**super().stats(), "similar_hits": self.similar_hits}
+
+
+def graph_version(state_dir=None):
+    """
+    Identifies the current graph build: the modification time of the snapshot graph_update saves
+    after every full import and incremental update. None if no build was recorded.
+    """
+    import graph_update
+
+    path = graph_update.BuildSnapshot(state_dir or graph_update.STATE_DIR).relationship_path
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class QACache:
+    """
+    Three-level cache of the question -> Cypher -> result -> answer path of llm_with_neo4j:
+
+    - answers: exact normalized question -> answer, for questions asked without earlier turns
+      (a follow-up depends on the conversation). Skips both LLM calls and the graph query.
+    - cypher: normalized question -> generated Cypher, also matched by embedding similarity.
+      Skips the Cypher generation call.
+    - results: Cypher -> packed query result. Skips the graph query.
+
+    Answers and results are tied to the graph build (graph_version) and dropped when the graph is
+    rebuilt or updated; the version is checked at most every `version_interval` seconds.
+    """
+
+    def __init__(self, answer_entries=ANSWER_ENTRIES, cypher_entries=CYPHER_ENTRIES,
+                 result_entries=RESULT_ENTRIES, ttl=ANSWER_TTL, version_interval=5.0, state_dir=None):
+        self.answers = LRUCache(answer_entries, ttl)
+        self.cypher = SimilarityCache(cypher_entries)
+        self.results = LRUCache(result_entries, ttl)
+        self.state_dir = state_dir
+        self.version_interval = version_interval
+        self._version = graph_version(state_dir)
+        self._version_checked = time.time()
+        self.invalidations = 0
+
+    def _check_version(self):
+        if time.time() - self._version_checked < self.version_interval:
+            return
+        self._version_checked = time.time()
+        version = graph_version(self.state_dir)
+        if version != self._version:
+            self._version = version
+            self.invalidate()
+
+    def invalidate(self):
+        """Drops everything that depends on the graph contents (answers and results)."""
+        self.answers.clear()
+        self.results.clear()
+        self.invalidations += 1
+
+    def get_answer(self, question):
+        self._check_version()
+        return self.answers.get(normalize_question(question))
+
+    def put_answer(self, question, answer):
+        self.answers.put(normalize_question(question), answer)
+
+    def get_cypher(self, question):
+        return self.cypher.get(normalize_question(question))
+
+    def put_cypher(self, question, cypher_query):
+        self.cypher.put(normalize_question(question), cypher_query)
+
+    def get_result(self, cypher_query):
+        self._check_version()
+        return self.results.get(digest(cypher_query))
+
+    def put_result(self, cypher_query, result):
+        self.results.put(digest(cypher_query), result)
+
+    def stats(self):
+        return {"answers": self.answers.stats(), "cypher": self.cypher.stats(), "results": self.results.stats(),
+                "invalidations": self.invalidations}
+
+
+# --- Process-wide Cache ---
+_qa_cache = None
+_qa_cache_lock = threading.Lock()
+
+
+def get_qa_cache():
+    """Returns the process-wide QACache, or None when QA_CACHE_DISABLE is set."""
+    global _qa_cache
+    if not QA_CACHE_ENABLED:
+        return None
+    with _qa_cache_lock:
+        if _qa_cache is None:
+            _qa_cache = QACache()
+    return _qa_cache
@@ -0,0 +1,300 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_with_neo4j
+import qa_cache
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+# --- Service Settings ---
+QA_HOST = os.getenv("QA_HOST", "127.0.0.1")
+QA_PORT = int(os.getenv("QA_PORT", "8080"))
+# Questions processed at the same time. Each one holds an LLM slot (see chat_client limits) or a graph worker.
+MAX_CONCURRENCY = int(os.getenv("QA_MAX_CONCURRENCY", "32"))
+# Questions allowed to wait for a slot; beyond that requests are rejected with 503 instead of queueing forever.
+MAX_QUEUE = int(os.getenv("QA_MAX_QUEUE", "64"))
+# Threads for blocking graph work (entity linking, local retrieval, Neo4j queries).
+GRAPH_WORKERS = int(os.getenv("QA_GRAPH_WORKERS", "8"))
+# Sessions idle longer than this (seconds) are dropped; the oldest are dropped beyond MAX_SESSIONS.
+SESSION_TTL = float(os.getenv("QA_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("QA_MAX_SESSIONS", "1000"))
+# Last line of a streamed answer that failed after it started: "[error] <message>".
+STREAM_ERROR_PREFIX = "[error] "
+
+
+class Overloaded(Exception):
+    """Raised when a question arrives while MAX_QUEUE questions are already waiting."""
+
+
+class AdmissionController:
+    """
+    Bounds the questions in flight (`max_concurrency`) and the questions waiting for a slot
+    (`max_queue`), and keeps queue-depth and latency metrics.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.service_seconds = 0.0
+
+    async def run(self, coro):
+        """Runs `coro` once a slot is free; raises Overloaded (and closes `coro`) if the queue is full."""
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            coro.close()
+            raise Overloaded()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        start = time.perf_counter()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.admitted += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        self.wait_seconds += started - start
+        try:
+            result = await coro
+            self.completed += 1
+            return result
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.service_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    def stats(self):
+        done = self.completed + self.failed
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_seconds": self.wait_seconds / self.admitted if self.admitted else 0.0,
+            "avg_service_seconds": self.service_seconds / done if done else 0.0,
+        }
+
+
+class SessionStore:
+    """Conversations by session id, with idle expiry and a bound on their number (LRU)."""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # id -> [Conversation, asyncio.Lock, last used]
+
+    def get(self, session_id=None):
+        """Returns (session id, conversation, lock); creates a session for an unknown or missing id."""
+        now = time.time()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest[2] <= self.ttl and len(self._sessions) < self.max_sessions:
+                break
+            if oldest_id == session_id:
+                break
+            del self._sessions[oldest_id]
+        if session_id not in self._sessions:
+            session_id = session_id or uuid.uuid4().hex
+            self._sessions[session_id] = [llm_with_neo4j.Conversation(), asyncio.Lock(), now]
+        session = self._sessions[session_id]
+        session[2] = now
+        self._sessions.move_to_end(session_id)
+        return session_id, session[0], session[1]
+
+    def drop(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class QAService:
+    """
+    Multi-user HTTP front end of the llm_with_neo4j pipeline on one asyncio loop.
+
+    Every session has its own Conversation; questions of one session run one at a time so its
+    history stays ordered, while questions of different sessions run concurrently up to the
+    admission limits. The LLM and graph backends can be replaced, e.g. by stubs in tests.
+
+    Endpoints:
+        POST   /ask                 {"question": "...", "session_id": "..." (optional)}
+                                    -> {"session_id": "...", "answer": "..."}; 503 when overloaded
+        POST   /ask/stream          same body -> the answer as chunked text/plain while it is generated,
+                                    session id in the X-Session-Id header; 503 when overloaded
+        DELETE /sessions/{id}       forget a conversation
+        GET    /metrics             admission, session and Q&A cache metrics
+        GET    /health
+    """
+
+    def __init__(self, llm=None, run_query=None, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE,
+                 graph_workers=GRAPH_WORKERS, sessions=None, llm_stream=None):
+        """
+        :param llm: async callable(messages) -> str, defaults to chat_client.asend_message
+        :param run_query: callable(cypher_query) -> ContextPacker, defaults to llm_with_neo4j.run_cypher_query
+        :param llm_stream: callable(messages) -> async iterator of str, defaults to chat_client.astream_message
+        """
+        self.llm = llm
+        self.run_query = run_query
+        self.llm_stream = llm_stream
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.graph_workers = graph_workers
+        self.sessions = sessions if sessions is not None else SessionStore()
+        self.admission = None
+        self._executor = None
+
+    async def ask(self, question, session_id=None):
+        """Answers a question in a session; returns (session id, answer). Raises Overloaded."""
+        async def answer():
+            # The session is created only after admission, so rejected requests do not use one up.
+            active_id, conversation, lock = self.sessions.get(session_id)
+            async with lock:
+                return active_id, await llm_with_neo4j.aask(question, conversation, self.llm, self.run_query,
+                                                            self._executor)
+
+        return await self.admission.run(answer())
+
+    async def stream(self, question, request, session_id=None):
+        """
+        Answers a question in a session, writing the answer to a streaming HTTP response as it is
+        generated. The slot is held until the answer is complete. The response is started only when
+        the first piece of the answer is there, so Overloaded and any failure before it (retrieval,
+        Cypher generation, the answer model) are raised to the caller. A failure after that ends
+        the stream with a final "[error] ..." line (STREAM_ERROR_PREFIX).
+        """
+        async def answer():
+            active_id, conversation, lock = self.sessions.get(session_id)
+            async with lock:
+                pieces = llm_with_neo4j.astream_ask(question, conversation, self.llm, self.run_query,
+                                                    self.llm_stream, self._executor)
+                try:
+                    try:
+                        first = await pieces.__anext__()
+                    except StopAsyncIteration:
+                        first = ""
+                    response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8",
+                                                           "X-Session-Id": active_id})
+                    await response.prepare(request)
+                    # The status line is sent by now: end with an explicit error line so a cut-off answer is not taken as complete.
+                    try:
+                        try:
+                            await response.write(first.encode("utf-8"))
+                            async for piece in pieces:
+                                await response.write(piece.encode("utf-8"))
+                        except ConnectionError:
+                            raise
+                        except Exception as e:
+                            logging.exception("Streamed answer failed")
+                            await response.write(f"\n{STREAM_ERROR_PREFIX}{e}\n".encode("utf-8"))
+                        await response.write_eof()
+                    except ConnectionError:
+                        logging.info("Client disconnected from a streamed answer")
+                    return response
+                finally:
+                    await pieces.aclose()
+
+        return await self.admission.run(answer())
+
+    async def _start(self, app):
+        self.admission = AdmissionController(self.max_concurrency, self.max_queue)
+        # Blocking graph work of the Q&A path runs in this pool, passed to aask / astream_ask; the loop's
+        # default executor is left alone for the rest of the application.
+        self._executor = ThreadPoolExecutor(max_workers=self.graph_workers, thread_name_prefix="qa-graph")
+
+    async def _stop(self, app):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_ask(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be JSON"}, status=400)
+        question = str(body.get("question") or "").strip()
+        if not question:
+            return web.json_response({"error": "question is required"}, status=400)
+        try:
+            session_id, answer = await self.ask(question, body.get("session_id"))
+        except Overloaded:
+            return web.json_response({"error": "too many questions waiting, retry later"}, status=503,
+                                     headers={"Retry-After": "1"})
+        except Exception as e:
+            logging.exception("Question failed")
+            return web.json_response({"error": str(e)}, status=500)
+        return web.json_response({"session_id": session_id, "answer": answer})
+
+    async def handle_ask_stream(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be JSON"}, status=400)
+        question = str(body.get("question") or "").strip()
+        if not question:
+            return web.json_response({"error": "question is required"}, status=400)
+        try:
+            return await self.stream(question, request, body.get("session_id"))
+        except Overloaded:
+            return web.json_response({"error": "too many questions waiting, retry later"}, status=503,
+                                     headers={"Retry-After": "1"})
+        except Exception as e:
+            logging.exception("Question failed")
+            return web.json_response({"error": str(e)}, status=500)
+
+    async def handle_drop(self, request):
+        return web.json_response({"dropped": self.sessions.drop(request.match_info["session_id"])})
+
+    async def handle_metrics(self, request):
+        cache = qa_cache.get_qa_cache()
+        return web.json_response({"admission": self.admission.stats(), "sessions": len(self.sessions),
+                                  "qa_cache": cache.stats() if cache else None})
+
+    async def handle_health(self, request):
+        return web.json_response({"status": "ok"})
+
+    def make_app(self):
+        if web is None:
+            raise RuntimeError("The Q&A service needs `aiohttp` (pip install aiohttp).")
+        app = web.Application()
+        app.on_startup.append(self._start)
+        app.on_cleanup.append(self._stop)
+        app.add_routes([web.post("/ask", self.handle_ask),
+                        web.post("/ask/stream", self.handle_ask_stream),
+                        web.delete("/sessions/{session_id}", self.handle_drop),
+                        web.get("/metrics", self.handle_metrics),
+                        web.get("/health", self.handle_health)])
+        return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Multi-user HTTP service for the knowledge-graph Q&A system.")
+    parser.add_argument("--host", default=QA_HOST)
+    parser.add_argument("--port", type=int, default=QA_PORT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(QAService().make_app(), host=args.host, port=args.port)
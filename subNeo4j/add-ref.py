@@ -1,6 +1,9 @@
 import pandas as pd
 import os
 
+from csv_refine import normalize_text
+from node_dictionary import NodeDictionary, PAPER
+
 ref_path = r'F:\WORK\flow_battery_pdf\CSV\output\\ref_relationship_extracted.csv'
 node_path = r'F:\WORK\flow_battery_pdf\CSV\output\\node_extracted_new.csv'
 relation_path = r'F:\WORK\flow_battery_pdf\CSV\output\\relation_extracted.csv'
@@ -17,7 +20,21 @@ df_rel = pd.read_csv(relation_path)
 
 # 为 doi创建id
 df_doi = pd.read_csv(doi_path)
-df_doi['unique_id'] = df_doi['name'].astype('category').cat.codes.astype('int64') + 500000
+# doi ID 来自节点字典，与实体节点共用一个ID空间，重建时保持不变。
+# json_2_csv.assign_dictionary_ids 已按原始 doi 分配过ID：这里只取用（doi_id 列或 lookup），不再 assign，
+# 否则小写化后的名字会成为第二个论文条目
+if 'doi_id' in df_ref.columns:
+    doi_ids = df_ref['doi_id']
+else:
+    with NodeDictionary() as dictionary:
+        doi_ids = pd.Series(dictionary.lookup(df_ref['doi'], PAPER), index=df_ref.index)
+# df_doi 的名字经过 normalize_text，按规范化后的 doi 对应
+id_by_name = doi_ids.groupby(normalize_text(df_ref['doi'])).first()
+df_doi['unique_id'] = df_doi['name'].map(id_by_name)
+unknown = df_doi['unique_id'].isna() | (df_doi['unique_id'] < 0)
+if unknown.any():
+    print(f"{unknown.sum()} papers are not in the node dictionary and were skipped; run json_2_csv first")
+df_doi = df_doi[~unknown].astype({'unique_id': 'int64'})
 df_doi.drop('id:ID', axis=1, inplace=True)
 doi_nodes = df_doi[['name', 'unique_id']].rename(columns={'name': 'name', 'unique_id': 'id:ID'})
 
@@ -29,10 +46,9 @@ df_node = pd.concat([df_node, doi_nodes], ignore_index=True)
 print(df_node.columns)
 df_node.to_csv(node_path)
 
-# 创建映射
-name_to_id = doi_nodes.set_index('name')['id:ID'].to_dict()
 tmp_df_ref = df_ref.copy()
-tmp_df_ref['doi_ID'] = df_ref['doi'].map(name_to_id)
+tmp_df_ref['doi_ID'] = doi_ids
+tmp_df_ref = tmp_df_ref[tmp_df_ref['doi_ID'] >= 0]
 
 tmp_df = pd.DataFrame(columns=df_rel.columns.tolist())
 tmp_df.columns = df_rel.columns
@@ -1,31 +1,112 @@
 import pandas as pd
+import numpy as np
 import os
+import tempfile
 
+from node_dictionary import NodeDictionary, ENTITY, PAPER
+from numeric_values import add_numeric_columns, NUMERIC_COLUMNS
+
+
+def normalize_text(series):
+    """Vectorized x.lower().replace('_', ' ') for the string values of a column; other values are kept."""
+    try:
+        return series.str.lower().str.replace('_', ' ', regex=False).fillna(series)
+    except AttributeError:
+        # .str 只能用于字符串列（例如整列都是数字或空值）
+        return series
 
-def merge_and_deduplicate_nodes(input_file):
-    df = pd.read_csv(input_file)
 
+def node_frames(df):
+    """
+    The node rows of a triple DataFrame (output of json_2_csv.add_unique_id_to_csv): start nodes,
+    then end nodes, then doi nodes, with normalized name and label.
+
+    :return: DataFrame of name, id:ID, label
+    """
     # 创建一个新的DataFrame，包含'start_node'和'end_node'的所有节点及其对应的ID
     start_nodes = (df[['start_node', 'start_node_id', 'start_node_label']].
                    rename(columns={'start_node': 'name', 'start_node_id': 'id:ID', 'start_node_label': 'label'}))
     end_nodes = (df[['end_node', 'end_node_id', 'end_node_label']].
                  rename(columns={'end_node': 'name', 'end_node_id': 'id:ID', 'end_node_label': 'label'}))
-    doi_nodes = df[['doi', 'end_node_id']].rename(columns={'doi': 'name', 'end_node_id': 'id:ID'})
-    doi_nodes['id:ID'] = doi_nodes['id:ID'] + 5000000
+    if 'doi_id' in df.columns:
+        # 节点字典分配的ID与实体共用一个ID空间，不需要偏移
+        doi_nodes = df[['doi', 'doi_id']].rename(columns={'doi': 'name', 'doi_id': 'id:ID'})
+    else:
+        doi_nodes = df[['doi', 'end_node_id']].rename(columns={'doi': 'name', 'end_node_id': 'id:ID'})
+        doi_nodes['id:ID'] = doi_nodes['id:ID'] + 5000000
     doi_nodes['label'] = 'mention'
 
-    # 将两个DataFrame垂直合并（concatenate）
+    # 将三个DataFrame垂直合并（concatenate）
     combined_df = pd.concat([start_nodes, end_nodes, doi_nodes], ignore_index=True)
-    combined_df = combined_df.applymap(lambda x: x.lower().replace('_', ' ') if isinstance(x, str) else x)
+    combined_df['name'] = normalize_text(combined_df['name'])
+    combined_df['label'] = normalize_text(combined_df['label'])
+    return combined_df
+
+
+def with_numeric_columns(nodes):
+    """Adds typed value:float / unit / quantity columns parsed from entity names ("1.26 v" -> 1.26, V, voltage)."""
+    nodes = add_numeric_columns(nodes)
+    # 论文节点的名字是标题，不解析数值
+    nodes.loc[nodes['label'] == 'mention', NUMERIC_COLUMNS] = None
+    return nodes
+
+
+def merge_and_deduplicate_nodes(input_file):
+    df = pd.read_csv(input_file)
+    combined_df = node_frames(df)
 
     # 去重：根据'name'列去除重复的行，保留第一个出现的'node_id'
-    return combined_df.drop_duplicates(subset='name', keep='first')
+    return with_numeric_columns(combined_df.drop_duplicates(subset='name', keep='first'))
 
     # # 保存去重后的DataFrame到新的CSV文件
     # deduplicated_df.to_csv(output_file, index=False)
     # print(f"Merged and deduplicated nodes have been saved to {output_file}")
 
 
+def merge_and_deduplicate_nodes_chunked(input_file, output_file, chunksize=1000000, partitions=16, tmp_dir=None):
+    """
+    Out-of-core merge_and_deduplicate_nodes for inputs larger than memory, written to `output_file`.
+
+    The input is read `chunksize` rows at a time. Node rows are deduplicated within each chunk and
+    hash-partitioned by name into `partitions` temporary files, so that every name lands in a single
+    file; each file is then deduplicated on its own. The row kept for a name is the same as in the
+    in-memory version (first as start node, then as end node, then as doi, in input order); only
+    the order of the output rows differs. Peak memory is one chunk or one partition, whichever is larger.
+
+    :param tmp_dir: where the partition files go (default: the system temp directory)
+    :return: number of nodes written
+    """
+    # 名字列按字符串读入，每块的类型一致
+    text_columns = {c: str for c in ('start_node', 'end_node', 'doi', 'start_node_label', 'end_node_label')}
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        paths = [os.path.join(tmp, f"part-{p}.csv") for p in range(partitions)]
+        offset = 0
+        for chunk in pd.read_csv(input_file, chunksize=chunksize, dtype=text_columns):
+            nodes = node_frames(chunk)
+            # (part, seq) 记录该行在内存版 concat 结果中的先后顺序，用于保留"第一个出现"的行
+            nodes['part'] = np.repeat(np.arange(3, dtype=np.int8), len(chunk))
+            nodes['seq'] = np.tile(np.arange(offset, offset + len(chunk), dtype=np.int64), 3)
+            offset += len(chunk)
+            nodes = nodes.drop_duplicates(subset='name', keep='first')
+            partition = pd.util.hash_pandas_object(nodes['name'], index=False).to_numpy() % partitions
+            for p, group in nodes.groupby(partition):
+                group.to_csv(paths[p], mode='a', header=not os.path.exists(paths[p]), index=False)
+
+        written = 0
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            nodes = pd.read_csv(path, dtype={'name': str, 'label': str})
+            nodes = (nodes.sort_values(['part', 'seq'], kind='stable')
+                     .drop_duplicates(subset='name', keep='first')
+                     .drop(columns=['part', 'seq']))
+            nodes = with_numeric_columns(nodes)
+            nodes.to_csv(output_file, mode='w' if written == 0 else 'a', header=written == 0, index=False)
+            written += len(nodes)
+    print(f"{written} merged and deduplicated nodes have been saved to {output_file}")
+    return written
+
+
 def extract_columns_to_csv(input_file, output_folder, columns_to_extract, output_filename):
     """
     Extract columns from a csv file.
@@ -62,6 +143,50 @@ def extract_columns_to_csv(input_file, output_folder, columns_to_extract, output
     print(f"Extracted columns have been saved to {output_file}")
 
 
+def write_delta_files(input_file, output_folder, dictionary, batch=None):
+    """
+    Writes the node and relationship files of one incremental build: the dictionary entries added in
+    `batch` and the triples of the papers first seen in that batch, including their 'mention' edges.
+
+    :param input_file: output of json_2_csv.add_unique_id_to_csv run with the same dictionary (has doi_id)
+    :param batch: dictionary batch to export (default: the latest one)
+    :return: (node file path, relationship file path)
+    """
+    batch = dictionary.latest_batch() if batch is None else batch
+    os.makedirs(output_folder, exist_ok=True)
+    df = pd.read_csv(input_file)
+    new_papers = dictionary.entries(batch, PAPER)
+    rows = df[df['doi_id'].isin(new_papers['id'])]
+
+    # 新节点：实体标签取首次出现的标签，论文节点与 add-ref.py 一致标记为 refenence
+    new_entities = dictionary.entries(batch, ENTITY)
+    labels = pd.concat([rows[['start_node_id', 'start_node_label']].set_axis(['id', 'label'], axis=1),
+                        rows[['end_node_id', 'end_node_label']].set_axis(['id', 'label'], axis=1)])
+    labels = labels.drop_duplicates(subset='id').set_index('id')['label']
+    # 名字和标签与全量构建（node_frames）做同样的规范化，论文标题在字典中保留原大小写
+    entity_nodes = pd.DataFrame({'name': normalize_text(new_entities['name']), 'id:ID': new_entities['id'],
+                                 'label': normalize_text(new_entities['id'].map(labels))})
+    paper_nodes = pd.DataFrame({'name': normalize_text(new_papers['name']), 'id:ID': new_papers['id'],
+                                'label': 'mention', ':LABEL': 'refenence'})
+    node_file = os.path.join(output_folder, f"node_delta_{batch}.csv")
+    with_numeric_columns(pd.concat([entity_nodes, paper_nodes], ignore_index=True)).to_csv(node_file, index=False)
+
+    # 旧论文中已有的关系不再重复导出
+    columns = ['start_node_id', 'end_node_id', 'relationship']
+    relations = rows[columns].drop_duplicates()
+    known = df.loc[~df['doi_id'].isin(new_papers['id']), columns].drop_duplicates()
+    relations = relations.merge(known, how='left', indicator=True)
+    relations = relations[relations['_merge'] == 'left_only'][columns].set_axis([':START_ID', ':END_ID', 'relationship'], axis=1)
+    mentions = pd.concat([rows[['start_node_id', 'doi_id']].set_axis([':START_ID', ':END_ID'], axis=1),
+                          rows[['end_node_id', 'doi_id']].set_axis([':START_ID', ':END_ID'], axis=1)])
+    mentions['relationship'] = 'mention'
+    relation_file = os.path.join(output_folder, f"relation_delta_{batch}.csv")
+    pd.concat([relations, mentions], ignore_index=True).drop_duplicates().to_csv(relation_file, index=False)
+    print(f"Delta of batch {batch}: {len(entity_nodes)} entities, {len(paper_nodes)} papers, "
+          f"{len(relations)} triples saved to {node_file} and {relation_file}")
+    return node_file, relation_file
+
+
 # 指定输入文件路径、输出文件夹路径和要提取的列
 input_csv = r'F:\WORK\flow_battery_pdf\CSV\output\output_csv.csv'  # 替换为你的CSV文件路径
 output_directory = r'F:\WORK\flow_battery_pdf\CSV\output\output_csv_new'  # 替换为你想要保存新CSV文件的文件夹路径
@@ -75,6 +200,9 @@ if __name__ == "__main__":
     # extract_columns_to_csv(input_csv, output_directory, start_node_columns_to_extract, 'start_node')
     # extract_columns_to_csv(input_csv, output_directory, end_node_columns_to_extract, 'end_node')
     extract_columns_to_csv(input_csv, output_directory, relation_columns_to_extract, 'ref_relationship')
+    # 增量构建：只导出本次新加入节点字典的节点及新论文的关系
+    with NodeDictionary() as dictionary:
+        write_delta_files(input_csv, output_directory, dictionary)
     # 构建输出文件路径
     base_filename = os.path.basename(input_csv)
     name, ext = os.path.splitext(base_filename)
@@ -0,0 +1,270 @@
+import os
+import re
+from collections import defaultdict
+
+import pandas as pd
+
+# --- Canonicalization Settings ---
+CANONICAL_ENABLED = os.getenv("ENTITY_CANONICALIZE", "1").lower() not in ("0", "false", "no")
+# Names compared with their neighbours in sorted order; larger windows find more typos but cost more.
+WINDOW = int(os.getenv("CANONICAL_WINDOW", "4"))
+# Shorter words are only merged when identical: "iv" vs "v" or "pe" vs "pp" are not typos.
+MIN_TYPO_WORD_LENGTH = 5
+# A one-edit pair is only merged as a typo with evidence: the rarer spelling is at least this many times
+# less frequent, or both names share a neighbour in the graph.
+TYPO_FREQUENCY_RATIO = float(os.getenv("CANONICAL_TYPO_FREQUENCY_RATIO", "5"))
+# Neighbours kept per name (bottom-k sketch of their hashes) to test for shared neighbours.
+NEIGHBOUR_SKETCH_SIZE = 8
+# Name endings that tell compounds apart: iodine/iodide, sulfite/sulfate, ethane/ethene, quinone/quinine.
+CHEMICAL_SUFFIXES = ("ide", "ine", "ate", "ite", "ous", "ic", "ane", "ene", "yne", "one", "ol", "al")
+# Written by json_2_csv; the Q&A entity linker reads it back to resolve abbreviations and variants.
+CANONICAL_MAP_PATH = os.getenv("CANONICAL_MAP_PATH", r'F:\WORK\flow_battery_pdf\CSV\output\canonical_map.csv')
+
+# How the extraction prompt asks for abbreviations: {"start_node":"RFB","relationship":"is",
+# "end_node":"Redox Flow Battery","start_node_label":"abbreviation","end_node_label":"full name"}
+ABBREVIATION_LABELS = {"abbreviation", "acronym"}
+FULL_NAME_LABELS = {"full name", "fullname", "definition"}
+ABBREVIATION_RELATIONSHIPS = {"is", "stands for", "means", "refers to", "abbreviation of", "is abbreviation of",
+                              "is short for", "full name", "has full name", "is the abbreviation of"}
+
+_SEPARATORS = re.compile(r"[\s\-/,;:()\[\]{}'\"]+")
+
+
+def name_key(names):
+    """
+    Vectorized matching key of node names: separators collapsed to one space and simple plurals
+    reduced ("redox-flow batteries" -> "redox flow battery"). Names are already lowercase
+    (see json_2_csv / triple_store normalization).
+    """
+    keys = names.astype(str).str.lower().str.replace(_SEPARATORS, " ", regex=True).str.strip()
+    keys = keys.str.replace(r"(\w{2,})ies\b", r"\1y", regex=True)
+    return keys.str.replace(r"(\w{3,}[^su\s])s\b", r"\1", regex=True)
+
+
+def looks_like_abbreviation(short, long):
+    """
+    True if `short` can be read as an abbreviation of `long`: its first letter starts a word of
+    `long` and its remaining letters appear in order (Schwartz-Hearst style), e.g. vrfb / vanadium
+    redox flow battery. Digits and case are ignored.
+    """
+    letters = [c for c in short.lower() if c.isalpha()]
+    words = [w for w in re.split(r"[^a-z0-9]+", long.lower()) if w]
+    if len(letters) < 2 or len(words) < 2 or len(letters) >= len(long.replace(" ", "")):
+        return False
+    if not any(w.startswith(letters[0]) for w in words):
+        return False
+    text = " ".join(words)
+    position = text.find(letters[0]) if text.startswith(letters[0]) else text.find(" " + letters[0]) + 1
+    for letter in letters[1:]:
+        position = text.find(letter, position + 1)
+        if position < 0:
+            return False
+    return True
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+            return True
+        return False
+
+
+def one_edit_apart(a, b):
+    """True if a and b differ by exactly one inserted, deleted or substituted character."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+def _chemical_suffix(word):
+    for suffix in CHEMICAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+            return suffix
+    return None
+
+
+def chemically_distinct(word, other):
+    """
+    True if two words differ only in a chemical suffix and so name different compounds rather than
+    one misspelled ("iodine" / "iodide", "sulfite" / "sulfate", "chlorite" / "chloride").
+    """
+    suffix, other_suffix = _chemical_suffix(word), _chemical_suffix(other)
+    return (suffix is not None and other_suffix is not None and suffix != other_suffix
+            and word[:-len(suffix)] == other[:-len(other_suffix)])
+
+
+def _spelling_variants(key, other):
+    """
+    Keys that differ only by a one-character typo in one word of at least MIN_TYPO_WORD_LENGTH
+    letters ("antraquinone" / "anthraquinone", "columbic efficiency" / "coulombic efficiency").
+    Numbers must match exactly, and an edit in a chemical suffix is not a typo (chemically_distinct).
+    """
+    if abs(len(key) - len(other)) > 1 or key.count(" ") != other.count(" "):
+        return False
+    words, other_words = key.split(" "), other.split(" ")
+    differing = [(w, o) for w, o in zip(words, other_words) if w != o]
+    if len(differing) != 1:
+        return False
+    word, other_word = differing[0]
+    return (min(len(word), len(other_word)) >= MIN_TYPO_WORD_LENGTH and word.isalpha() and other_word.isalpha()
+            and one_edit_apart(word, other_word) and not chemically_distinct(word, other_word))
+
+
+def _neighbour_sketch(chunk, sketch=None):
+    """
+    Adds the neighbours of every name in a triple chunk to a bottom-k sketch: for each name the
+    NEIGHBOUR_SKETCH_SIZE smallest hashes of the names it is linked to. Two names with a common
+    neighbour among their sketches share neighbours for sure; memory stays bounded per name.
+
+    :return: DataFrame of name, hash
+    """
+    pairs = pd.concat([chunk[['start_node', 'end_node']].set_axis(['name', 'neighbour'], axis=1),
+                       chunk[['end_node', 'start_node']].set_axis(['name', 'neighbour'], axis=1)], ignore_index=True)
+    pairs = pd.DataFrame({'name': pairs['name'].astype(str),
+                          'hash': pd.util.hash_pandas_object(pairs['neighbour'].astype(str), index=False).to_numpy()})
+    if sketch is not None:
+        pairs = pd.concat([sketch, pairs], ignore_index=True)
+    pairs = pairs.drop_duplicates().sort_values(['name', 'hash'], kind='stable')
+    return pairs.groupby('name', sort=False).head(NEIGHBOUR_SKETCH_SIZE).reset_index(drop=True)
+
+
+def _typo_evidence(count, other_count, neighbours, other_neighbours):
+    """A one-edit pair is a typo if one spelling is much rarer, or both names share a neighbour."""
+    rare, common = sorted((count, other_count))
+    return common >= rare * TYPO_FREQUENCY_RATIO or not neighbours.isdisjoint(other_neighbours)
+
+
+def _abbreviation_rows(df):
+    relationship = df['relationship'].astype(str).str.lower()
+    forward = (df['start_node_label'].astype(str).str.lower().isin(ABBREVIATION_LABELS)
+               | df['end_node_label'].astype(str).str.lower().isin(FULL_NAME_LABELS))
+    backward = (df['end_node_label'].astype(str).str.lower().isin(ABBREVIATION_LABELS)
+                | df['start_node_label'].astype(str).str.lower().isin(FULL_NAME_LABELS))
+    candidates = relationship.isin(ABBREVIATION_RELATIONSHIPS)
+    pairs = pd.concat([df.loc[forward & candidates, ['start_node', 'end_node']].set_axis(['short', 'long'], axis=1),
+                       df.loc[backward & candidates, ['end_node', 'start_node']].set_axis(['short', 'long'], axis=1)])
+    return pairs.dropna().drop_duplicates()
+
+
+def build_canonical_map(triples):
+    """
+    Groups variant node names and picks one canonical name per group, in near-linear time:
+
+    1. abbreviation edges produced by the extraction prompt ("rfb" is "redox flow battery") link an
+       abbreviation to its full name, when every edge for that abbreviation agrees on one full name;
+    2. names are blocked on a normalized key in which known abbreviations are expanded, so
+       "vanadium rfb", "vanadium redox-flow batteries" and "vanadium redox flow battery" share a block;
+    3. keys are sorted (forwards and reversed) and each is compared with its WINDOW neighbours only;
+       neighbours one typo apart (see _spelling_variants) are merged when there is evidence for a
+       typo: the rarer spelling is TYPO_FREQUENCY_RATIO times less frequent, or both share a
+       neighbour in the graph. Edits in a chemical suffix ("iodine" / "iodide") are never merged.
+
+    The canonical name of a group is a full (non-abbreviation) name of its most frequent spelling.
+
+    :param triples: DataFrame or iterable of DataFrames with the json_2_csv columns
+    :return: DataFrame of name, canonical, reason for every name that is renamed
+    """
+    if isinstance(triples, pd.DataFrame):
+        triples = [triples]
+    counts = pd.Series(dtype='int64')
+    pairs = []
+    sketch = None
+    for chunk in triples:
+        chunk = chunk.dropna(subset=['start_node', 'end_node'])
+        names = pd.concat([chunk['start_node'], chunk['end_node']], ignore_index=True).astype(str)
+        counts = counts.add(names.value_counts(), fill_value=0)
+        pairs.append(_abbreviation_rows(chunk))
+        sketch = _neighbour_sketch(chunk, sketch)
+    if counts.empty:
+        return pd.DataFrame(columns=['name', 'canonical', 'reason'])
+    names = pd.Series(counts.index.astype(str))
+    keys = dict(zip(names, name_key(names)))
+    counts = dict(zip(names, counts.to_numpy()))
+
+    # 1. 缩写 -> 全称，同一缩写对应多个不同全称时视为有歧义，不合并
+    pairs = pd.concat(pairs).astype(str)
+    expansions = defaultdict(set)
+    for short, long in zip(pairs['short'], pairs['long']):
+        expansions[keys.get(short, short)].add(keys.get(long, long))
+    expansions = {short: next(iter(longs)) for short, longs in expansions.items()
+                  if len(longs) == 1 and looks_like_abbreviation(short, next(iter(longs)))}
+
+    # 2. 展开缩写后的键相同则为同一实体
+    def expand(key):
+        return expansions.get(key) or " ".join(expansions.get(token, token) for token in key.split(" "))
+
+    expanded = {name: expand(key) for name, key in keys.items()}
+    groups = _UnionFind()
+    reasons = {}
+    for name, key in expanded.items():
+        if groups.union(key, name):
+            reasons[name] = "abbreviation" if key != keys[name] else "variant"
+
+    key_counts = defaultdict(int)
+    for name, key in expanded.items():
+        key_counts[key] += counts[name]
+    key_neighbours = defaultdict(set)
+    for name, neighbour in zip(sketch['name'], sketch['hash']):
+        if name in expanded:
+            key_neighbours[expanded[name]].add(neighbour)
+
+    # 3. 排序邻域：只比较排序后相邻的 WINDOW 个键（正序和逆序各一次）
+    # 仅一处拼写差异还不够：需要频次差距悬殊或有共同邻居才视为笔误
+    unique_keys = sorted(set(expanded.values()))
+    for ordering in (unique_keys, sorted(unique_keys, key=lambda k: k[::-1])):
+        for i, key in enumerate(ordering):
+            for other in ordering[max(0, i - WINDOW):i]:
+                if (_spelling_variants(key, other)
+                        and _typo_evidence(key_counts[key], key_counts[other], key_neighbours[key],
+                                           key_neighbours[other])
+                        and groups.union(other, key)):
+                    reasons.setdefault(key, "typo")
+
+    clusters = defaultdict(list)
+    for name in expanded:
+        clusters[groups.find(name)].append(name)
+    abbreviations = {name for name in expanded if keys[name] in expansions}
+    rows = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        # 全称优先，其次是出现次数最多的写法，同一写法中优先已是规范形式的名字
+        canonical = min(members, key=lambda n: (n in abbreviations, -key_counts[expanded[n]], n != expanded[n],
+                                                -counts[n], len(n), n))
+        for name in members:
+            if name != canonical:
+                rows.append((name, canonical, reasons.get(name) or reasons.get(expanded[name], "typo")))
+    return pd.DataFrame(rows, columns=['name', 'canonical', 'reason'])
+
+
+def canonicalize_triples(df, canonical_map):
+    """
+    Renames start/end nodes to their canonical names. Edges that only said a name equals its own
+    variant ("rfb is redox flow battery") become self-loops and are dropped; the alias stays in the map.
+    """
+    if canonical_map is None or canonical_map.empty:
+        return df
+    mapping = dict(zip(canonical_map['name'], canonical_map['canonical']))
+    start = df['start_node'].map(mapping).fillna(df['start_node'])
+    end = df['end_node'].map(mapping).fillna(df['end_node'])
+    collapsed = (start == end) & (df['start_node'] != df['end_node'])
+    df = df.assign(start_node=start, end_node=end)
+    return df[~collapsed]
@@ -1,12 +1,20 @@
 import csv
 import json
+import sys
 
 from tqdm import tqdm
 import os
 import logging
+import numpy as np
 import pandas as pd
+
+from node_dictionary import NodeDictionary, PAPER
+from entity_canonical import build_canonical_map, canonicalize_triples, CANONICAL_ENABLED, CANONICAL_MAP_PATH
 pd.set_option('display.max_columns',None)
 
+# triple_store lives at the repository root, next to the extraction scripts.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 
 def write_json_to_csv(csv_file_path):
     with open(csv_file_path, mode='a', newline='', encoding='utf-8') as f:
@@ -46,33 +54,125 @@ def write_json_to_csv(csv_file_path):
                         logging.error(f"json_path:{json_path}\t{a}")
 
 
-def add_unique_id_to_csv(input_file, output_file):
-    # 读取原始CSV文件
-    df = pd.read_csv(input_file, encoding='UTF-8')
-    df.sort_values(by='doi', inplace=True, ascending=False)
+def load_triples(input_path):
+    """
+    Reads triples from the CSV written by write_json_to_csv, or from a triple store directory
+    written during extraction (already normalized, no .json/.csv intermediates needed).
+    """
+    if os.path.isdir(input_path):
+        import triple_store
+        return triple_store.read_triples(input_path)
+    return pd.read_csv(input_path, encoding='UTF-8')
+
+
+def iter_triples(input_path, chunksize):
+    """Same input as load_triples, read `chunksize` rows (CSV) or one store file at a time."""
+    if os.path.isdir(input_path):
+        import triple_store
+        yield from triple_store.iter_triples(input_path)
+    else:
+        # dtype=str: a chunk whose names all look numeric must not be parsed differently from the others
+        yield from pd.read_csv(input_path, encoding='UTF-8', chunksize=chunksize, dtype=str)
+
+
+def assign_node_ids(df):
+    """
+    Adds start_node_id / end_node_id columns, numbering nodes from 1 in first-seen order:
+    all start nodes first, then end nodes that never appear as a start node.
+    One factorize over both columns instead of a Python lookup per row.
+    """
+    codes, _ = pd.factorize(pd.concat([df['start_node'], df['end_node']], ignore_index=True))
+    codes += 1
+    df['start_node_id'] = codes[:len(df)]
+    df['end_node_id'] = codes[len(df):]
+    return df
+
+
+def collect_node_order(chunks):
+    """
+    First pass of the chunked version: numbers the node names of all chunks the way assign_node_ids
+    would if the chunks were one DataFrame. Only distinct names are kept in memory.
+
+    :return: dict of node name -> ID
+    """
+    start_nodes, end_nodes = {}, {}
+    for chunk in chunks:
+        chunk = chunk.dropna(how='any')
+        for column, seen in (('start_node', start_nodes), ('end_node', end_nodes)):
+            # 每块先去重，Python 循环只作用于不同的名字，不是每一行
+            seen.update(dict.fromkeys(pd.unique(chunk[column])))
+    node_ids = dict(zip(start_nodes, range(1, len(start_nodes) + 1)))
+    for node in end_nodes:
+        node_ids.setdefault(node, len(node_ids) + 1)
+    return node_ids
+
+
+def map_node_ids(df, node_ids):
+    """Second pass of the chunked version: looks up the IDs of a chunk in the dict from collect_node_order."""
+    codes, uniques = pd.factorize(pd.concat([df['start_node'], df['end_node']], ignore_index=True))
+    ids = np.fromiter((node_ids[node] for node in uniques), dtype=np.int64, count=len(uniques))[codes]
+    df['start_node_id'] = ids[:len(df)]
+    df['end_node_id'] = ids[len(df):]
+    return df
+
+
+def assign_dictionary_ids(df, dictionary):
+    """
+    Adds start_node_id / end_node_id / doi_id from a persistent NodeDictionary: names already in it
+    keep their IDs, new names are appended in first-seen order (start nodes, then end nodes, then papers).
+    """
+    ids = dictionary.assign(pd.concat([df['start_node'], df['end_node']], ignore_index=True))
+    df['start_node_id'] = ids[:len(df)]
+    df['end_node_id'] = ids[len(df):]
+    df['doi_id'] = dictionary.assign(df['doi'], PAPER)
+    return df
+
+
+def add_unique_id_to_csv(input_file, output_file, chunksize=None, dictionary=None, canonical_map=None):
+    """
+    Numbers the nodes of all triples and writes the triples with start_node_id / end_node_id.
+
+    :param input_file: CSV from write_json_to_csv or a triple store directory
+    :param chunksize: if given, runs out-of-core in two passes over the input, `chunksize` CSV rows at a
+        time; memory is bounded by the number of distinct nodes instead of the number of triples.
+        Rows keep the input order instead of being sorted by doi, so IDs equal the in-memory
+        result when the input is already sorted by doi (descending).
+    :param dictionary: NodeDictionary to take IDs from, so they stay stable across rebuilds; also adds a
+        doi_id column in the same ID space. Chunked runs then need a single pass.
+    :param canonical_map: output of entity_canonical.build_canonical_map; variant names are renamed to
+        their canonical name before numbering, so they become one node
+    """
+    if chunksize:
+        def chunks():
+            for chunk in iter_triples(input_file, chunksize):
+                yield canonicalize_triples(chunk.dropna(how='any'), canonical_map).copy()
+
+        node_ids = None if dictionary is not None else collect_node_order(chunks())
+        rows = 0
+        for i, chunk in enumerate(chunks()):
+            if dictionary is not None:
+                assign_dictionary_ids(chunk, dictionary)
+            else:
+                map_node_ids(chunk, node_ids)
+            chunk.to_csv(output_file, mode='w' if i == 0 else 'a', header=i == 0, index=False, encoding='UTF-8')
+            rows += len(chunk)
+        node_count = len(dictionary) if dictionary is not None else len(node_ids)
+        print(f"Node IDs for {node_count} nodes in {rows} rows have been added and saved to {output_file}")
+        return
+
+    # 读取原始CSV文件或三元组存储目录
+    df = load_triples(input_file)
+    # 稳定排序，相同doi的行保持原顺序，保证ID可复现
+    df.sort_values(by='doi', inplace=True, ascending=False, kind='stable')
     print(f"df_head{df.head()}")
-    cleaned_df = df.dropna(how='any').copy()
-    # print(f"{cleaned_df.head()}cleaned_df.head()")
-    # print(f"cleaned_df[cleaned_df['doi'] == '996942':{cleaned_df[cleaned_df['doi'].str.contains('')]}")
-    # 创建一个空的映射字典，用于存储节点到ID的映射
-
-    node_to_id = {}
-    next_id = 1  # 从1开始编号
-    # 定义一个函数，用于根据节点获取或生成ID
-    def get_or_assign_id(node):
-        nonlocal next_id
-        if node not in node_to_id:
-            node_to_id[node] = next_id
-            next_id += 1
-        return node_to_id[node]
-
-    # 应用get_or_assign_id函数到'start_node'和'end_node'列，生成新的ID列
-    cleaned_df.loc[:, 'start_node_id'] = cleaned_df['start_node'].apply(get_or_assign_id)
-    cleaned_df.loc[:, 'end_node_id'] = cleaned_df['end_node'].apply(get_or_assign_id)
-
-    # 确保标题行存在并且列名正确
-    # 如果你想自定义列名，可以在这里进行修改
-    # result_df.columns = ['start_node', 'relationship', 'end_node', 'doi', 'start_node_id', 'end_node_id']
+    cleaned_df = canonicalize_triples(df.dropna(how='any'), canonical_map).copy()
+
+    # 按首次出现的顺序为'start_node'和'end_node'列生成ID列；有节点字典时沿用已有ID
+    if dictionary is not None:
+        assign_dictionary_ids(cleaned_df, dictionary)
+    else:
+        assign_node_ids(cleaned_df)
+
     # 保存带有新ID的DataFrame到新的CSV文件，确保包含标题行
     cleaned_df.to_csv(output_file, index=False, encoding='UTF-8')
     print(f"Node IDs have been added and saved to {output_file}")
@@ -86,13 +186,42 @@ if __name__ == "__main__":
     # 设置日志配置
     logging.basicConfig(filename='.\\log\\log_toneo4j.log', level=logging.INFO, format='%(asctime)s %(filename)s [line:%(lineno)d]  - %(levelname)s - %(message)s')
 
+    # 抽取阶段写入的三元组存储（pdf_extract_text.py, TRIPLE_STORE_DIR），存在时跳过 json -> csv 步骤
+    triple_store_dir = os.getenv("TRIPLE_STORE_DIR", r'F:\WORK\flow_battery_pdf\triple_store')
+    # 抽取输出目录（每篇论文一个子目录），默认与存储目录同级
+    extract_output_root = os.getenv("EXTRACT_OUTPUT_ROOT", os.path.dirname(os.path.abspath(triple_store_dir)))
     csv_file_path = r'F:\WORK\flow_battery_pdf\CSV\output\output.csv'
-    write_json_to_csv(csv_file_path)
-
-    # 指定输入和输出文件路径以及要用于生成ID的列
-    input_csv = csv_file_path  # 替换为你的CSV文件路径
+    if os.path.isdir(triple_store_dir):
+        import triple_store
+        # 存储必须与当前清单一致：先补齐清单中已完成却不在存储中的块（旧的抽取结果、未写入存储的中断运行），
+        # 再淘汰清单中已不存在的块（文档变短后被 truncate 的块）
+        if os.path.isdir(extract_output_root):
+            paper_dirs = triple_store.output_dirs(extract_output_root)
+            added = triple_store.ingest_outputs(paper_dirs, triple_store_dir, only_missing=True)
+            if added:
+                print(f"{added} triples of finished chunks missing from the store were added")
+            retired = triple_store.retire_stale_chunks(paper_dirs, triple_store_dir)
+            if retired:
+                print(f"{retired} chunks no longer in their document were retired from the store")
+        input_csv = triple_store_dir
+    else:
+        write_json_to_csv(csv_file_path)
+        # 指定输入和输出文件路径以及要用于生成ID的列
+        input_csv = csv_file_path  # 替换为你的CSV文件路径
     output_csv = r'F:\WORK\flow_battery_pdf\CSV\output\output_csv.csv'  # 替换为你想要保存的新CSV文件路径
 
-    # 调用函数进行处理
-    add_unique_id_to_csv(input_csv, output_csv)
+    chunksize = int(os.getenv("NODE_ID_CHUNKSIZE", "0")) or None
+
+    # 实体规范化（entity_canonical.py）：缩写、复数、连字符和拼写错误的变体合并为同一节点
+    canonical_map = None
+    if CANONICAL_ENABLED:
+        canonical_map = build_canonical_map(iter_triples(input_csv, chunksize or 1000000))
+        canonical_map.to_csv(CANONICAL_MAP_PATH, index=False, encoding='UTF-8')
+        print(f"{len(canonical_map)} node names are renamed to a canonical name")
+
+    # 调用函数进行处理；设置 NODE_ID_CHUNKSIZE 时分块处理，内存只随节点数增长
+    # 节点字典（node_dictionary.py）保证重建图时已有节点的ID不变，新论文只为新名字分配ID
+    with NodeDictionary() as dictionary:
+        add_unique_id_to_csv(input_csv, output_csv, chunksize=chunksize, dictionary=dictionary,
+                             canonical_map=canonical_map)
 
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# --- Node Dictionary Settings ---
+# One dictionary per graph. Keep it next to the CSV outputs; deleting it renumbers every node on the next build.
+DICTIONARY_PATH = os.getenv("NODE_DICTIONARY_PATH", r'F:\WORK\flow_battery_pdf\CSV\output\node_dictionary.sqlite')
+
+# Kinds of names in the single ID space. The same string can be both an entity and a paper.
+ENTITY = "entity"
+PAPER = "paper"
+
+
+class NodeDictionary:
+    """
+    Persistent name -> ID dictionary shared by json_2_csv, csv_refine and add-ref.
+
+    IDs come from one sequence for all kinds, starting at 1 and never reused, so entity and
+    paper (doi) IDs cannot collide. The dictionary is append-only: a name keeps its ID across
+    graph rebuilds and only names seen for the first time get new IDs. Every session that adds
+    names records them under a new batch number, which is what delta node/relationship files
+    are built from (see `entries`).
+    """
+
+    def __init__(self, path=DICTIONARY_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS nodes (
+                                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                  kind TEXT NOT NULL,
+                                  name TEXT NOT NULL,
+                                  batch INTEGER NOT NULL,
+                                  UNIQUE (kind, name))""")
+        self._conn.commit()
+        self.batch = self.latest_batch() + 1
+
+    def latest_batch(self):
+        """Batch number of the most recent session that added names (0 if the dictionary is empty)."""
+        return self._conn.execute("SELECT COALESCE(MAX(batch), 0) FROM nodes").fetchone()[0]
+
+    def _load_names(self, names):
+        # 去重后写入临时表，seq 记录首次出现的顺序
+        codes, uniques = pd.factorize(names if isinstance(names, pd.Series) else pd.Series(names))
+        self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup (seq INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+        self._conn.execute("DELETE FROM lookup")
+        self._conn.executemany("INSERT INTO lookup (seq, name) VALUES (?, ?)",
+                               zip(range(len(uniques)), map(str, uniques)))
+        return codes, len(uniques)
+
+    def _ids_for(self, codes, unique_count, kind):
+        unique_ids = np.full(unique_count, -1, dtype=np.int64)
+        rows = self._conn.execute("SELECT lookup.seq, nodes.id FROM lookup JOIN nodes "
+                                  "ON nodes.kind = ? AND nodes.name = lookup.name", (kind,)).fetchall()
+        if rows:
+            seq, ids = np.array(rows, dtype=np.int64).T
+            unique_ids[seq] = ids
+        # NaN names (code -1) map to -1, like names not in the dictionary
+        return np.where(codes >= 0, unique_ids[codes], -1)
+
+    def assign(self, names, kind=ENTITY):
+        """
+        IDs for `names`, adding names not yet in the dictionary in first-seen order.
+
+        :param names: sequence or Series of names; NaN gets -1
+        :return: numpy int64 array aligned with `names`
+        """
+        codes, unique_count = self._load_names(names)
+        # NOT EXISTS instead of INSERT OR IGNORE: ignored rows would still use up AUTOINCREMENT IDs
+        self._conn.execute("INSERT INTO nodes (kind, name, batch) SELECT ?, name, ? FROM lookup "
+                           "WHERE NOT EXISTS (SELECT 1 FROM nodes WHERE nodes.kind = ? AND nodes.name = lookup.name) "
+                           "ORDER BY seq", (kind, self.batch, kind))
+        ids = self._ids_for(codes, unique_count, kind)
+        self._conn.commit()
+        return ids
+
+    def lookup(self, names, kind=ENTITY):
+        """IDs for `names` without adding anything; unknown names get -1."""
+        codes, unique_count = self._load_names(names)
+        return self._ids_for(codes, unique_count, kind)
+
+    def entries(self, batch=None, kind=None):
+        """
+        DataFrame of id, kind, name, batch.
+
+        :param batch: only names added in this batch (the delta of one incremental build); None for all
+        :param kind: only names of this kind
+        """
+        query, params = "SELECT id, kind, name, batch FROM nodes WHERE 1 = 1", []
+        if batch is not None:
+            query += " AND batch = ?"
+            params.append(batch)
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        return pd.read_sql_query(query + " ORDER BY id", self._conn, params=params)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
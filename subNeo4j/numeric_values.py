@@ -0,0 +1,124 @@
+import re
+
+import pandas as pd
+
+# --- Units ---
+# (group name, regex of the unit as written after the number, canonical unit, quantity, factor, offset)
+# value in the canonical unit = number * factor + offset. Order matters: the first alternative that
+# matches wins, so longer units come before their prefixes ("ma cm-2" before "m", "mv" before "m").
+# Units are matched case-insensitively; where case tells units apart (mM / mm, M / m, K / k) the
+# written case decides, see _resolve_ambiguous.
+
+
+def _per(unit, power=""):
+    """Regex for 'per unit^power' written as '/cm2', ' cm-2', '·cm^-2' and so on."""
+    return rf"[\s·*]*(?:/\s*{unit}{power}|{unit}\s*\^?\s*-\s*{power or '1'})"
+
+
+UNITS = [
+    ("ma_cm2", r"ma" + _per("cm", "2"), "mA cm-2", "current density", 1.0, 0.0),
+    ("a_cm2", r"a" + _per("cm", "2"), "mA cm-2", "current density", 1000.0, 0.0),
+    ("a_m2", r"a" + _per("m", "2"), "mA cm-2", "current density", 0.1, 0.0),
+    ("mw_cm2", r"mw" + _per("cm", "2"), "mW cm-2", "power density", 1.0, 0.0),
+    ("w_cm2", r"w" + _per("cm", "2"), "mW cm-2", "power density", 1000.0, 0.0),
+    ("w_m2", r"w" + _per("m", "2"), "mW cm-2", "power density", 0.1, 0.0),
+    ("wh_l", r"wh" + _per("l"), "Wh L-1", "energy density", 1.0, 0.0),
+    ("wh_kg", r"wh" + _per("kg"), "Wh kg-1", "specific energy", 1.0, 0.0),
+    ("mah_g", r"mah" + _per("g"), "mAh g-1", "specific capacity", 1.0, 0.0),
+    ("ah_l", r"ah" + _per("l"), "Ah L-1", "capacity density", 1.0, 0.0),
+    ("mah", r"mah", "Ah", "capacity", 0.001, 0.0),
+    ("ah", r"ah", "Ah", "capacity", 1.0, 0.0),
+    ("ms_cm", r"ms" + _per("cm"), "mS cm-1", "conductivity", 1.0, 0.0),
+    ("s_cm", r"s" + _per("cm"), "mS cm-1", "conductivity", 1000.0, 0.0),
+    ("ohm_cm2", r"(?:ω|ohm)\s*cm\s*2", "ohm cm2", "area specific resistance", 1.0, 0.0),
+    ("mv", r"mv", "V", "voltage", 0.001, 0.0),
+    ("v", r"v", "V", "voltage", 1.0, 0.0),
+    ("mol_l", r"mol" + _per("l"), "mol L-1", "concentration", 1.0, 0.0),
+    ("mm", r"mm", "mm", "length", 1.0, 0.0),  # or mM, see _resolve_ambiguous
+    ("cm", r"cm", "mm", "length", 10.0, 0.0),
+    ("um", r"[µμu]m", "mm", "length", 0.001, 0.0),
+    ("molar", r"m", "mol L-1", "concentration", 1.0, 0.0),  # M, or a bare m before a solute
+    ("celsius", r"°\s*c|℃|deg\s*c", "°C", "temperature", 1.0, 0.0),
+    ("kelvin", r"k", "°C", "temperature", 1.0, -273.15),  # K, or a bare k ending the value
+    ("percent", r"%", "%", "percentage", 1.0, 0.0),
+    ("hour", r"h|hr|hrs|hours?", "h", "time", 1.0, 0.0),
+    ("minute", r"min|minutes?", "h", "time", 1.0 / 60, 0.0),
+    ("cycle", r"cycles?", "cycle", "cycle number", 1.0, 0.0),
+]
+
+# First number in the name followed by a known unit; the unit must not run on into a word
+# ("1.5 m vanadium" is a concentration, "1.5 mg" is not).
+_QUANTITY = re.compile(
+    r"(?<![\w.])(?P<number>[-+]?\d+(?:\.\d+)?(?:e[-+]?\d+)?)\s*(?:"
+    + "|".join(f"(?P<{name}>{regex})" for name, regex, *_ in UNITS)
+    + r")(?![a-z0-9])(?:\s+(?P<next>[^\s,;]+))?", re.IGNORECASE)
+
+# What a concentration is of: formulas (h2so4, voso4, k4fe(cn)6), salts and acids, elements (-ium).
+_SOLUTE = re.compile(r"(?:[a-z]{1,2}\d|[a-z]{0,2}cl\b|\(|naoh$|koh$|acid|salt|solution|electrolyte"
+                     r"|\w*(?:ate|ide|ite|ium|yl)$|v\d?\+?$|h\+$)", re.IGNORECASE)
+
+# Written forms folded before matching: unicode minus signs, superscripts, the ohm sign.
+_FOLD = str.maketrans({"−": "-", "–": "-", "⁻": "-", "²": "2", "³": "3", "¹": "1", "Ω": "ω"})
+
+# Import columns, typed for neo4j-admin so `value` is stored as a float and can be range-indexed.
+NUMERIC_COLUMNS = ["value:float", "unit", "quantity"]
+
+
+def _resolve_ambiguous(matches):
+    """
+    Units whose meaning depends on case, decided on the written text. Node names are usually
+    lowercased before they get here, so without a capital the word after the unit decides:
+
+    - "mm": mM (concentration) if written "mM" or followed by a solute ("5 mm v2+"), else millimetres
+      ("3 mm carbon felt");
+    - "m": molar if written "M", followed by a solute ("1.5 m h2so4") or ending the value ("2 m"),
+      else dropped ("2 m long");
+    - "k": kelvin if written "K" or ending the value ("300 k"), else dropped ("100 k cycles").
+
+    Updates `matches` in place: dropped units are cleared, mM moves to a "mm_molar" column.
+    """
+    following = matches["next"]
+    solute = following.str.contains(_SOLUTE, na=False)
+    at_end = following.isna()
+    mm = matches["mm"]
+    molar_mm = mm.notna() & (mm.str.contains("M", regex=False, na=False) | solute)
+    matches["mm_molar"] = mm.where(molar_mm)
+    matches["mm"] = mm.where(~molar_mm)
+    molar = matches["molar"]
+    matches["molar"] = molar.where((molar == "M") | solute | at_end)
+    kelvin = matches["kelvin"]
+    matches["kelvin"] = kelvin.where((kelvin == "K") | at_end)
+
+
+# mM, told apart from mm by _resolve_ambiguous.
+_MM_MOLAR = ("mm_molar", None, "mol L-1", "concentration", 0.001, 0.0)
+
+
+def parse_quantities(names):
+    """
+    Vectorized parse of the first value/unit pair in each name.
+
+    "80% energy efficiency" -> 80.0, "%", "percentage"; "100 ma cm-2" -> 100.0, "mA cm-2", "current density";
+    "1.5 m vos04" -> 1.5, "mol L-1", "concentration"; "3 mm carbon felt" -> 3.0, "mm", "length".
+    Names without a recognized pair get NaN.
+
+    :return: DataFrame aligned with `names` with columns value:float, unit, quantity
+    """
+    folded = names.astype(str).str.translate(_FOLD)
+    matches = folded.str.extract(_QUANTITY)
+    _resolve_ambiguous(matches)
+    result = pd.DataFrame(index=names.index, columns=NUMERIC_COLUMNS)
+    result["value:float"] = pd.Series(float("nan"), index=names.index)
+    number = pd.to_numeric(matches["number"], errors="coerce")
+    for name, _, unit, quantity, factor, offset in UNITS + [_MM_MOLAR]:
+        found = matches[name].notna()
+        if found.any():
+            result.loc[found, "value:float"] = number[found] * factor + offset
+            result.loc[found, "unit"] = unit
+            result.loc[found, "quantity"] = quantity
+    return result
+
+
+def add_numeric_columns(nodes):
+    """Adds the NUMERIC_COLUMNS parsed from the `name` column of a node DataFrame (returns a new DataFrame)."""
+    return pd.concat([nodes.drop(columns=NUMERIC_COLUMNS, errors="ignore"), parse_quantities(nodes["name"])], axis=1)
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# The modules live at the top level of the repository, not in an installed package.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "subNeo4j"))
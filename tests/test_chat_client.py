@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+import chat_client as cc
+
+
+class StubServer:
+    """
+    OpenAI-compatible /chat/completions on a local port, answering with the upper-cased last
+    message. The first `rate_limited` requests get a 429 with Retry-After instead.
+    """
+
+    def __init__(self, rate_limited=0, retry_after=0.2):
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+        self.requests = []  # (time, client port, status)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def completions(self, request):
+        body = await request.json()
+        port = request.transport.get_extra_info("peername")[1]
+        if self.rate_limited:
+            self.rate_limited -= 1
+            self.requests.append((time.monotonic(), port, 429))
+            return web.json_response({"error": {"message": "rate limited"}}, status=429,
+                                     headers={"Retry-After": str(self.retry_after)})
+        self.requests.append((time.monotonic(), port, 200))
+        await asyncio.sleep(0.01)
+        return web.json_response({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": body["messages"][-1]["content"].upper()}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}})
+
+    async def _start(self):
+        app = web.Application()
+        app.add_routes([web.post("/v1/chat/completions", self.completions)])
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    def __enter__(self):
+        self.thread.start()
+        port = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+        self.url = f"http://127.0.0.1:{port}/v1"
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def stub(monkeypatch, request):
+    """A StubServer as the only provider (DeepSeek's slot), on a fresh dispatcher."""
+    with StubServer(**getattr(request, "param", {})) as server:
+        monkeypatch.setattr(cc, "clients", {"deepseek": {"api_client": "openai", "api_key": "test",
+                                                         "model": "deepseek-chat", "instance": server.url}})
+        monkeypatch.setattr(cc, "dispatcher", cc.Dispatcher())
+        yield server
+        cc.dispatcher.close()
+
+
+def message(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_send_message_and_batch(stub):
+    assert cc.send_message(message("vrfb"), use_cache=False) == "VRFB"
+    assert asyncio.run(cc.asend_message(message("nafion"), use_cache=False)) == "NAFION"
+    texts = [f"chunk {i}" for i in range(20)]
+    assert cc.send_batch([message(t) for t in texts], use_cache=False) == [t.upper() for t in texts]
+    assert len(stub.requests) == 22
+
+
+def test_pooled_client_is_reused(stub):
+    for text in ("a", "b", "c"):
+        cc.send_message(message(text), use_cache=False)
+    client = cc.dispatcher.async_clients["deepseek"]
+    cc.send_message(message("d"), use_cache=False)
+    assert cc.dispatcher.async_clients == {"deepseek": client}
+    # Sequential requests go over one kept-alive connection.
+    assert len({port for _, port, _ in stub.requests}) == 1
+
+
+@pytest.mark.parametrize("stub", [{"rate_limited": 1, "retry_after": 0.3}], indirect=True)
+def test_rate_limit_cools_down_the_provider(stub):
+    start = time.monotonic()
+    assert cc.send_message(message("vrfb"), use_cache=False) == "VRFB"
+    (limited_at, _, first), (retried_at, _, second) = stub.requests
+    assert (first, second) == (429, 200)
+    # The retry waits out the server's Retry-After on the provider-wide limiter.
+    assert retried_at - limited_at >= 0.3
+    assert cc.dispatcher.limiters["deepseek"]._blocked_until >= start + 0.3
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from entity_canonical import build_canonical_map, chemically_distinct
+
+
+def triples(rows):
+    return pd.DataFrame([{"start_node": s, "relationship": r, "end_node": e,
+                          "start_node_label": "material", "end_node_label": "property"} for s, r, e in rows])
+
+
+@pytest.mark.parametrize("name, other", [
+    ("iodine", "iodide"), ("sulfite", "sulfate"), ("chlorite", "chloride"),
+    ("zinc bromine", "zinc bromide"), ("vanadium sulfite", "vanadium sulfate"),
+])
+def test_chemical_suffix_variants_stay_separate(name, other):
+    # Shared neighbours and a large frequency gap would be evidence for a typo; the suffix rule wins.
+    rows = [(name, "used in", "flow battery")] * 20 + [(other, "used in", "flow battery")]
+    canonical_map = build_canonical_map(triples(rows))
+    assert canonical_map.empty
+
+
+def test_typo_with_frequency_gap_is_merged():
+    rows = [("anthraquinone", "is", "organic molecule")] * 10 + [("antraquinone", "has", "solubility")]
+    canonical_map = build_canonical_map(triples(rows))
+    assert dict(zip(canonical_map["name"], canonical_map["canonical"])) == {"antraquinone": "anthraquinone"}
+
+
+def test_one_edit_pair_without_evidence_is_not_merged():
+    rows = [("graphite felt", "has", "porosity"), ("graphite fell", "in", "experiment")]
+    assert build_canonical_map(triples(rows)).empty
+
+
+def test_chemically_distinct():
+    assert chemically_distinct("iodine", "iodide")
+    assert not chemically_distinct("anthraquinone", "antraquinone")
@@ -0,0 +1,52 @@
+import pandas as pd
+
+import graph_update
+from graph_update import MemoryBackend, apply_delta, read_nodes, read_relationships, record_full_import, update_graph
+
+
+def write_build(directory, nodes, relationships):
+    node_file, relation_file = directory / "node_new.csv", directory / "relation_new.csv"
+    pd.DataFrame(nodes, columns=["id:ID", "name", "label", "value:float", "unit", "quantity"]).to_csv(node_file, index=False)
+    pd.DataFrame(relationships, columns=[":START_ID", ":END_ID", "relationship"]).to_csv(relation_file, index=False)
+    return node_file, relation_file
+
+
+NODES = [(1, "vrfb", "battery", None, None, None),
+         (2, "1.26 v", "property", 1.26, "V", "voltage"),
+         (3, "nafion 117", "membrane", None, None, None)]
+RELATIONSHIPS = [(1, 2, "has voltage"), (1, 3, "uses")]
+
+
+def imported(tmp_path):
+    """A MemoryBackend holding the build of a full import, and the snapshot recorded after it."""
+    node_file, relation_file = write_build(tmp_path, NODES, RELATIONSHIPS)
+    backend = MemoryBackend()
+    apply_delta(backend, read_nodes(node_file), read_relationships(relation_file))
+    record_full_import(node_file, relation_file, tmp_path / "state")
+    return backend
+
+
+def test_update_after_full_import_applies_only_the_change(tmp_path):
+    backend = imported(tmp_path)
+    backend.transactions = 0
+    build = tmp_path / "next"
+    build.mkdir()
+    nodes = NODES[:2] + [(3, "nafion 212", "membrane", None, None, None), (4, "sulfuric acid", "electrolyte", None, None, None)]
+    counts = update_graph(*write_build(build, nodes, RELATIONSHIPS + [(1, 4, "uses")]), backend=backend,
+                          state_dir=tmp_path / "state")
+
+    assert counts == {"nodes": 2, "relationships": 1, "removed_nodes": 0, "removed_relationships": 0}
+    # Changed nodes are merged into the imported ones, not duplicated, and the new edge finds both ends.
+    assert sorted(backend.nodes) == [1, 2, 3, 4]
+    assert backend.nodes[3]["properties"]["name"] == "nafion 212"
+    assert (1, graph_update.RELATIONSHIP_TYPE, 4, (("relationship", "uses"),)) in backend.relationships
+    assert len(backend.relationships) == 3
+
+
+def test_unchanged_build_applies_nothing(tmp_path):
+    backend = imported(tmp_path)
+    backend.transactions = 0
+    counts = update_graph(tmp_path / "node_new.csv", tmp_path / "relation_new.csv", backend=backend,
+                          state_dir=tmp_path / "state")
+    assert counts["nodes"] == counts["relationships"] == 0
+    assert backend.transactions == 0
@@ -0,0 +1,15 @@
+import kg_context
+
+
+def test_union_with_unaliased_columns_is_not_wrapped():
+    query = "MATCH (a)-[r]->(b) RETURN a.name, b.name UNION MATCH (a)-[r]->(b) RETURN a.name, b.name"
+    assert kg_context.limit_query(query, 10) == query
+
+
+def test_union_with_named_columns_is_wrapped():
+    query = "MATCH (a)-[r]->(b) RETURN a.name AS a, b UNION ALL MATCH (b)-[r]->(a) RETURN a.name AS a, b"
+    assert kg_context.limit_query(query, 10) == f"CALL {{\n{query}\n}}\nRETURN *\nLIMIT 10"
+
+
+def test_single_query_limit_is_lowered():
+    assert kg_context.limit_query("MATCH (a) RETURN a.name LIMIT 5000", 10) == "MATCH (a) RETURN a.name LIMIT 10"
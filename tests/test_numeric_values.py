@@ -0,0 +1,38 @@
+import math
+
+import pandas as pd
+import pytest
+
+from numeric_values import parse_quantities
+
+
+def parse(name):
+    row = parse_quantities(pd.Series([name])).iloc[0]
+    return row["value:float"], row["unit"], row["quantity"]
+
+
+@pytest.mark.parametrize("name, value, unit, quantity", [
+    ("3 mm carbon felt", 3.0, "mm", "length"),
+    ("0.5 mm thickness", 0.5, "mm", "length"),
+    ("50 µm", 0.05, "mm", "length"),
+    ("0.3 cm", 3.0, "mm", "length"),
+    ("5 mM vanadium", 0.005, "mol L-1", "concentration"),
+    ("5 mm v2+", 0.005, "mol L-1", "concentration"),
+    ("1.5 M VOSO4", 1.5, "mol L-1", "concentration"),
+    ("1.5 m voso4", 1.5, "mol L-1", "concentration"),
+    ("2 m h2so4", 2.0, "mol L-1", "concentration"),
+    ("2 m", 2.0, "mol L-1", "concentration"),
+    ("25 K", -248.15, "°C", "temperature"),
+    ("300 k", 26.85, "°C", "temperature"),
+    ("100 mA cm-2", 100.0, "mA cm-2", "current density"),
+])
+def test_units(name, value, unit, quantity):
+    parsed_value, parsed_unit, parsed_quantity = parse(name)
+    assert parsed_value == pytest.approx(value)
+    assert (parsed_unit, parsed_quantity) == (unit, quantity)
+
+
+@pytest.mark.parametrize("name", ["2 m long", "100 k cycles", "nafion 117"])
+def test_bare_m_and_k_are_not_units(name):
+    value, unit, _ = parse(name)
+    assert math.isnan(value) and pd.isna(unit)
@@ -0,0 +1,16 @@
+import pytest
+
+from pdf_extract_text import SECTION_HEADING
+
+
+@pytest.mark.parametrize("line", ["Results and Discussion", "2. Experimental Section", "Conclusions:", "III. METHODS",
+                                  "4.1 Electrochemical Measurements"])
+def test_section_headings(line):
+    assert SECTION_HEADING.search(line)
+
+
+@pytest.mark.parametrize("line", ["Results show that the VRFB retained 95% capacity.",
+                                  "Summary statistics were computed for all cells.",
+                                  "Methods based on DFT were used.", "2 m h2so4 was used as the electrolyte"])
+def test_body_sentences_are_not_headings(line):
+    assert not SECTION_HEADING.search(line)
@@ -0,0 +1,17 @@
+import pytest
+
+from qa_cache import normalize_question, same_question
+
+
+def test_typo_in_a_word_is_the_same_question():
+    assert same_question(normalize_question("What are the refernces about VRFBs?"),
+                         normalize_question("What are the references about VRFBs?"))
+
+
+@pytest.mark.parametrize("question, other", [
+    ("Which electrolytes use zinc bromine?", "Which electrolytes use zinc bromide?"),
+    ("What is the solubility of iodide?", "What is the solubility of iodine?"),
+    ("Which papers study vanadium sulfite?", "Which papers study vanadium sulfate?"),
+])
+def test_chemical_suffix_is_another_question(question, other):
+    assert not same_question(normalize_question(question), normalize_question(other))
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import graph_index
+import kg_context
+import llm_with_neo4j
+import qa_cache
+import qa_service
+
+CYPHER = "MATCH (a:Node)-[r]->(b:Node) WHERE a.name = 'x' RETURN a, r, b"
+
+
+class StubBackends:
+    """
+    Stub LLM and graph backends. The LLM answers after `release` is set (immediately by default)
+    and records how many answers are generated at once per session; the graph query runs in a
+    worker thread like a blocking Neo4j call.
+    """
+
+    def __init__(self, fail_after=None):
+        self.release = asyncio.Event()
+        self.release.set()
+        self.fail_after = fail_after
+        self.active, self.max_active = 0, 0
+        self.query_threads = set()
+
+    async def llm(self, messages):
+        if messages[0]["content"].startswith("I am working with a Neo4j database"):
+            return CYPHER
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await self.release.wait()
+            return f"answer to: {messages[-1]['content']}"
+        finally:
+            self.active -= 1
+
+    async def llm_stream(self, messages):
+        for i, piece in enumerate(["Vanadium ", "is ", "used."]):
+            if i == self.fail_after:
+                raise RuntimeError("provider dropped the stream")
+            yield piece
+
+    def run_query(self, cypher_query):
+        self.query_threads.add(threading.current_thread().name)
+        return kg_context.ContextPacker().extend([{"a": "x", "relationship": "has", "b": "y"}])
+
+
+@pytest.fixture(autouse=True)
+def no_cache_or_index(monkeypatch):
+    monkeypatch.setattr(qa_cache, "get_qa_cache", lambda: None)
+    monkeypatch.setattr(graph_index, "LOCAL_RETRIEVAL_ENABLED", False)
+
+
+def serve(backends, test, **limits):
+    """Runs `test(client)` against a QAService on the stub backends."""
+    async def main():
+        service = qa_service.QAService(llm=backends.llm, run_query=backends.run_query,
+                                       llm_stream=backends.llm_stream, **limits)
+        async with TestClient(TestServer(service.make_app())) as client:
+            await test(client)
+            assert asyncio.get_running_loop()._default_executor is None
+    asyncio.run(main())
+
+
+def test_answers_use_the_service_graph_workers():
+    backends = StubBackends()
+
+    async def test(client):
+        response = await client.post("/ask", json={"question": "What is x?"})
+        assert (await response.json())["answer"].startswith("answer to: What is x?")
+
+    serve(backends, test)
+    assert backends.query_threads and all(name.startswith("qa-graph") for name in backends.query_threads)
+
+
+def test_full_queue_is_rejected_with_503():
+    backends = StubBackends()
+    backends.release.clear()
+
+    async def test(client):
+        first = asyncio.ensure_future(client.post("/ask", json={"question": "first"}))
+        while backends.active == 0:
+            await asyncio.sleep(0.01)
+        rejected = await client.post("/ask", json={"question": "second"})
+        assert rejected.status == 503
+        assert rejected.headers["Retry-After"] == "1"
+        backends.release.set()
+        assert (await first).status == 200
+        metrics = await (await client.get("/metrics")).json()
+        assert metrics["admission"]["rejected"] == 1
+
+    serve(backends, test, max_concurrency=1, max_queue=0)
+
+
+def test_one_question_at_a_time_per_session():
+    backends = StubBackends()
+
+    async def test(client):
+        session_id = (await (await client.post("/ask", json={"question": "start"})).json())["session_id"]
+        backends.release.clear()
+        backends.max_active = 0
+        same = [asyncio.ensure_future(client.post("/ask", json={"question": f"q{i}", "session_id": session_id}))
+                for i in range(3)]
+        await asyncio.sleep(0.1)
+        assert backends.max_active == 1
+        other = asyncio.ensure_future(client.post("/ask", json={"question": "other user"}))
+        while backends.max_active < 2:
+            await asyncio.sleep(0.01)
+        backends.release.set()
+        for response in await asyncio.gather(*same, other):
+            assert response.status == 200
+        assert backends.max_active == 2
+
+    serve(backends, test, max_concurrency=8)
+
+
+@pytest.mark.parametrize("fail_after, status, body", [
+    (None, 200, "Vanadium is used."),
+    (2, 200, f"Vanadium is \n{qa_service.STREAM_ERROR_PREFIX}provider dropped the stream\n"),
+    (0, 500, '{"error": "provider dropped the stream"}'),
+])
+def test_streamed_answer(fail_after, status, body):
+    backends = StubBackends(fail_after)
+
+    async def test(client):
+        response = await client.post("/ask/stream", json={"question": "What is vanadium used for?"})
+        assert response.status == status
+        assert await response.text() == body
+
+    serve(backends, test)
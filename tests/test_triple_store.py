@@ -0,0 +1,36 @@
+import json
+
+import triple_store
+from triple_store import TripleStoreWriter, read_triples, retire_stale_chunks
+
+VRFB = ("vrfb", "uses", "nafion", "battery", "membrane")
+ZINC = ("zinc bromine battery", "uses", "zinc bromide", "battery", "electrolyte")
+
+
+def test_reextraction_without_triples_hides_older_rows(tmp_path):
+    with TripleStoreWriter(tmp_path) as writer:
+        writer.append([VRFB], "Paper", "paper.pdf", 0)
+        writer.append([ZINC], "Paper", "paper.pdf", 1)
+    with TripleStoreWriter(tmp_path) as writer:
+        writer.append([], "Paper", "paper.pdf", 0)
+
+    assert read_triples(tmp_path)["start_node"].tolist() == ["zinc bromine battery"]
+
+
+def test_chunks_dropped_from_the_manifest_are_retired(tmp_path):
+    store, paper = tmp_path / "store", tmp_path / "paper"
+    paper.mkdir()
+    with TripleStoreWriter(store) as writer:
+        writer.append([VRFB], "Paper", "paper.pdf", 0)
+        writer.append([ZINC], "Paper", "paper.pdf", 1)
+        writer.append([ZINC], "Other", "other.pdf", 5)
+    # The document shrank to one chunk; DocumentManifest.truncate dropped chunk 1.
+    (paper / "0.txt").write_text("[]", encoding="utf-8")
+    (paper / "manifest.json").write_text(json.dumps({"source": "paper.pdf", "chunks": {"0": {"status": "done"}}}),
+                                         encoding="utf-8")
+
+    assert retire_stale_chunks([paper], store) == 1
+    assert retire_stale_chunks([paper], store) == 0
+    assert read_triples(store, ["start_node", "doi"]).values.tolist() == [
+        ["vrfb", "Paper"], ["zinc bromine battery", "Other"]]
+    assert ("paper.pdf", 1) not in triple_store.stored_chunks(store)
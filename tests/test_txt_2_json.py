@@ -0,0 +1,20 @@
+from txt_2_json import parse_llm_json
+
+
+def test_malformed_object_mid_array_is_not_truncation():
+    items, report = parse_llm_json('[{"a": "b"}, {"a": [1, 2 x}, {"c": "d"}]')
+    assert items == [{"a": "b"}, {"c": "d"}]
+    assert report.dropped == 1
+    assert not report.truncated
+
+
+def test_nested_objects_of_a_dropped_object_are_not_recovered():
+    items, report = parse_llm_json('[{"a": "b"}, {"a": {"x": 1} y}, {"c": "d"}]')
+    assert items == [{"a": "b"}, {"c": "d"}]
+    assert (report.dropped, report.truncated) == (1, False)
+
+
+def test_output_cut_off_mid_array_is_truncated():
+    items, report = parse_llm_json('[{"a": "b"}, {"c": "d"}, {"e": "f')
+    assert items == [{"a": "b"}, {"c": "d"}]
+    assert report.truncated
@@ -0,0 +1,82 @@
+import os
+import gzip
+import json
+import hashlib
+from pathlib import Path
+
+# Bump when the page text produced by pdf_extract_text.load_PDF changes, to invalidate old entries.
+TEXT_CACHE_FORMAT = 2
+TEXT_CACHE_DIRNAME = ".textcache"
+TEXT_CACHE_ENABLED = os.getenv("EXTRACT_TEXT_CACHE", "1").lower() not in ("0", "false", "no")
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def loader_version():
+    """Identifies the parser that produced cached text; any change re-parses the corpus."""
+    try:
+        import pypdf
+        pypdf_version = pypdf.__version__
+    except ImportError:
+        pypdf_version = "unknown"
+    return f"{TEXT_CACHE_FORMAT}-pypdf{pypdf_version}"
+
+
+class TextCache:
+    """
+    Parsed page text of documents, keyed by file content hash and loader version.
+
+    Entries are gzip-compressed JSON lines, one `[page_number, text]` per line, stored in a
+    `.textcache` directory next to the corpus. Reading and writing both stream page by page.
+    """
+
+    def __init__(self, corpus_dir):
+        self.root = Path(corpus_dir) / TEXT_CACHE_DIRNAME
+        self.version = loader_version()
+
+    def entry_path(self, doc_path):
+        key = hashlib.sha256(f"{file_hash(doc_path)}:{self.version}".encode('utf-8')).hexdigest()
+        return self.root / key[:2] / f"{key}.jsonl.gz"
+
+    def open_pages(self, doc_path, loader):
+        """
+        Page stream for `doc_path`, served from the cache when present.
+
+        :param loader: callable returning the (page_number, text) stream on a cache miss
+        :return: (cache_hit, generator of (page_number, text))
+        """
+        path = self.entry_path(doc_path)
+        if path.exists():
+            return True, self._read(path)
+        return False, self._write_through(path, loader(doc_path))
+
+    @staticmethod
+    def _read(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                page_number, text = json.loads(line)
+                yield page_number, text
+
+    @staticmethod
+    def _write_through(path, pages):
+        # Written to a temp file and renamed only after the whole document parsed, so a
+        # failed or interrupted parse never leaves a partial entry behind.
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                for page_number, text in pages:
+                    f.write(json.dumps([page_number, text], ensure_ascii=False))
+                    f.write('\n')
+                    yield page_number, text
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
@@ -0,0 +1,299 @@
+import os
+import json
+import time
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+from txt_2_json import parse_llm_json
+
+# Columns of the store. The first six match subNeo4j/json_2_csv.write_json_to_csv output,
+# so downstream code can read either.
+TRIPLE_FIELDS = ["start_node", "relationship", "end_node", "start_node_label", "end_node_label"]
+COLUMNS = TRIPLE_FIELDS + ["doi", "source", "chunk", "batch"]
+FLUSH_ROWS = int(os.getenv("TRIPLE_STORE_FLUSH_ROWS", "50000"))
+# Index of every chunk written to the store, including chunks that produced no triples, with the batch
+# it was written in. Chunks dropped from their document (see retire) are recorded with triples = -1.
+CHUNK_INDEX = "chunks.csv"
+RETIRED = -1
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow, pyarrow.parquet
+    except ImportError:
+        raise ImportError("The triple store needs `pyarrow` (pip install pyarrow).")
+
+
+def normalize(value):
+    """The one normalization applied to node, relationship and label text: lowercase, '_' as space, trimmed."""
+    return value.lower().replace("_", " ").strip()
+
+
+def triples_from_output(content):
+    """
+    Parses one raw LLM response into normalized triples.
+
+    :return: list of tuples in TRIPLE_FIELDS order; objects missing a field or with non-string values are skipped
+    """
+    items, _ = parse_llm_json(content)
+    triples = []
+    for item in items:
+        try:
+            triples.append(tuple(normalize(item[field]) for field in TRIPLE_FIELDS))
+        except (KeyError, AttributeError):
+            continue
+    return triples
+
+
+class TripleStoreWriter:
+    """
+    Appends triples to a directory of Parquet files (one file per flushed batch).
+
+    Every row records the document and chunk it came from and the batch it was written in.
+    When a chunk is extracted again, readers keep only its rows from the newest batch, so the
+    store can stay append-only. The newest batch of a chunk is taken from the chunk index, so a
+    re-extraction without triples, or a retired chunk, hides the older rows too.
+    """
+
+    def __init__(self, store_dir, flush_rows=FLUSH_ROWS):
+        self.pa, self.pq = _require_pyarrow()
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self.rows = {column: [] for column in COLUMNS}
+        self.chunks = []  # (source, chunk, triples) appended since the last flush
+        self.rows_written = 0
+        self._batch = time.time_ns()
+
+    def append(self, triples, doi, source, chunk):
+        batch = self._batch
+        self.chunks.append((str(source), int(chunk), len(triples)))
+        for triple in triples:
+            for field, value in zip(TRIPLE_FIELDS, triple):
+                self.rows[field].append(value)
+            self.rows["doi"].append(doi)
+            self.rows["source"].append(str(source))
+            self.rows["chunk"].append(int(chunk))
+            self.rows["batch"].append(batch)
+        if len(self.rows["doi"]) >= self.flush_rows:
+            self.flush()
+
+    def append_output(self, content, doi, source, chunk):
+        """Parses a raw LLM response and appends its triples; returns how many were appended."""
+        triples = triples_from_output(content)
+        self.append(triples, doi, source, chunk)
+        return len(triples)
+
+    def retire(self, source, chunk):
+        """Records that a chunk is no longer part of its document; readers drop its rows from now on."""
+        self.chunks.append((str(source), int(chunk), RETIRED))
+
+    def flush(self):
+        if not self.chunks:
+            return
+        if self.rows["doi"]:
+            table = self.pa.table(self.rows)
+            path = self.store_dir / f"part-{self._batch}-{os.getpid()}.parquet"
+            self.pq.write_table(table, path, compression="zstd")
+            self.rows_written += table.num_rows
+        # The index is written after the data file, so every chunk it lists is on disk.
+        index_path = self.store_dir / CHUNK_INDEX
+        pd.DataFrame(self.chunks, columns=["source", "chunk", "triples"]).assign(batch=self._batch).to_csv(
+            index_path, mode="a", header=not index_path.exists(), index=False, encoding="utf-8")
+        self.rows = {column: [] for column in COLUMNS}
+        self.chunks = []
+        # The next flush gets a newer batch number, so re-extracted chunks supersede older rows.
+        self._batch = max(time.time_ns(), self._batch + 1)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def chunk_batches(store_dir):
+    """
+    Newest batch of every chunk in the store, from the chunk index and, for stores written before it
+    existed, the row keys of the Parquet files.
+
+    :return: DataFrame of source, chunk, batch, triples (NaN when known only from the rows; RETIRED for retired chunks)
+    """
+    store_dir = Path(store_dir)
+    keys = ["source", "chunk", "batch"]
+    frames = []
+    index_path = store_dir / CHUNK_INDEX
+    if index_path.exists():
+        frames.append(pd.read_csv(index_path, dtype={"source": str, "chunk": "int64", "batch": "int64"}))
+    files = sorted(store_dir.glob("*.parquet"))
+    if files:
+        _require_pyarrow()
+        frames.extend(pd.read_parquet(f, columns=keys).drop_duplicates() for f in files)
+    if not frames:
+        return pd.DataFrame(columns=keys + ["triples"])
+    chunks = pd.concat(frames, ignore_index=True).astype({"source": str, "chunk": "int64", "batch": "int64"})
+    # A batch found in both the index and the data files is taken from the index, which has the triple count.
+    chunks["indexed"] = chunks["triples"].notna()
+    chunks = chunks.sort_values(["batch", "indexed"], kind="stable").drop_duplicates(["source", "chunk"], keep="last")
+    return chunks[keys + ["triples"]].reset_index(drop=True)
+
+
+def iter_triples(store_dir, columns=None):
+    """
+    Yields the store one Parquet file at a time, keeping for every (source, chunk) only the rows of
+    its newest batch in the chunk index (chunk_batches). Rows of a chunk re-extracted without
+    triples, or retired, are dropped. Only the chunk keys of the whole store are held in memory at once.
+
+    :param columns: columns to return (default: TRIPLE_FIELDS + doi)
+    """
+    _require_pyarrow()
+    columns = columns or TRIPLE_FIELDS + ["doi"]
+    files = sorted(Path(store_dir).glob("*.parquet"))
+    keys = ["source", "chunk", "batch"]
+    if not files:
+        return
+    latest = chunk_batches(store_dir).set_index(["source", "chunk"])["batch"].rename("latest")
+    for f in files:
+        df = pd.read_parquet(f, columns=list(dict.fromkeys(columns + keys)))
+        df = df.astype({"source": str, "chunk": "int64"}).join(latest, on=["source", "chunk"])
+        yield df.loc[df["batch"] == df["latest"], columns].reset_index(drop=True)
+
+
+def read_triples(store_dir, columns=None):
+    """
+    Reads the store as a DataFrame, keeping for every (source, chunk) only the rows of its newest batch.
+
+    :param columns: columns to return (default: TRIPLE_FIELDS + doi)
+    """
+    columns = columns or TRIPLE_FIELDS + ["doi"]
+    parts = list(iter_triples(store_dir, columns))
+    if not parts:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(parts, ignore_index=True)
+
+
+def output_dirs(output_root):
+    """The per-paper output directories under `output_root` (the working directory of pdf_extract_text)."""
+    return [p for p in Path(output_root).iterdir()
+            if p.is_dir() and not p.name.startswith('.') and any(t.stem.isdigit() for t in p.glob("*.txt"))]
+
+
+def stored_chunks(store_dir):
+    """(source, chunk) of every chunk in the store that is not retired (chunk_batches)."""
+    chunks = chunk_batches(store_dir)
+    chunks = chunks[chunks["triples"] != RETIRED]
+    return set(zip(chunks["source"], chunks["chunk"].astype(int)))
+
+
+def _read_manifest(directory):
+    try:
+        with open(Path(directory) / "manifest.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def finished_chunks(directory):
+    """
+    Finished chunks of one paper's output directory: (source, [chunk index]). The source and the
+    finished chunks come from its manifest (extract_manifest); without one, every `{i}.txt` counts
+    and the directory is the source.
+    """
+    directory = Path(directory)
+    outputs = {int(p.stem) for p in directory.glob("*.txt") if p.stem.isdigit()}
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        return str(directory), sorted(outputs)
+    done = {int(key) for key, entry in manifest.get("chunks", {}).items() if entry.get("status") == "done"}
+    return manifest.get("source", str(directory)), sorted(done & outputs)
+
+
+def listed_chunks(directory):
+    """
+    Chunks of the current chunking of one paper's output directory: (source, [chunk index]), every
+    chunk in its manifest whatever its status; without a manifest, every `{i}.txt`.
+    """
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        return finished_chunks(directory)
+    return manifest.get("source", str(directory)), sorted(int(key) for key in manifest.get("chunks", {}))
+
+
+def stale_chunks(output_dirs, store_dir):
+    """
+    Stored chunks that the manifest of their document no longer lists, e.g. after the document
+    shrank (DocumentManifest.truncate): [(source, chunk)]. Only documents in `output_dirs` are
+    checked; chunks of other sources are left alone.
+    """
+    listed = {source: set(chunks) for source, chunks in map(listed_chunks, output_dirs)}
+    return sorted((source, chunk) for source, chunk in stored_chunks(store_dir)
+                  if source in listed and chunk not in listed[source])
+
+
+def retire_stale_chunks(output_dirs, store_dir):
+    """Retires the stale_chunks of `output_dirs`, so their triples leave the store; returns how many."""
+    stale = stale_chunks(output_dirs, store_dir) if Path(store_dir).is_dir() else []
+    if stale:
+        with TripleStoreWriter(store_dir) as writer:
+            for source, chunk in stale:
+                writer.retire(source, chunk)
+    return len(stale)
+
+
+def missing_chunks(output_dirs, store_dir):
+    """Finished chunks of `output_dirs` whose output is not in the store: [(directory, source, chunk)]."""
+    stored = stored_chunks(store_dir) if Path(store_dir).is_dir() else set()
+    missing = []
+    for directory in output_dirs:
+        source, chunks = finished_chunks(directory)
+        missing.extend((Path(directory), source, chunk) for chunk in chunks if (source, chunk) not in stored)
+    return missing
+
+
+def ingest_outputs(output_dirs, store_dir, only_missing=False):
+    """
+    Loads existing extraction outputs (`{i}.txt` per chunk, one directory per paper) into the store,
+    replacing the txt -> json -> output.csv steps for corpora extracted before the store existed.
+
+    :param only_missing: add only the finished chunks the store does not have yet (missing_chunks),
+        e.g. chunks finished by runs that did not write to the store
+    :return: number of triples written
+    """
+    if only_missing:
+        chunks = missing_chunks(output_dirs, store_dir)
+    else:
+        chunks = [(Path(d), source, chunk) for d in output_dirs for source, indices in [finished_chunks(d)]
+                  for chunk in indices]
+    total = 0
+    with TripleStoreWriter(store_dir) as writer:
+        for directory, source, chunk in chunks:
+            txt_path = directory / f"{chunk}.txt"
+            try:
+                content = txt_path.read_text(encoding="utf-8")
+            except OSError as e:
+                logging.error(f"{txt_path}: {e}")
+                continue
+            total += writer.append_output(content, directory.name.title(), source, chunk)
+    return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load existing extraction outputs ({i}.txt per paper) into a triple store.")
+    parser.add_argument("output_root", help="directory containing one output directory per paper")
+    parser.add_argument("store_dir", help="triple store directory to append to")
+    parser.add_argument("--missing", action="store_true",
+                        help="only add finished chunks the store does not have, and retire chunks the manifests no longer list")
+    args = parser.parse_args()
+    paper_dirs = output_dirs(args.output_root)
+    print(f"{ingest_outputs(paper_dirs, args.store_dir, args.missing)} triples written to {args.store_dir}")
+    if args.missing:
+        print(f"{retire_stale_chunks(paper_dirs, args.store_dir)} chunks no longer in their document were retired")
@@ -1,134 +1,422 @@
 import os
 import json
-import ast # For literal_eval
 import re
+import hashlib
+import argparse
+import concurrent.futures
 from pathlib import Path
 
-def repair_json_string(json_like_string):
+# --- Tolerant single-pass parser ---
+# LLM output is scanned once from left to right. Every top-level object is first handed to the
+# C scanner of the json module (`raw_decode`); only objects it rejects are re-read by the small
+# Python parser below, which accepts single quotes, Python literals, comments, trailing or missing
+# commas and bare keys. An object cut off by the end of the text is dropped, everything before it
+# is kept.
+
+_DECODER = json.JSONDecoder()
+_LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+_NUMBER = re.compile(r"-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_BARE_WORD = re.compile(r"[A-Za-z_$][\w$\-]*")
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"', "'": "'"}
+
+
+class ParseReport:
+    """Counts of what `parse_llm_json` found in one text."""
+
+    def __init__(self):
+        self.items = 0        # objects returned
+        self.repaired = 0     # objects that needed the tolerant parser
+        self.dropped = 0      # malformed objects that could not be recovered
+        self.truncated = False  # the text ended inside an object
+
+    def __repr__(self):
+        return (f"ParseReport(items={self.items}, repaired={self.repaired}, dropped={self.dropped}, "
+                f"truncated={self.truncated})")
+
+
+class _Truncated(Exception):
+    pass
+
+
+class _Malformed(Exception):
+    pass
+
+
+class _TolerantParser:
+    def __init__(self, text):
+        self.text = text
+        self.n = len(text)
+
+    def skip(self, i):
+        """Skips whitespace and // or /* */ comments."""
+        text, n = self.text, self.n
+        while i < n:
+            c = text[i]
+            if c in ' \t\r\n':
+                i += 1
+            elif c == '/' and text.startswith('//', i):
+                end = text.find('\n', i)
+                i = n if end == -1 else end + 1
+            elif c == '/' and text.startswith('/*', i):
+                end = text.find('*/', i + 2)
+                i = n if end == -1 else end + 2
+            else:
+                break
+        return i
+
+    def value(self, i):
+        i = self.skip(i)
+        if i >= self.n:
+            raise _Truncated()
+        c = self.text[i]
+        if c == '{':
+            return self.object(i)
+        if c == '[':
+            return self.array(i)
+        if c in '"\'':
+            return self.string(i)
+        match = _NUMBER.match(self.text, i)
+        if match:
+            number = match.group()
+            return (float(number) if any(x in number for x in '.eE') else int(number)), match.end()
+        match = _BARE_WORD.match(self.text, i)
+        if match:
+            word = match.group()
+            return _LITERALS.get(word, word), match.end()
+        raise _Malformed(f"unexpected {c!r} at {i}")
+
+    def string(self, i):
+        text, quote = self.text, self.text[i]
+        parts = []
+        i += 1
+        start = i
+        while True:
+            end = text.find(quote, i)
+            backslash = text.find('\\', i, end if end != -1 else self.n)
+            if backslash != -1:
+                parts.append(text[start:backslash])
+                if backslash + 1 >= self.n:
+                    raise _Truncated()
+                escape = text[backslash + 1]
+                if escape == 'u' and backslash + 6 <= self.n:
+                    try:
+                        parts.append(chr(int(text[backslash + 2:backslash + 6], 16)))
+                        i = start = backslash + 6
+                        continue
+                    except ValueError:
+                        pass
+                parts.append(_ESCAPES.get(escape, escape))
+                i = start = backslash + 2
+                continue
+            if end == -1:
+                raise _Truncated()
+            parts.append(text[start:end])
+            return ''.join(parts), end + 1
+
+    def object(self, i):
+        result = {}
+        i += 1
+        while True:
+            i = self.skip(i)
+            if i >= self.n:
+                raise _Truncated()
+            c = self.text[i]
+            if c == '}':
+                return result, i + 1
+            if c == ',':
+                i += 1
+                continue
+            if c in '"\'':
+                key, i = self.string(i)
+            else:
+                match = _BARE_WORD.match(self.text, i)
+                if not match:
+                    raise _Malformed(f"bad key at {i}")
+                key, i = match.group(), match.end()
+            i = self.skip(i)
+            if i >= self.n:
+                raise _Truncated()
+            if self.text[i] not in ':=':
+                raise _Malformed(f"expected ':' at {i}")
+            result[key], i = self.value(i + 1)
+
+    def skip_object(self, i):
+        """
+        End of the object starting at `i` that could not be parsed: the position after its closing
+        '}'. Brackets inside strings are ignored, a '}' also closes arrays left open inside the object
+        and a stray ']' is ignored. Raises _Truncated if the text ends first.
+        """
+        text, n = self.text, self.n
+        stack = []
+        while i < n:
+            c = text[i]
+            if c in '"\'':
+                _, i = self.string(i)
+                continue
+            if c in '{[':
+                stack.append(c)
+            elif c == '}':
+                while stack and stack.pop() != '{':
+                    pass
+                if not stack:
+                    return i + 1
+            elif c == ']' and '[' in stack:
+                while stack.pop() != '[':
+                    pass
+            i += 1
+        raise _Truncated()
+
+    def array(self, i):
+        result = []
+        i += 1
+        while True:
+            i = self.skip(i)
+            if i >= self.n:
+                raise _Truncated()
+            c = self.text[i]
+            if c == ']':
+                return result, i + 1
+            if c == ',':
+                i += 1
+                continue
+            item, i = self.value(i)
+            result.append(item)
+
+
+def _flatten(item):
+    """Unwraps {"triples": [...]}-style wrappers so the caller always gets the inner objects."""
+    if isinstance(item, dict):
+        lists = [v for v in item.values() if isinstance(v, list) and v and all(isinstance(x, dict) for x in v)]
+        if lists and not any(isinstance(v, str) for v in item.values()):
+            return [x for v in lists for x in v]
+        return [item]
+    if isinstance(item, list):
+        return [x for v in item for x in _flatten(v)]
+    return []
+
+
+def parse_llm_json(content):
+    """
+    Recovers the JSON objects from raw LLM output in a single left-to-right pass.
+
+    Handles code fences and prose around the JSON, several arrays in a row, single quotes, Python
+    True/False/None, comments, trailing commas and output truncated mid-array. Objects that are cut
+    off or cannot be repaired are dropped and counted in the report.
+
+    :param content: raw text of one LLM response
+    :return: (list of objects, ParseReport)
+    """
+    report = ParseReport()
+    parser = _TolerantParser(content)
+    items = []
+    n = len(content)
+    i = content.find('{')
+    # Top-level arrays still open; one left open at the end means the output was cut off between objects.
+    open_arrays = content.count('[', 0, i if i >= 0 else n) - content.count(']', 0, i if i >= 0 else n)
+    while 0 <= i < n:
+        try:
+            item, i = _DECODER.raw_decode(content, i)
+        except json.JSONDecodeError:
+            try:
+                item, i = parser.object(i)
+                report.repaired += 1
+            except _Truncated:
+                report.truncated = True
+                break
+            except (_Malformed, RecursionError):
+                report.dropped += 1
+                item = None
+                # Skip the whole malformed object: its brackets and nested objects do not count as top level.
+                try:
+                    i = parser.skip_object(i)
+                except _Truncated:
+                    report.truncated = True
+                    break
+        if item is not None:
+            items.extend(_flatten(item))
+        gap_start = i
+        i = content.find('{', i)
+        gap_end = i if i >= 0 else n
+        open_arrays += content.count('[', gap_start, gap_end) - content.count(']', gap_start, gap_end)
+    if open_arrays > 0:
+        report.truncated = True
+    report.items = len(items)
+    return items, report
+
+
+STATE_FILENAME = ".txt_2_json_state.json"
+
+
+def convert_file(txt_filepath, json_filepath, compact=False):
+    """
+    Converts one LLM output .txt file into a .json file.
+
+    :param compact: write the JSON without indentation or spaces
+    :return: dict with the outcome: status ("ok", "empty", "failed"), message, and the ParseReport counts
+    """
+    result = {"file": txt_filepath, "status": "failed", "message": "", "items": 0, "salvaged": False}
+    try:
+        with open(txt_filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+    except Exception as e:
+        result["message"] = f"Error: Unable to read file '{txt_filepath}': {e}"
+        return result
+
+    if not content.strip():
+        result.update(status="empty", message=f"Warning: The file '{txt_filepath}' is empty and has been skipped.")
+        return result
+
+    parsed_data, report = parse_llm_json(content)
+    if not parsed_data:
+        result["message"] = f"Error: No JSON objects could be recovered from '{txt_filepath}': {report}"
+        return result
+    result["items"] = report.items
+    if report.repaired or report.dropped or report.truncated:
+        result["salvaged"] = True
+        result["message"] = (f"Salvaged {report.items} objects ({report.repaired} repaired, {report.dropped} dropped"
+                             f"{', truncated' if report.truncated else ''}): '{txt_filepath}'")
+
+    try:
+        with open(json_filepath, 'w', encoding='utf-8') as jf:
+            if compact:
+                json.dump(parsed_data, jf, ensure_ascii=False, separators=(',', ':'))
+            else:
+                json.dump(parsed_data, jf, ensure_ascii=False, indent=4)
+        result["status"] = "ok"
+    except Exception as e:
+        result["message"] = f"Error: Unable to write JSON file '{json_filepath}': {e}"
+    return result
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _load_state(directory_path):
+    try:
+        with open(os.path.join(directory_path, STATE_FILENAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(directory_path, state):
+    path = os.path.join(directory_path, STATE_FILENAME)
+    with open(path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _needs_conversion(txt_filepath, json_filepath, recorded):
     """
-    Attempt to fix common JSON formatting issues.
-    Return the repaired string, and if it cannot be fixed to a parsed level, return the original string.
+    A .txt needs converting if its .json is missing or older, or if its content hash differs from the
+    one recorded at the last conversion. The hash is only computed when size or mtime changed.
+
+    :return: (needs conversion, current state record for the file)
     """
-    original_string = json_like_string
-    repaired_string = json_like_string
-
-    # 1. Attempt to remove common comments (single line and multiple line)
-    repaired_string = re.sub(r"//.*", "", repaired_string) # 移除 // 注释
-    repaired_string = re.sub(r"/\*.*?\*/", "", repaired_string, flags=re.DOTALL) # 移除 /* */ 注释
-
-    # 2. Replace Python's True/False/None with JSON's true/false/null
-    repaired_string = re.sub(r"\bTrue\b", "true", repaired_string)
-    repaired_string = re.sub(r"\bFalse\b", "false", repaired_string)
-    repaired_string = re.sub(r"\bNone\b", "null", repaired_string)
-
-    # 3. Attempt to remove trailing commas
-    # Remove the comma after the last attribute in the object: ,} -> } and ,\n} -> \n}
-    repaired_string = re.sub(r",\s*([}\]])", r"\1", repaired_string)
-
-    # 4. Attempt to convert single quote keys and values into double quotes (this is a rough attempt and may not be perfect)
-    # Note: This replacement is quite aggressive and may break the string content containing single quotes.
-    # A better approach is to rely on ast.liter eval or more complex parsers.
-    # But for demonstration purposes, let's briefly handle it here.
-    # First, try replacing the part that looks like a key: 'key': ->'key':
-    # repaired_string = re.sub(r"(')([^']+)(')\s*:", r'"\2"\g<0>:', repaired_string) #  This line is too complex and prone to errors, please comment it out first
-    # A simpler (but risky) way:
-    # Repareed_string=repareed_string. replace ("" "," "") # This is too rough and will break strings like "it's"
-
-    return repaired_string
-
-def process_txt_to_json(file_paths):
+    stat = os.stat(txt_filepath)
+    current = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": None}
+    if not os.path.exists(json_filepath) or os.stat(json_filepath).st_mtime_ns < stat.st_mtime_ns:
+        return True, current
+    if recorded is None:
+        return True, current
+    if recorded.get("size") == current["size"] and recorded.get("mtime_ns") == current["mtime_ns"]:
+        return False, recorded
+    current["hash"] = _file_hash(txt_filepath)
+    return current["hash"] != recorded.get("hash"), current
+
+
+def process_txt_to_json(file_paths, workers=None, incremental=True, compact=False):
     """
     Traverse all. txt files in the specified directory and attempt to parse their contents as JSON,
     Fix common errors and save as a. json file with the same name.
+    Parsing uses `parse_llm_json`, which salvages the complete objects from malformed or truncated output.
+
+    :param file_paths: directories containing the .txt outputs (one per paper)
+    :param workers: processes converting files in parallel (default: CPU count; 1 converts in this process)
+    :param incremental: only convert files that are new or changed since their .json was written
+    :param compact: write compact JSON instead of indent=4
+    :return: dict of totals across all directories
     """
+    totals = {"scanned": 0, "up_to_date": 0, "converted": 0, "failed": 0, "salvaged": 0, "objects": 0}
     if not file_paths:
         print("Error: No directory found.")
-        return
-    if len(file_paths) >= 1:
-        for directory_path in file_paths:
-            if not os.path.isdir(directory_path):
-                print(f"Error: Catalog '{directory_path}' is not exist.")
-                return
-            print(f"Processing directory: {directory_path}")
-            processed_files = 0
-            successful_conversions = 0
-            failed_conversions = 0
-
-            for filename in os.listdir(directory_path):
-                if filename.lower().endswith(".txt"):
-                    txt_filepath = os.path.join(directory_path, filename)
-                    base_name = os.path.splitext(filename)[0]
-                    json_filepath = os.path.join(directory_path, base_name + ".json")
-
-                    print(f"\n--- Processing: {filename} ---")
-                    processed_files += 1
+        return totals
 
-                    try:
-                        with open(txt_filepath, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                    except Exception as e:
-                        print(f"Error: Unable to read file '{filename}': {e}")
-                        failed_conversions += 1
-                        continue
+    tasks = []
+    states = {}
+    for directory_path in file_paths:
+        directory_path = str(directory_path)
+        if not os.path.isdir(directory_path):
+            print(f"Error: Catalog '{directory_path}' is not exist.")
+            continue
+        state = _load_state(directory_path) if incremental else {}
+        states[directory_path] = state
+        for filename in os.listdir(directory_path):
+            if not filename.lower().endswith(".txt"):
+                continue
+            totals["scanned"] += 1
+            txt_filepath = os.path.join(directory_path, filename)
+            json_filepath = os.path.join(directory_path, os.path.splitext(filename)[0] + ".json")
+            if incremental:
+                needed, record = _needs_conversion(txt_filepath, json_filepath, state.get(filename))
+                if not needed:
+                    totals["up_to_date"] += 1
+                    continue
+            else:
+                record = None
+            tasks.append((directory_path, filename, txt_filepath, json_filepath, record))
 
-                    if not content.strip():
-                        print(f"Warning: The file '{filename}' is empty and has been skipped.")
-                        failed_conversions += 1
-                        continue
+    print(f"{totals['scanned']} .txt files in {len(states)} directories, {len(tasks)} to convert.")
 
-                    parsed_data = None
-                    error_message = ""
+    def handle(task, result):
+        directory_path, filename, txt_filepath, _, record = task
+        if result["message"]:
+            print(result["message"])
+        if result["status"] == "ok":
+            totals["converted"] += 1
+            totals["objects"] += result["items"]
+            totals["salvaged"] += result["salvaged"]
+            if incremental:
+                if record["hash"] is None:
+                    record["hash"] = _file_hash(txt_filepath)
+                states[directory_path][filename] = record
+        else:
+            totals["failed"] += 1
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        for task in tasks:
+            handle(task, convert_file(task[2], task[3], compact))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            # Many small files: hand them out in batches to keep inter-process overhead low.
+            results = executor.map(convert_file, [t[2] for t in tasks], [t[3] for t in tasks],
+                                   [compact] * len(tasks), chunksize=max(1, len(tasks) // (workers * 8)))
+            for task, result in zip(tasks, results):
+                handle(task, result)
+
+    if incremental:
+        for directory_path, state in states.items():
+            _save_state(directory_path, state)
+
+    print(f"\n--- OVER ---")
+    print(f"Total number of scanned files: {totals['scanned']}")
+    print(f"Already up to date: {totals['up_to_date']}")
+    print(f"Successfully converted and saved: {totals['converted']} ({totals['objects']} objects)")
+    print(f"Conversion failed or skipped: {totals['failed']}")
+    print(f"Recovered from malformed or truncated output: {totals['salvaged']}")
+    return totals
 
-                    # Attempt 1: Directly parse using json. loads
-                    try:
-                        parsed_data = json.loads(content)
-                        print(f"Success (direct parsing): '{filename}'")
-                    except json.JSONDecodeError as e_direct:
-                        error_message = f"Direct parsing failed: {e_direct}\n"
-                        #Attempt 2: Use ast.literaleval (to handle Python style literals)
-                        try:
-                            # Ast.literaleval may be slower or have depth limitations for very large or deeply nested structures
-                            # But it is very effective for most "JSON like" Python dictionaries/list strings
-                            py_object = ast.literal_eval(content)
-                            # If ast.literaleval is successful, py_order is a Python object
-                            # Now we use json. dumps to convert it into a standard JSON string
-                            # This will automatically handle True/False/None and quotation mark issues
-                            json_string_from_ast = json.dumps(py_object, ensure_ascii=False, indent=4)
-                            # Verify again with json. loads to ensure that the output of json. dumps is valid JSON
-                            parsed_data = json.loads(json_string_from_ast)
-                            print(f"Success (converted through ast.liter eval): '{filename}'")
-                        except (ValueError, SyntaxError, TypeError) as e_ast:
-                            error_message += f"ast.literal_eval failed: {e_ast}\n"
-                            #Attempt 3: Perform some string repairs before attempting json. loads
-                            repaired_content = repair_json_string(content)
-                            try:
-                                parsed_data = json.loads(repaired_content)
-                                print(f"Success (resolved after repair): '{filename}'")
-                            except json.JSONDecodeError as e_repaired:
-                                error_message += f"Failed to parse after repair: {e_repaired}\n"
-                                print(f"Error: Unable to parse '{filename}' into JSON. Error message attempted:\n{error_message}")
-                                failed_conversions += 1
-                                continue # Skip the save step
-                        except Exception as e_general_ast: # Capture other ast related errors
-                            error_message += f"ast.literal_eval An unexpected error occurred: {e_general_ast}\n"
-                            print(f"Error: Unable to parse '{filename}' into JSON. Error message attempted:\n{error_message}")
-                            failed_conversions += 1
-                            continue
-
-
-                    if parsed_data is not None:
-                        try:
-                            with open(json_filepath, 'w', encoding='utf-8') as jf:
-                                json.dump(parsed_data, jf, ensure_ascii=False, indent=4)
-                            print(f"Saved as: '{json_filepath}'")
-                            successful_conversions += 1
-                        except Exception as e:
-                            print(f"Error: Unable to write JSON file '{json_filepath}': {e}")
-                            failed_conversions += 1
-
-        print(f"\n--- OVER ---")
-        print(f"Total number of scanned files: {processed_files}")
-        print(f"Successfully converted and saved: {successful_conversions}")
-        print(f"Conversion failed or skipped: {failed_conversions}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert LLM output .txt files into .json files.")
+    parser.add_argument("directory", nargs="?", help="directory containing one sub-directory of .txt files per paper")
+    parser.add_argument("--workers", type=int, default=None, help="parallel processes (default: CPU count)")
+    parser.add_argument("--full", action="store_true", help="reconvert every file, not only new or changed ones")
+    parser.add_argument("--compact", action="store_true", help="write compact JSON instead of indent=4")
+    args = parser.parse_args()
+    target_directory = args.directory or input("Please enter the directory path of TXT file:").strip()
+    process_txt_to_json([f for f in Path(target_directory).iterdir() if f.is_dir()],
+                        workers=args.workers, incremental=not args.full, compact=args.compact)